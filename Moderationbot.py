@@ -60,214 +60,976 @@ commands_synced = False
 # (Around line 50-60, after all the import statements)
 # ============================================================================
 
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from psycopg2.pool import SimpleConnectionPool
-from typing import Optional, List, Dict
+import aiohttp
+import asyncpg
+import bisect
+import contextlib
+import contextvars
+import functools
+import hashlib
+import html
+import json
+import math
+import re
+import sqlite3
+import time
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+from string import Template
+from typing import Optional, List, Dict, Tuple
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
 
 # ============================================================================
 # DATABASE CONFIGURATION
 # ============================================================================
 
+# Pool sizing for the asyncpg connection pool
+DB_POOL_MIN_SIZE = 1
+DB_POOL_MAX_SIZE = 20
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+# Latency histograms exported on /metrics (see PROMETHEUS METRICS for the
+# endpoint). Counters that already live elsewhere (pool_stats, gateway_stats,
+# http_stats, bulk_pacer) are read directly when the endpoint renders.
+
+class Histogram:
+    """Prometheus-style histogram with one series per label value"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # label value -> per-bucket counts (not cumulative), then sum and count
+        self.series = {}
+
+    def observe(self, label: str, value: float):
+        series = self.series.get(label)
+        if series is None:
+            series = self.series[label] = [0] * len(self.buckets) + [0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+
+# Seconds from the interaction being created to the command finishing, by command
+command_duration = Histogram((0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+# Seconds each DB helper held a pooled connection, by helper
+db_query_duration = Histogram((0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+# How late the event loop ran a timer that should have fired on time
+event_loop_lag = Histogram((0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1))
+# Slash command errors by (command, error type)
+command_errors = Counter()
+# Seconds spent in each phase of a command, by (command, phase); see COMMAND INSTRUMENTATION
+command_phase_duration = Histogram((0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+
+# Timing of the slash command running in the current task (None outside commands)
+current_command_timing = contextvars.ContextVar('current_command_timing', default=None)
+
+
+def record_phase(phase: str, seconds: float):
+    """Add time to a phase of the command running in this task, if any"""
+    timing = current_command_timing.get()
+    if timing is not None:
+        timing.phases[phase] += seconds
 
 
 # ============================================================================
 # DATABASE HELPER FUNCTIONS
 # ============================================================================
 
-def get_db_connection():
-    """Get a database connection from the pool"""
-    return db_pool.getconn()
+def _rows_affected(status: str) -> int:
+    """Parse the affected row count from an asyncpg command status (e.g. 'DELETE 3')"""
+    try:
+        return int(status.split()[-1])
+    except (AttributeError, IndexError, ValueError):
+        return 0
+
 
+# ============================================================================
+# DATABASE CONNECTION CHECKOUT
+# ============================================================================
+# Every helper borrows connections through db_connection(), which always hands
+# the connection back to the pool (even when the query raises) and fails fast
+# with asyncio.TimeoutError when the pool is exhausted instead of hanging the
+# command. Checkouts held longer than DB_LEAK_THRESHOLD seconds are reported by
+# the health check task as suspected leaks.
+
+# Pool counters shown on /stats
+pool_stats = {
+    'checkouts': 0,
+    'checkout_timeouts': 0,
+    'wait_total': 0.0,
+    'wait_max': 0.0,
+    'leaks_detected': 0,
+    'pings_ok': 0,
+    'pings_failed': 0,
+    'last_ping_ms': None,
+    'last_ping_ok': None,
+    'recycles': 0,
+}
+# Connections currently checked out: id(conn) -> [helper, checked out at, reported as leak]
+_checked_out = {}
+
+
+@contextlib.asynccontextmanager
+async def db_connection(helper: str, timeout: float = None):
+    """
+    Borrow a pooled connection for the duration of an `async with` block
 
-def return_db_connection(conn):
-    """Return a connection to the pool"""
-    db_pool.putconn(conn)
+    Args:
+        helper: Name of the calling helper, used in leak reports
+        timeout: Seconds to wait for a free connection (default DB_CHECKOUT_TIMEOUT)
+    """
+    pool = db_pool
+    if pool is None:
+        raise RuntimeError("Database pool not initialized")
 
+    started = time.perf_counter()
+    try:
+        conn = await pool.acquire(timeout=timeout or DB_CHECKOUT_TIMEOUT)
+    except asyncio.TimeoutError:
+        pool_stats['checkout_timeouts'] += 1
+        print(f"⚠️ [DATABASE] {helper} timed out waiting for a pooled connection", flush=True)
+        raise
+
+    waited = time.perf_counter() - started
+    pool_stats['checkouts'] += 1
+    pool_stats['wait_total'] += waited
+    pool_stats['wait_max'] = max(pool_stats['wait_max'], waited)
+    _checked_out[id(conn)] = [helper, time.monotonic(), False]
 
-def init_moderation_database():
-    """Initialize database with moderation tracking tables"""
-    global db_pool
+    try:
+        yield conn
+    finally:
+        _checked_out.pop(id(conn), None)
+        db_query_duration.observe(helper, time.perf_counter() - started - waited)
+        record_phase('db', time.perf_counter() - started)
+        await pool.release(conn)
+
+
+def pool_max_size() -> int:
+    """Connections the selected backend can hand out (SQLite always uses one)"""
+    if db_pool is not None:
+        return db_pool.get_max_size()
+    if DATABASE_BACKEND == 'sqlite':
+        return 1
+    return DB_POOL_MAX_SIZE if DATABASE_BACKEND == 'postgres' else 0
+
+
+def get_pool_stats() -> Dict:
+    """Snapshot of pool usage and health counters for /stats"""
+    size = db_pool.get_size() if db_pool is not None else 0
+    idle = db_pool.get_idle_size() if db_pool is not None else 0
+    checkouts = pool_stats['checkouts']
+    return {
+        **pool_stats,
+        'size': size,
+        'max_size': pool_max_size(),
+        'in_use': len(_checked_out),
+        'idle': idle,
+        'wait_avg_ms': pool_stats['wait_total'] / checkouts * 1000 if checkouts else 0.0,
+        'wait_max_ms': pool_stats['wait_max'] * 1000,
+    }
+
+
+def detect_connection_leaks() -> int:
+    """Report connections held longer than DB_LEAK_THRESHOLD; returns how many are new"""
+    now = time.monotonic()
+    new_leaks = 0
+    for entry in _checked_out.values():
+        helper, checked_out_at, reported = entry
+        held_for = now - checked_out_at
+        if not reported and held_for > DB_LEAK_THRESHOLD:
+            entry[2] = True
+            new_leaks += 1
+            print(f"⚠️ [DATABASE] Possible connection leak: {helper} has held a connection "
+                  f"for {held_for:.0f}s", flush=True)
+    pool_stats['leaks_detected'] += new_leaks
+    return new_leaks
+
+
+async def db_health_check_loop():
+    """
+    Background task: ping the pool, recycle it when the ping fails and look for
+    leaked checkouts. Idle connections are also retired by the pool itself after
+    DB_MAX_IDLE_SECONDS (see create_database_pool), before Supabase drops them.
+    """
+    while True:
+        await asyncio.sleep(DB_HEALTH_CHECK_INTERVAL)
+        if db_pool is None:
+            continue
+
+        detect_connection_leaks()
+
+        started = time.perf_counter()
+        try:
+            async with db_connection('health_check') as conn:
+                await conn.fetchval('SELECT 1')
+            pool_stats['pings_ok'] += 1
+            pool_stats['last_ping_ms'] = (time.perf_counter() - started) * 1000
+            pool_stats['last_ping_ok'] = True
+        except asyncio.TimeoutError:
+            # Every connection is busy; that is load, not a dead connection
+            pool_stats['pings_failed'] += 1
+            pool_stats['last_ping_ms'] = None
+        except Exception as e:
+            pool_stats['pings_failed'] += 1
+            pool_stats['last_ping_ms'] = None
+            pool_stats['last_ping_ok'] = False
+            print(f"⚠️ [DATABASE] Health check ping failed: {type(e).__name__}: {e}", flush=True)
+            # Connections are replaced lazily on their next checkout
+            await db_pool.expire_connections()
+            pool_stats['recycles'] += 1
+            print("🔄 [DATABASE] Recycled pooled connections", flush=True)
+
+
+# ============================================================================
+# SQLITE STORAGE BACKEND
+# ============================================================================
+# Local alternative to Supabase for small deployments, CI and benchmarks
+# (DATABASE_BACKEND=sqlite, or automatically when SUPABASE_URL is not set).
+# SQLitePool / SQLiteConnection implement the subset of the asyncpg pool and
+# connection API the helpers use (acquire/release, fetch/fetchrow/fetchval/
+# execute, transaction), so every helper runs unchanged on either backend.
+# All SQLite calls run on one dedicated thread, keeping file I/O off the event
+# loop. SQLite allows a single writer, so the pool hands out one connection.
+
+def _adapt_sqlite_datetime(value: datetime) -> str:
+    # Stored as naive UTC text, the same format CURRENT_TIMESTAMP produces
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(' ')
+
+
+def _convert_sqlite_timestamp(value: bytes) -> datetime:
+    # Hand back timezone-aware UTC datetimes, like asyncpg does for TIMESTAMPTZ
+    return datetime.fromisoformat(value.decode()).replace(tzinfo=timezone.utc)
+
+
+sqlite3.register_adapter(datetime, _adapt_sqlite_datetime)
+sqlite3.register_converter('TIMESTAMP', _convert_sqlite_timestamp)
+
+
+@functools.lru_cache(maxsize=256)
+def _sqlite_query(query: str) -> str:
+    """Translate asyncpg's $1, $2 placeholders to SQLite's numbered ?1, ?2"""
+    return re.sub(r'\$(\d+)', r'?\1', query)
+
+
+class SQLiteConnection:
+    """asyncpg-style connection wrapper; every call runs on the pool's thread"""
+
+    def __init__(self, pool: 'SQLitePool', raw):
+        self._pool = pool
+        self._raw = raw
+
+    async def _run(self, func, *args):
+        return await self._pool.run(func, *args)
+
+    def _execute(self, query, args):
+        return self._raw.execute(_sqlite_query(query), args)
+
+    async def fetch(self, query: str, *args) -> list:
+        return await self._run(lambda: self._execute(query, args).fetchall())
+
+    async def fetchrow(self, query: str, *args):
+        return await self._run(lambda: self._execute(query, args).fetchone())
+
+    async def fetchval(self, query: str, *args):
+        row = await self.fetchrow(query, *args)
+        return row[0] if row is not None else None
+
+    async def execute(self, query: str, *args) -> str:
+        """Run a statement; returns an asyncpg-style status such as 'DELETE 3'"""
+        def run():
+            cursor = self._execute(query, args)
+            verb = query.split(None, 1)[0].upper()
+            return f"{verb} {max(cursor.rowcount, 0)}"
+        return await self._run(run)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        # IMMEDIATE takes the write lock up front, so another process (e.g. the
+        # migrate command) cannot interleave writes
+        await self._run(self._raw.execute, 'BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            await self._run(self._raw.execute, 'ROLLBACK')
+            raise
+        else:
+            await self._run(self._raw.execute, 'COMMIT')
+
+
+class SQLitePool:
+    """Single-connection pool with the asyncpg Pool methods the bot relies on"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-db')
+        self._lock = asyncio.Lock()
+        self._connection = None
+
+    async def run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _connect(self):
+        raw = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES,
+                              isolation_level=None, check_same_thread=False)
+        raw.row_factory = sqlite3.Row
+        # WAL lets readers run alongside the writer; NORMAL sync is durable in WAL mode
+        raw.execute('PRAGMA journal_mode=WAL')
+        raw.execute('PRAGMA synchronous=NORMAL')
+        raw.execute('PRAGMA busy_timeout=5000')
+        return raw
+
+    async def open(self) -> 'SQLitePool':
+        self._connection = SQLiteConnection(self, await self.run(self._connect))
+        return self
+
+    async def acquire(self, timeout: float = None) -> SQLiteConnection:
+        await asyncio.wait_for(self._lock.acquire(), timeout=timeout)
+        return self._connection
+
+    async def release(self, conn: SQLiteConnection):
+        self._lock.release()
+
+    def get_size(self) -> int:
+        return 1 if self._connection is not None else 0
+
+    def get_max_size(self) -> int:
+        return 1
+
+    def get_idle_size(self) -> int:
+        return 0 if self._lock.locked() or self._connection is None else 1
+
+    async def expire_connections(self):
+        """Reopen the database file (used when a health check ping fails)"""
+        async with self._lock:
+            await self.run(self._connection._raw.close)
+            self._connection = SQLiteConnection(self, await self.run(self._connect))
+
+    async def close(self):
+        """Wait for the connection to be released, then close it and the thread"""
+        async with self._lock:
+            await self.run(self._connection._raw.close)
+            self._connection = None
+        self._executor.shutdown(wait=False)
+
+    def terminate(self):
+        if self._connection is not None:
+            self._executor.submit(self._connection._raw.close).result()
+            self._connection = None
+        self._executor.shutdown(wait=False)
+
+
+# ============================================================================
+# SCHEMA MIGRATIONS
+# ============================================================================
+# Ordered list of (version, description, statements). Never edit a migration
+# that has shipped - append a new one instead. Statements in migration 1 use
+# IF NOT EXISTS so databases created before versioning adopt it cleanly.
+
+SCHEMA_MIGRATIONS = [
+    (1, "moderation cases, warnings and notes tables", [
+        '''CREATE TABLE IF NOT EXISTS moderation_cases
+           (
+               case_id        SERIAL PRIMARY KEY,
+               guild_id       BIGINT NOT NULL,
+               user_id        BIGINT NOT NULL,
+               moderator_id   BIGINT NOT NULL,
+               action_type    TEXT   NOT NULL,
+               reason         TEXT,
+               user_name      TEXT,
+               moderator_name TEXT,
+               created_at     TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+               updated_at     TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+           )''',
+        '''CREATE TABLE IF NOT EXISTS moderation_warnings
+           (
+               warning_id     SERIAL PRIMARY KEY,
+               guild_id       BIGINT NOT NULL,
+               user_id        BIGINT NOT NULL,
+               moderator_id   BIGINT NOT NULL,
+               reason         TEXT   NOT NULL,
+               user_name      TEXT,
+               moderator_name TEXT,
+               created_at     TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+           )''',
+        '''CREATE TABLE IF NOT EXISTS moderation_notes
+           (
+               note_id        SERIAL PRIMARY KEY,
+               guild_id       BIGINT NOT NULL,
+               user_id        BIGINT NOT NULL,
+               moderator_id   BIGINT NOT NULL,
+               note_text      TEXT   NOT NULL,
+               user_name      TEXT,
+               moderator_name TEXT,
+               created_at     TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+           )''',
+        '''CREATE INDEX IF NOT EXISTS idx_mod_cases_guild_user
+            ON moderation_cases(guild_id, user_id)''',
+        '''CREATE INDEX IF NOT EXISTS idx_mod_cases_created
+            ON moderation_cases(created_at)''',
+        '''CREATE INDEX IF NOT EXISTS idx_mod_warnings_guild_user
+            ON moderation_warnings(guild_id, user_id)''',
+        '''CREATE INDEX IF NOT EXISTS idx_mod_notes_guild_user
+            ON moderation_notes(guild_id, user_id)''',
+    ]),
+    (2, "warning counters maintained by add_warning/clear_user_warnings", [
+        '''CREATE TABLE IF NOT EXISTS moderation_warning_counts
+           (
+               guild_id      BIGINT  NOT NULL,
+               user_id       BIGINT  NOT NULL,
+               warning_count INTEGER NOT NULL DEFAULT 0,
+               PRIMARY KEY (guild_id, user_id)
+           )''',
+        # Seed counters from existing warnings (rows already maintained are kept)
+        '''INSERT INTO moderation_warning_counts (guild_id, user_id, warning_count)
+           SELECT guild_id, user_id, COUNT(*)
+           FROM moderation_warnings
+           GROUP BY guild_id, user_id
+           ON CONFLICT (guild_id, user_id) DO NOTHING''',
+    ]),
+    (3, "keyset pagination indexes for history pages", [
+        '''CREATE INDEX IF NOT EXISTS idx_mod_cases_history
+            ON moderation_cases(guild_id, user_id, created_at DESC, case_id DESC)''',
+        '''CREATE INDEX IF NOT EXISTS idx_mod_warnings_history
+            ON moderation_warnings(guild_id, user_id, created_at DESC, warning_id DESC)''',
+        '''CREATE INDEX IF NOT EXISTS idx_mod_notes_history
+            ON moderation_notes(guild_id, user_id, created_at DESC, note_id DESC)''',
+    ]),
+    (4, "persisted audit log entries and per-guild sync cursors", [
+        # entry_id is the Discord audit log entry snowflake
+        '''CREATE TABLE IF NOT EXISTS moderation_audit_log
+           (
+               entry_id     BIGINT PRIMARY KEY,
+               guild_id     BIGINT NOT NULL,
+               action       TEXT   NOT NULL,
+               target_id    BIGINT NOT NULL,
+               moderator_id BIGINT,
+               reason       TEXT,
+               created_at   TIMESTAMP WITH TIME ZONE NOT NULL
+           )''',
+        '''CREATE INDEX IF NOT EXISTS idx_mod_audit_log_target
+            ON moderation_audit_log(guild_id, target_id, entry_id DESC)''',
+        # Newest entry the sync has seen per guild; only entries after it are fetched
+        '''CREATE TABLE IF NOT EXISTS moderation_audit_log_cursors
+           (
+               guild_id      BIGINT PRIMARY KEY,
+               last_entry_id BIGINT NOT NULL,
+               updated_at    TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+           )''',
+    ]),
+    (5, "lockdown snapshots of each channel's prior @everyone overwrite", [
+        # allow_bits/deny_bits are NULL when the channel had no @everyone overwrite
+        '''CREATE TABLE IF NOT EXISTS lockdown_snapshots
+           (
+               guild_id   BIGINT NOT NULL,
+               channel_id BIGINT NOT NULL,
+               allow_bits BIGINT,
+               deny_bits  BIGINT,
+               created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+               PRIMARY KEY (guild_id, channel_id)
+           )''',
+    ]),
+]
+
+# The same migrations in SQLite's dialect (INTEGER PRIMARY KEY ids, naive UTC
+# TIMESTAMP text). Versions must stay in step with SCHEMA_MIGRATIONS.
+SQLITE_SCHEMA_MIGRATIONS = [
+    (1, "moderation cases, warnings and notes tables", [
+        '''CREATE TABLE IF NOT EXISTS moderation_cases
+           (
+               case_id        INTEGER PRIMARY KEY AUTOINCREMENT,
+               guild_id       INTEGER NOT NULL,
+               user_id        INTEGER NOT NULL,
+               moderator_id   INTEGER NOT NULL,
+               action_type    TEXT    NOT NULL,
+               reason         TEXT,
+               user_name      TEXT,
+               moderator_name TEXT,
+               created_at     TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               updated_at     TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )''',
+        '''CREATE TABLE IF NOT EXISTS moderation_warnings
+           (
+               warning_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+               guild_id       INTEGER NOT NULL,
+               user_id        INTEGER NOT NULL,
+               moderator_id   INTEGER NOT NULL,
+               reason         TEXT    NOT NULL,
+               user_name      TEXT,
+               moderator_name TEXT,
+               created_at     TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )''',
+        '''CREATE TABLE IF NOT EXISTS moderation_notes
+           (
+               note_id        INTEGER PRIMARY KEY AUTOINCREMENT,
+               guild_id       INTEGER NOT NULL,
+               user_id        INTEGER NOT NULL,
+               moderator_id   INTEGER NOT NULL,
+               note_text      TEXT    NOT NULL,
+               user_name      TEXT,
+               moderator_name TEXT,
+               created_at     TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )''',
+        '''CREATE INDEX IF NOT EXISTS idx_mod_cases_guild_user
+            ON moderation_cases(guild_id, user_id)''',
+        '''CREATE INDEX IF NOT EXISTS idx_mod_cases_created
+            ON moderation_cases(created_at)''',
+        '''CREATE INDEX IF NOT EXISTS idx_mod_warnings_guild_user
+            ON moderation_warnings(guild_id, user_id)''',
+        '''CREATE INDEX IF NOT EXISTS idx_mod_notes_guild_user
+            ON moderation_notes(guild_id, user_id)''',
+    ]),
+    (2, "warning counters maintained by add_warning/clear_user_warnings", [
+        '''CREATE TABLE IF NOT EXISTS moderation_warning_counts
+           (
+               guild_id      INTEGER NOT NULL,
+               user_id       INTEGER NOT NULL,
+               warning_count INTEGER NOT NULL DEFAULT 0,
+               PRIMARY KEY (guild_id, user_id)
+           )''',
+        # WHERE true is required by SQLite's parser for INSERT ... SELECT ... ON CONFLICT
+        '''INSERT INTO moderation_warning_counts (guild_id, user_id, warning_count)
+           SELECT guild_id, user_id, COUNT(*)
+           FROM moderation_warnings
+           WHERE true
+           GROUP BY guild_id, user_id
+           ON CONFLICT (guild_id, user_id) DO NOTHING''',
+    ]),
+    # Migrations without SERIAL columns or Postgres-only syntax work unchanged on SQLite
+    SCHEMA_MIGRATIONS[2],
+    SCHEMA_MIGRATIONS[3],
+    SCHEMA_MIGRATIONS[4],
+]
+
+LATEST_SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+assert [m[0] for m in SQLITE_SCHEMA_MIGRATIONS] == [m[0] for m in SCHEMA_MIGRATIONS]
+
+# Arbitrary key for pg_advisory_xact_lock so two processes never migrate at once
+SCHEMA_MIGRATION_LOCK_ID = 0x5348524B
+
+
+async def get_schema_version(conn) -> int:
+    """Return the applied schema version (0 for a database that has never been migrated)"""
+    try:
+        return await conn.fetchval('SELECT MAX(version) FROM schema_version') or 0
+    except (asyncpg.UndefinedTableError, sqlite3.OperationalError):
+        return 0
+
+
+async def apply_pending_migrations(conn) -> int:
+    """
+    Apply every migration newer than the recorded schema version
+
+    Runs in one transaction under an advisory lock (on SQLite, the transaction's
+    write lock). The version is re-checked once the lock is held, so a bot
+    starting up and an out-of-band `python Moderationbot.py migrate` cannot
+    apply the same migration twice. Returns the number of migrations applied.
+    """
+    migrations = SQLITE_SCHEMA_MIGRATIONS if DATABASE_BACKEND == 'sqlite' else SCHEMA_MIGRATIONS
+
+    async with conn.transaction():
+        if DATABASE_BACKEND == 'postgres':
+            await conn.execute('SELECT pg_advisory_xact_lock($1)', SCHEMA_MIGRATION_LOCK_ID)
+        await conn.execute('''CREATE TABLE IF NOT EXISTS schema_version
+                              (
+                                  version     INTEGER PRIMARY KEY,
+                                  description TEXT,
+                                  applied_at  TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                              )''')
+
+        current_version = await get_schema_version(conn)
+        applied = 0
+
+        for version, description, statements in migrations:
+            if version <= current_version:
+                continue
+
+            print(f"📋 Applying migration {version}: {description}...")
+            for statement in statements:
+                await conn.execute(statement)
+            await conn.execute('INSERT INTO schema_version (version, description) VALUES ($1, $2)',
+                               version, description)
+            print(f"✅ Migration {version} applied")
+            applied += 1
+
+    return applied
+
+
+async def create_database_pool():
+    """Create the connection pool for the configured DATABASE_BACKEND"""
+    if DATABASE_BACKEND == 'sqlite':
+        return await SQLitePool(SQLITE_PATH).open()
+
+    # statement_cache_size=0 keeps asyncpg compatible with Supabase's
+    # transaction-mode pooler, which cannot hold prepared statements
+    return await asyncpg.create_pool(
+        SUPABASE_URL,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        statement_cache_size=0,
+        # Retire idle connections before Supabase's pooler silently drops them
+        max_inactive_connection_lifetime=DB_MAX_IDLE_SECONDS
+    )
+
+
+async def init_moderation_database():
+    """
+    Initialize the database pool and bring the schema up to date
+
+    The fast path is a single schema_version read. Migrations only run when the
+    database is behind LATEST_SCHEMA_VERSION.
+    """
+    global db_pool, db_init_error
 
     print("=" * 60)
     print("🗄️  INITIALIZING MODERATION DATABASE")
     print("=" * 60)
 
-    if not SUPABASE_URL:
+    if DATABASE_BACKEND == 'none':
+        print("⚠️  DATABASE_BACKEND=none - moderation tracking features are disabled.")
+        return False
+
+    if DATABASE_BACKEND == 'postgres' and not SUPABASE_URL:
         print("❌ SUPABASE_URL not found in environment variables!")
         print("⚠️  Moderation tracking features will be disabled.")
-        print("Add SUPABASE_URL to your .env file to enable moderation tracking.")
+        print("Add SUPABASE_URL to your .env file, or set DATABASE_BACKEND=sqlite.")
         return False
 
+    if db_pool is not None:
+        # The pool lives for the whole process; never build a second one
+        print("✅ Database connection pool already initialized")
+        return True
+
     try:
         # Create connection pool
-        print("🔄 Creating database connection pool...")
-        db_pool = SimpleConnectionPool(1, 20, SUPABASE_URL)
+        backend_target = SQLITE_PATH if DATABASE_BACKEND == 'sqlite' else 'Supabase'
+        print(f"🔄 Creating database connection pool ({DATABASE_BACKEND}: {backend_target})...")
+        db_pool = await create_database_pool()
         print("✅ Database connection pool created")
 
         print("🔌 Testing database connection...")
-        conn = get_db_connection()
-        cur = conn.cursor()
-        print("✅ Database connection successful")
-
-        # Create moderation_cases table
-        print("📋 Creating 'moderation_cases' table...")
-        cur.execute('''CREATE TABLE IF NOT EXISTS moderation_cases
-                       (
-                           case_id
-                           SERIAL
-                           PRIMARY
-                           KEY,
-                           guild_id
-                           BIGINT
-                           NOT
-                           NULL,
-                           user_id
-                           BIGINT
-                           NOT
-                           NULL,
-                           moderator_id
-                           BIGINT
-                           NOT
-                           NULL,
-                           action_type
-                           TEXT
-                           NOT
-                           NULL,
-                           reason
-                           TEXT,
-                           user_name
-                           TEXT,
-                           moderator_name
-                           TEXT,
-                           created_at
-                           TIMESTAMP
-                           WITH
-                           TIME
-                           ZONE
-                           DEFAULT
-                           CURRENT_TIMESTAMP,
-                           updated_at
-                           TIMESTAMP
-                           WITH
-                           TIME
-                           ZONE
-                           DEFAULT
-                           CURRENT_TIMESTAMP
-                       )''')
-        print("✅ 'moderation_cases' table ready (includes usernames)")
-
-        # Create moderation_warnings table
-        print("📋 Creating 'moderation_warnings' table...")
-        cur.execute('''CREATE TABLE IF NOT EXISTS moderation_warnings
-                       (
-                           warning_id
-                           SERIAL
-                           PRIMARY
-                           KEY,
-                           guild_id
-                           BIGINT
-                           NOT
-                           NULL,
-                           user_id
-                           BIGINT
-                           NOT
-                           NULL,
-                           moderator_id
-                           BIGINT
-                           NOT
-                           NULL,
-                           reason
-                           TEXT
-                           NOT
-                           NULL,
-                           user_name
-                           TEXT,
-                           moderator_name
-                           TEXT,
-                           created_at
-                           TIMESTAMP
-                           WITH
-                           TIME
-                           ZONE
-                           DEFAULT
-                           CURRENT_TIMESTAMP
-                       )''')
-        print("✅ 'moderation_warnings' table ready (includes usernames)")
-
-        # Create moderation_notes table
-        print("📋 Creating 'moderation_notes' table...")
-        cur.execute('''CREATE TABLE IF NOT EXISTS moderation_notes
-                       (
-                           note_id
-                           SERIAL
-                           PRIMARY
-                           KEY,
-                           guild_id
-                           BIGINT
-                           NOT
-                           NULL,
-                           user_id
-                           BIGINT
-                           NOT
-                           NULL,
-                           moderator_id
-                           BIGINT
-                           NOT
-                           NULL,
-                           note_text
-                           TEXT
-                           NOT
-                           NULL,
-                           user_name
-                           TEXT,
-                           moderator_name
-                           TEXT,
-                           created_at
-                           TIMESTAMP
-                           WITH
-                           TIME
-                           ZONE
-                           DEFAULT
-                           CURRENT_TIMESTAMP
-                       )''')
-        print("✅ 'moderation_notes' table ready (includes usernames)")
-
-        # Create indexes for better performance
-        print("📊 Creating database indexes...")
-        cur.execute('''CREATE INDEX IF NOT EXISTS idx_mod_cases_guild_user
-            ON moderation_cases(guild_id, user_id)''')
-        cur.execute('''CREATE INDEX IF NOT EXISTS idx_mod_cases_created
-            ON moderation_cases(created_at)''')
-        cur.execute('''CREATE INDEX IF NOT EXISTS idx_mod_warnings_guild_user
-            ON moderation_warnings(guild_id, user_id)''')
-        cur.execute('''CREATE INDEX IF NOT EXISTS idx_mod_notes_guild_user
-            ON moderation_notes(guild_id, user_id)''')
-        print("✅ All indexes created")
-
-        conn.commit()
-        print("✅ Database changes committed")
-        cur.close()
-        return_db_connection(conn)
+        async with db_connection('init_moderation_database') as conn:
+            print("✅ Database connection successful")
+
+            schema_version = await get_schema_version(conn)
+            if schema_version >= LATEST_SCHEMA_VERSION:
+                print(f"✅ Schema is up to date (version {schema_version})")
+            elif DB_AUTO_MIGRATE:
+                print(f"🔄 Schema is at version {schema_version}, migrating to {LATEST_SCHEMA_VERSION}...")
+                applied = await apply_pending_migrations(conn)
+                print(f"✅ Applied {applied} migration(s)")
+                schema_version = LATEST_SCHEMA_VERSION
+
+        if schema_version < LATEST_SCHEMA_VERSION:
+            print(f"❌ Schema is at version {schema_version}, bot needs {LATEST_SCHEMA_VERSION}")
+            print("Run `python Moderationbot.py migrate` or set DB_AUTO_MIGRATE=true.")
+            print("⚠️  Moderation tracking features will be disabled.")
+            close_database()
+            return False
 
+        db_init_error = None
         print("=" * 60)
         print("✅ MODERATION DATABASE INITIALIZED SUCCESSFULLY")
         print("=" * 60)
         return True
 
     except Exception as e:
+        # Usually transient (Supabase unreachable); setup_hook keeps retrying
+        db_init_error = f"{type(e).__name__}: {e}"
         print(f"❌ Database initialization error: {e}")
-        print("⚠️  Moderation tracking features will be disabled.")
+        print("⚠️  Moderation tracking features are disabled until the database is reachable.")
+        # Drop a half-initialized pool so the next attempt starts clean
+        close_database()
         return False
 
 
+async def database_startup_retry_loop():
+    """Background task: retry a failed database startup with exponential backoff"""
+    delay = DB_INIT_RETRY_DELAY
+    while db_init_error is not None:
+        print(f"🔄 Retrying moderation database in {delay:.0f}s ({db_init_error})", flush=True)
+        await asyncio.sleep(delay * r.uniform(0.8, 1.2))
+        if await init_moderation_database():
+            print("✅ Moderation database ready", flush=True)
+            start_database_tasks()
+            return
+        delay = min(delay * 2, DB_INIT_RETRY_MAX_DELAY)
+
+
+async def run_migrations_cli():
+    """Entry point for `python Moderationbot.py migrate` - run migrations out-of-band"""
+    global db_pool
+
+    if DATABASE_BACKEND == 'none':
+        print("❌ DATABASE_BACKEND=none - there is no database to migrate")
+        return 1
+    if DATABASE_BACKEND == 'postgres' and not SUPABASE_URL:
+        print("❌ SUPABASE_URL not found in environment variables!")
+        return 1
+
+    db_pool = await create_database_pool()
+    try:
+        async with db_connection('run_migrations_cli') as conn:
+            before = await get_schema_version(conn)
+            print(f"Current schema version: {before} (latest: {LATEST_SCHEMA_VERSION})")
+            applied = await apply_pending_migrations(conn)
+            after = await get_schema_version(conn)
+        print(f"✅ Applied {applied} migration(s), schema is now at version {after}")
+        return 0
+    finally:
+        await shutdown_database()
+
+
+# ============================================================================
+# MODERATION HISTORY CACHE
+# ============================================================================
+
+class UserHistoryCache:
+    """
+    Read-through TTL + LRU cache for per-user moderation history
+
+    Entries are keyed by (guild_id, user_id). Each entry holds the results of
+    several reads for that user (warnings, cases, notes), so a write to one
+    user only drops that user's cached data. Every invalidation gives the
+    entry a new version from a cache-wide counter, and a read that started
+    before the change is not stored. Users without an entry share one version
+    that moves on whenever such a user is invalidated or an entry is evicted,
+    so an evicted user can never come back with a version a read already saw.
+    """
+
+    def __init__(self, max_users: int, ttl: float):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._clock = 0
+        # Version reported for users that have no entry
+        self._absent_version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def version(self, guild_id: int, user_id: int) -> int:
+        """Current version of a user's entry, taken before a database read"""
+        entry = self._entries.get((guild_id, user_id))
+        return entry['version'] if entry else self._absent_version
+
+    def _next_version(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def get(self, guild_id: int, user_id: int, subkey: tuple):
+        """Return a cached value or None, counting the hit or miss"""
+        entry = self._entries.get((guild_id, user_id))
+        cached = entry['values'].get(subkey) if entry else None
+
+        if cached is None or cached[0] < time.monotonic():
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end((guild_id, user_id))
+        self.hits += 1
+        value = cached[1]
+        return list(value) if isinstance(value, list) else value
+
+    def set(self, guild_id: int, user_id: int, subkey: tuple, value, version: int):
+        """Store a value read at the given version, unless it was invalidated meanwhile"""
+        if self.version(guild_id, user_id) != version:
+            return
+
+        entry = self._entries.setdefault((guild_id, user_id), {'version': version, 'values': {}})
+        entry['values'][subkey] = (time.monotonic() + self.ttl, list(value) if isinstance(value, list) else value)
+        self._entries.move_to_end((guild_id, user_id))
+
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+            self._absent_version = self._next_version()
+            self.evictions += 1
+
+    def invalidate(self, guild_id: int, user_id: int, kind: str):
+        """Drop every cached read of one kind ('warnings', 'cases', 'notes') for a user"""
+        self.invalidations += 1
+        entry = self._entries.get((guild_id, user_id))
+        if entry is None:
+            # Nothing cached to drop; only reads already in flight need to be
+            # stopped, and no entry is created so writes never grow the cache
+            self._absent_version = self._next_version()
+            return
+        entry['version'] = self._next_version()
+        entry['values'] = {key: value for key, value in entry['values'].items() if key[0] != kind}
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'users': len(self._entries),
+            'max_users': self.max_users,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups * 100) if lookups else 0.0,
+            'invalidations': self.invalidations,
+            'evictions': self.evictions,
+        }
+
+
+# ============================================================================
+# MODERATION CASE WRITE-BEHIND QUEUE
+# ============================================================================
+
+MOD_CASE_COLUMNS = ('guild_id', 'user_id', 'moderator_id', 'action_type', 'reason',
+                    'user_name', 'moderator_name')
+# Rows per insert_mod_cases_batch call in log_moderation_cases
+MOD_CASE_BULK_CHUNK = 1000
+
+# Postgres makes no promise about the order of RETURNING rows, so each row's
+# case_id is drawn from the sequence next to its array position (ord) and the
+# insert takes the IDs from there. The CTE is referenced twice, so it is
+# materialized and nextval() runs exactly once per row.
+INSERT_MOD_CASES_BATCH_SQL = f'''
+    WITH input AS (
+        SELECT nextval(pg_get_serial_sequence('moderation_cases', 'case_id')) AS case_id, t.*
+        FROM unnest($1::bigint[], $2::bigint[], $3::bigint[], $4::text[],
+                    $5::text[], $6::text[], $7::text[])
+             WITH ORDINALITY AS t({', '.join(MOD_CASE_COLUMNS)}, ord)
+    ), inserted AS (
+        INSERT INTO moderation_cases (case_id, {', '.join(MOD_CASE_COLUMNS)})
+        SELECT case_id, {', '.join(MOD_CASE_COLUMNS)} FROM input
+    )
+    SELECT case_id, ord FROM input
+'''
+
+
+async def insert_mod_cases_batch(rows: List[tuple]) -> List[int]:
+    """
+    Insert several moderation cases in one round trip
+
+    Each row is a tuple in MOD_CASE_COLUMNS order. Returns the new case IDs in
+    the same order as the rows.
+    """
+    async with db_connection('insert_mod_cases_batch') as conn:
+        if DATABASE_BACKEND == 'sqlite':
+            # No network round trip to save on a local file, so insert row by
+            # row in one transaction and read each ID back directly
+            async with conn.transaction():
+                return [
+                    await conn.fetchval(
+                        f'''INSERT INTO moderation_cases ({', '.join(MOD_CASE_COLUMNS)})
+                            VALUES ($1, $2, $3, $4, $5, $6, $7) RETURNING case_id''',
+                        *row
+                    )
+                    for row in rows
+                ]
+
+        records = await conn.fetch(INSERT_MOD_CASES_BATCH_SQL, *(list(column) for column in zip(*rows)))
+    case_ids = {record['ord']: record['case_id'] for record in records}
+    return [case_ids[position] for position in range(1, len(rows) + 1)]
+
+
+class ModerationCaseBatcher:
+    """
+    Write-behind queue that coalesces moderation case inserts
+
+    Callers submit one row and await its case ID. Rows are flushed as one
+    multi-row insert when max_batch_size rows are waiting or max_delay seconds
+    after the first row arrived, whichever comes first.
+    """
+
+    def __init__(self, max_batch_size: int, max_delay: float):
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._pending = []
+        self._flush_timer = None
+        self._flush_tasks = set()
+        self.batches_flushed = 0
+        self.rows_flushed = 0
+        self.batch_retries = 0
+
+    async def submit(self, row: tuple) -> int:
+        """Queue a case row and wait for its case ID"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._start_flush()
+        elif self._flush_timer is None:
+            self._flush_timer = loop.call_later(self.max_delay, self._start_flush)
+
+        started = time.perf_counter()
+        try:
+            return await future
+        finally:
+            # The insert runs in a flush task, so the caller's wait is its database time
+            record_phase('db', time.perf_counter() - started)
+
+    def _start_flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+        task = asyncio.get_running_loop().create_task(self._flush(batch))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+        if self._pending:
+            self._start_flush()
+
+    async def _flush(self, batch):
+        # Flush tasks inherit the context of whichever command started them;
+        # the time belongs to every waiting caller, recorded in submit()
+        current_command_timing.set(None)
+        try:
+            async with case_log_semaphore:
+                case_ids = await insert_mod_cases_batch([row for row, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+                return
+            # One bad row fails the whole statement; retry row by row so only
+            # that caller sees the error
+            print(f"⚠️ [DATABASE] Case batch of {len(batch)} failed ({type(e).__name__}), "
+                  f"retrying rows one at a time", flush=True)
+            self.batch_retries += 1
+            await asyncio.gather(*(self._flush([entry]) for entry in batch))
+            return
+
+        self.batches_flushed += 1
+        self.rows_flushed += len(batch)
+        for row, _ in batch:
+            history_cache.invalidate(row[0], row[1], 'cases')
+        for (_, future), case_id in zip(batch, case_ids):
+            if not future.done():
+                future.set_result(case_id)
+
+    async def drain(self):
+        """Flush everything that is queued and wait for in-flight batches"""
+        self._start_flush()
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+
+
 # ============================================================================
 # MODERATION CASE FUNCTIONS
 # ============================================================================
 
-def create_mod_case(guild_id: int, user_id: int, moderator_id: int,
-                    action_type: str, reason: str = None,
-                    user_name: str = None, moderator_name: str = None) -> Optional[int]:
+async def create_mod_case(guild_id: int, user_id: int, moderator_id: int,
+                          action_type: str, reason: str = None,
+                          user_name: str = None, moderator_name: str = None) -> Optional[int]:
     """
     Create a new moderation case
 
@@ -294,20 +1056,9 @@ def create_mod_case(guild_id: int, user_id: int, moderator_id: int,
         print(f"   👮 Moderator: {moderator_name or 'Unknown'} (ID: {moderator_id})")
         print(f"   📝 Reason: {reason or 'No reason provided'}")
 
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute('''INSERT INTO moderation_cases
-                       (guild_id, user_id, moderator_id, action_type, reason,
-                        user_name, moderator_name)
-                       VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING case_id''',
-                    (guild_id, user_id, moderator_id, action_type, reason,
-                     user_name, moderator_name))
-
-        case_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        return_db_connection(conn)
+        case_id = await case_batcher.submit(
+            (guild_id, user_id, moderator_id, action_type, reason, user_name, moderator_name)
+        )
 
         print(f"✅ [DATABASE] Successfully created case #{case_id}")
         print(f"   🎯 Case ID: #{case_id}")
@@ -317,30 +1068,21 @@ def create_mod_case(guild_id: int, user_id: int, moderator_id: int,
     except Exception as e:
         print(f"❌ [DATABASE] Error creating mod case: {type(e).__name__}")
         print(f"   💥 Details: {e}")
-        if conn:
-            conn.rollback()
-            return_db_connection(conn)
         return None
 
 
-def get_mod_case(case_id: int, guild_id: int) -> Optional[Dict]:
+async def get_mod_case(case_id: int, guild_id: int) -> Optional[Dict]:
     """Get details of a specific moderation case"""
     if db_pool is None:
         return None
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        cur.execute('''SELECT *
-                       FROM moderation_cases
-                       WHERE case_id = %s
-                         AND guild_id = %s''',
-                    (case_id, guild_id))
-
-        result = cur.fetchone()
-        cur.close()
-        return_db_connection(conn)
+        async with db_connection('get_mod_case') as conn:
+            result = await conn.fetchrow('''SELECT *
+                                            FROM moderation_cases
+                                            WHERE case_id = $1
+                                              AND guild_id = $2''',
+                                         case_id, guild_id)
 
         return dict(result) if result else None
 
@@ -349,58 +1091,54 @@ def get_mod_case(case_id: int, guild_id: int) -> Optional[Dict]:
         return None
 
 
-def update_mod_case_reason(case_id: int, guild_id: int, new_reason: str) -> bool:
+async def update_mod_case_reason(case_id: int, guild_id: int, new_reason: str) -> bool:
     """Update the reason for a moderation case"""
     if db_pool is None:
         return False
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute('''UPDATE moderation_cases
-                       SET reason     = %s,
-                           updated_at = CURRENT_TIMESTAMP
-                       WHERE case_id = %s
-                         AND guild_id = %s''',
-                    (new_reason, case_id, guild_id))
-
-        rows_affected = cur.rowcount
-        conn.commit()
-        cur.close()
-        return_db_connection(conn)
-
-        return rows_affected > 0
+        async with db_connection('update_mod_case_reason') as conn:
+            user_id = await conn.fetchval('''UPDATE moderation_cases
+                                             SET reason     = $1,
+                                                 updated_at = CURRENT_TIMESTAMP
+                                             WHERE case_id = $2
+                                               AND guild_id = $3
+                                             RETURNING user_id''',
+                                          new_reason, case_id, guild_id)
+
+        if user_id is None:
+            return False
+
+        history_cache.invalidate(guild_id, user_id, 'cases')
+        return True
 
     except Exception as e:
         print(f"❌ Error updating mod case: {e}")
-        if conn:
-            conn.rollback()
-            return_db_connection(conn)
         return False
 
 
-def get_user_mod_cases(guild_id: int, user_id: int, limit: int = 10) -> List[Dict]:
+async def get_user_mod_cases(guild_id: int, user_id: int, limit: int = 10) -> List[Dict]:
     """Get moderation cases for a specific user"""
     if db_pool is None:
         return []
 
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        cur.execute('''SELECT *
-                       FROM moderation_cases
-                       WHERE guild_id = %s
-                         AND user_id = %s
-                       ORDER BY created_at DESC LIMIT %s''',
-                    (guild_id, user_id, limit))
+    cached = history_cache.get(guild_id, user_id, ('cases', limit))
+    if cached is not None:
+        return cached
 
-        rows = cur.fetchall()
-        cur.close()
-        return_db_connection(conn)
-
-        return [dict(row) for row in rows]
+    try:
+        version = history_cache.version(guild_id, user_id)
+        async with db_connection('get_user_mod_cases') as conn:
+            rows = await conn.fetch('''SELECT *
+                                       FROM moderation_cases
+                                       WHERE guild_id = $1
+                                         AND user_id = $2
+                                       ORDER BY created_at DESC LIMIT $3''',
+                                    guild_id, user_id, limit)
+
+        cases = [dict(row) for row in rows]
+        history_cache.set(guild_id, user_id, ('cases', limit), cases, version)
+        return cases
 
     except Exception as e:
         print(f"❌ Error getting user mod cases: {e}")
@@ -411,8 +1149,8 @@ def get_user_mod_cases(guild_id: int, user_id: int, limit: int = 10) -> List[Dic
 # WARNING FUNCTIONS
 # ============================================================================
 
-def add_warning(guild_id: int, user_id: int, moderator_id: int, reason: str,
-                user_name: str = None, moderator_name: str = None) -> Optional[int]:
+async def add_warning(guild_id: int, user_id: int, moderator_id: int, reason: str,
+                      user_name: str = None, moderator_name: str = None) -> Optional[int]:
     """Add a warning to a user"""
     if db_pool is None:
         print("⚠️  Database pool not initialized - skipping warning creation")
@@ -424,18 +1162,22 @@ def add_warning(guild_id: int, user_id: int, moderator_id: int, reason: str,
         print(f"   👮 Moderator: {moderator_name or 'Unknown'} (ID: {moderator_id})")
         print(f"   📝 Reason: {reason}")
 
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute('''INSERT INTO moderation_warnings
-                           (guild_id, user_id, moderator_id, reason, user_name, moderator_name)
-                       VALUES (%s, %s, %s, %s, %s, %s) RETURNING warning_id''',
-                    (guild_id, user_id, moderator_id, reason, user_name, moderator_name))
-
-        warning_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        return_db_connection(conn)
+        async with db_connection('add_warning') as conn:
+            async with conn.transaction():
+                warning_id = await conn.fetchval('''INSERT INTO moderation_warnings
+                                                        (guild_id, user_id, moderator_id, reason, user_name, moderator_name)
+                                                    VALUES ($1, $2, $3, $4, $5, $6) RETURNING warning_id''',
+                                                 guild_id, user_id, moderator_id, reason, user_name, moderator_name)
+                await conn.execute('''INSERT INTO moderation_warning_counts
+                                          (guild_id, user_id, warning_count)
+                                      VALUES ($1, $2, 1)
+                                      ON CONFLICT (guild_id, user_id) DO UPDATE
+                                          SET warning_count = moderation_warning_counts.warning_count + 1''',
+                                   guild_id, user_id)
+
+        # Not primed with warning_count: concurrent add_warning calls can get
+        # here out of order, and the older count would be cached as current
+        history_cache.invalidate(guild_id, user_id, 'warnings')
 
         print(f"✅ [DATABASE] Successfully created warning #{warning_id}")
         print(f"   🎯 Warning ID: #{warning_id}")
@@ -445,37 +1187,35 @@ def add_warning(guild_id: int, user_id: int, moderator_id: int, reason: str,
     except Exception as e:
         print(f"❌ [DATABASE] Error adding warning: {type(e).__name__}")
         print(f"   💥 Details: {e}")
-        if conn:
-            conn.rollback()
-            return_db_connection(conn)
         return None
 
 
-def get_user_warnings(guild_id: int, user_id: int) -> List[Dict]:
+async def get_user_warnings(guild_id: int, user_id: int) -> List[Dict]:
     """Get all warnings for a specific user"""
     if db_pool is None:
         print("⚠️  Database pool not initialized - cannot fetch warnings")
         return []
 
+    cached = history_cache.get(guild_id, user_id, ('warnings',))
+    if cached is not None:
+        return cached
+
     try:
         print(f"🔍 [DATABASE] Fetching warnings for user ID {user_id}...")
 
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        cur.execute('''SELECT *
-                       FROM moderation_warnings
-                       WHERE guild_id = %s
-                         AND user_id = %s
-                       ORDER BY created_at DESC''',
-                    (guild_id, user_id))
-
-        rows = cur.fetchall()
-        cur.close()
-        return_db_connection(conn)
+        version = history_cache.version(guild_id, user_id)
+        async with db_connection('get_user_warnings') as conn:
+            rows = await conn.fetch('''SELECT *
+                                       FROM moderation_warnings
+                                       WHERE guild_id = $1
+                                         AND user_id = $2
+                                       ORDER BY created_at DESC''',
+                                    guild_id, user_id)
 
         print(f"✅ [DATABASE] Found {len(rows)} warning(s)")
-        return [dict(row) for row in rows]
+        warnings = [dict(row) for row in rows]
+        history_cache.set(guild_id, user_id, ('warnings',), warnings, version)
+        return warnings
 
     except Exception as e:
         print(f"❌ [DATABASE] Error getting warnings: {type(e).__name__}")
@@ -483,7 +1223,7 @@ def get_user_warnings(guild_id: int, user_id: int) -> List[Dict]:
         return []
 
 
-def clear_user_warnings(guild_id: int, user_id: int, user_name: str = None) -> int:
+async def clear_user_warnings(guild_id: int, user_id: int, user_name: str = None) -> int:
     """Clear all warnings for a user, returns number of warnings cleared"""
     if db_pool is None:
         print("⚠️  Database pool not initialized - cannot clear warnings")
@@ -492,19 +1232,21 @@ def clear_user_warnings(guild_id: int, user_id: int, user_name: str = None) -> i
     try:
         print(f"🗑️  [DATABASE] Clearing warnings for {user_name or 'Unknown'} (ID: {user_id})...")
 
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute('''DELETE
-                       FROM moderation_warnings
-                       WHERE guild_id = %s
-                         AND user_id = %s''',
-                    (guild_id, user_id))
-
-        deleted_count = cur.rowcount
-        conn.commit()
-        cur.close()
-        return_db_connection(conn)
+        async with db_connection('clear_user_warnings') as conn:
+            async with conn.transaction():
+                status = await conn.execute('''DELETE
+                                               FROM moderation_warnings
+                                               WHERE guild_id = $1
+                                                 AND user_id = $2''',
+                                            guild_id, user_id)
+                await conn.execute('''DELETE
+                                      FROM moderation_warning_counts
+                                      WHERE guild_id = $1
+                                        AND user_id = $2''',
+                                   guild_id, user_id)
+
+        deleted_count = _rows_affected(status)
+        history_cache.invalidate(guild_id, user_id, 'warnings')
 
         print(f"✅ [DATABASE] Cleared {deleted_count} warning(s)")
         print(f"   👤 User: {user_name or 'Unknown'} (ID: {user_id})")
@@ -514,50 +1256,111 @@ def clear_user_warnings(guild_id: int, user_id: int, user_name: str = None) -> i
     except Exception as e:
         print(f"❌ [DATABASE] Error clearing warnings: {type(e).__name__}")
         print(f"   💥 Details: {e}")
-        if conn:
-            conn.rollback()
-            return_db_connection(conn)
+        return 0
+
+
+async def count_user_warnings(guild_id: int, user_id: int) -> int:
+    """Get the number of warnings a user has, read from the maintained counter"""
+    if db_pool is None:
+        return 0
+
+    cached = history_cache.get(guild_id, user_id, ('warnings', 'count'))
+    if cached is not None:
+        return cached
+
+    try:
+        version = history_cache.version(guild_id, user_id)
+        async with db_connection('count_user_warnings') as conn:
+            warning_count = await conn.fetchval('''SELECT warning_count
+                                                   FROM moderation_warning_counts
+                                                   WHERE guild_id = $1
+                                                     AND user_id = $2''',
+                                                guild_id, user_id) or 0
+
+        history_cache.set(guild_id, user_id, ('warnings', 'count'), warning_count, version)
+        return warning_count
+
+    except Exception as e:
+        print(f"❌ [DATABASE] Error counting warnings: {type(e).__name__}")
+        print(f"   💥 Details: {e}")
         return 0
 
 
 # Add this helper function to log moderation cases
 async def log_moderation_case(guild_id, user_id, moderator_id, action_type, reason, user_name=None,
                               moderator_name=None):
-    """Log a moderation case to the database"""
+    """
+    Log a moderation case to the database
+
+    The insert goes through case_batcher, so during a raid many kicks/bans share
+    one round trip. At most CASE_LOG_MAX_IN_FLIGHT batches run at once so a burst
+    cannot take every pooled connection, and each call is capped at
+    CASE_LOG_TIMEOUT seconds so a slow database never holds up the moderation
+    action itself.
+    """
     if db_pool is None:
         print("⚠️ Database not available, skipping moderation log", flush=True)
         return None
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute('''
-                    INSERT INTO moderation_cases
-                    (guild_id, user_id, moderator_id, action_type, reason, user_name, moderator_name)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING case_id
-                    ''', (guild_id, user_id, moderator_id, action_type, reason, user_name, moderator_name))
-
-        case_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        return_db_connection(conn)
+        case_id = await asyncio.wait_for(
+            case_batcher.submit(
+                (guild_id, user_id, moderator_id, action_type, reason, user_name, moderator_name)
+            ),
+            timeout=CASE_LOG_TIMEOUT
+        )
 
         print(f"✅ Logged {action_type} case #{case_id} for user {user_id} in guild {guild_id}", flush=True)
         return case_id
 
+    except asyncio.TimeoutError:
+        print(f"⚠️ Timed out logging {action_type} case for user {user_id} after {CASE_LOG_TIMEOUT}s", flush=True)
+        return None
+
     except Exception as e:
         print(f"❌ Error logging moderation case: {e}", flush=True)
         import traceback
         traceback.print_exc()
         return None
 
+
+async def log_moderation_cases(rows: List[tuple]) -> List[int]:
+    """
+    Log many moderation cases at once (e.g. a mass ban)
+
+    Each row is a tuple in MOD_CASE_COLUMNS order. The rows bypass case_batcher
+    and are written with one insert_mod_cases_batch call per MOD_CASE_BULK_CHUNK rows.
+    Returns the case IDs in row order, or an empty list if logging failed.
+    """
+    if db_pool is None:
+        print("⚠️ Database not available, skipping moderation log", flush=True)
+        return []
+    if not rows:
+        return []
+
+    try:
+        case_ids = []
+        async with case_log_semaphore:
+            for start in range(0, len(rows), MOD_CASE_BULK_CHUNK):
+                case_ids.extend(await insert_mod_cases_batch(rows[start:start + MOD_CASE_BULK_CHUNK]))
+
+        for guild_id, user_id in {(row[0], row[1]) for row in rows}:
+            history_cache.invalidate(guild_id, user_id, 'cases')
+        print(f"✅ Logged {len(case_ids)} {rows[0][3]} cases in guild {rows[0][0]}", flush=True)
+        return case_ids
+
+    except Exception as e:
+        print(f"❌ Error logging moderation cases: {e}", flush=True)
+        import traceback
+        traceback.print_exc()
+        return []
+
 # ============================================================================
 # MODERATION NOTE FUNCTIONS
 # ============================================================================
 
-def add_mod_note(guild_id: int, user_id: int, moderator_id: int, note_text: str,
-                 user_name: str = None, moderator_name: str = None) -> Optional[int]:
+async def add_mod_note(guild_id: int, user_id: int, moderator_id: int, note_text: str,
+                       user_name: str = None, moderator_name: str = None) -> Optional[int]:
     """Add a moderation note (visible only to moderators)"""
     if db_pool is None:
         print("⚠️  Database pool not initialized - skipping note creation")
@@ -569,18 +1372,12 @@ def add_mod_note(guild_id: int, user_id: int, moderator_id: int, note_text: str,
         print(f"   👮 Moderator: {moderator_name or 'Unknown'} (ID: {moderator_id})")
         print(f"   📄 Note: {note_text[:50]}{'...' if len(note_text) > 50 else ''}")
 
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute('''INSERT INTO moderation_notes
-                           (guild_id, user_id, moderator_id, note_text, user_name, moderator_name)
-                       VALUES (%s, %s, %s, %s, %s, %s) RETURNING note_id''',
-                    (guild_id, user_id, moderator_id, note_text, user_name, moderator_name))
-
-        note_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        return_db_connection(conn)
+        async with db_connection('add_mod_note') as conn:
+            note_id = await conn.fetchval('''INSERT INTO moderation_notes
+                                                 (guild_id, user_id, moderator_id, note_text, user_name, moderator_name)
+                                             VALUES ($1, $2, $3, $4, $5, $6) RETURNING note_id''',
+                                          guild_id, user_id, moderator_id, note_text, user_name, moderator_name)
+        history_cache.invalidate(guild_id, user_id, 'notes')
 
         print(f"✅ [DATABASE] Successfully created note #{note_id}")
         print(f"   🎯 Note ID: #{note_id}")
@@ -590,232 +1387,1501 @@ def add_mod_note(guild_id: int, user_id: int, moderator_id: int, note_text: str,
     except Exception as e:
         print(f"❌ [DATABASE] Error adding mod note: {type(e).__name__}")
         print(f"   💥 Details: {e}")
-        if conn:
-            conn.rollback()
-            return_db_connection(conn)
         return None
 
 
-def get_user_mod_notes(guild_id: int, user_id: int) -> List[Dict]:
-    """Get all moderation notes for a specific user"""
-    if db_pool is None:
-        print("⚠️  Database pool not initialized - cannot fetch notes")
-        return []
+async def get_user_mod_notes(guild_id: int, user_id: int) -> List[Dict]:
+    """Get all moderation notes for a specific user"""
+    if db_pool is None:
+        print("⚠️  Database pool not initialized - cannot fetch notes")
+        return []
+
+    cached = history_cache.get(guild_id, user_id, ('notes',))
+    if cached is not None:
+        return cached
+
+    try:
+        print(f"🔍 [DATABASE] Fetching mod notes for user ID {user_id}...")
+
+        version = history_cache.version(guild_id, user_id)
+        async with db_connection('get_user_mod_notes') as conn:
+            rows = await conn.fetch('''SELECT *
+                                       FROM moderation_notes
+                                       WHERE guild_id = $1
+                                         AND user_id = $2
+                                       ORDER BY created_at DESC''',
+                                    guild_id, user_id)
+
+        print(f"✅ [DATABASE] Found {len(rows)} note(s)")
+        notes = [dict(row) for row in rows]
+        history_cache.set(guild_id, user_id, ('notes',), notes, version)
+        return notes
+
+    except Exception as e:
+        print(f"❌ [DATABASE] Error getting mod notes: {type(e).__name__}")
+        print(f"   💥 Details: {e}")
+        return []
+
+
+async def delete_mod_note(note_id: int, guild_id: int) -> bool:
+    """Delete a moderation note"""
+    if db_pool is None:
+        return False
+
+    try:
+        async with db_connection('delete_mod_note') as conn:
+            user_id = await conn.fetchval('''DELETE
+                                             FROM moderation_notes
+                                             WHERE note_id = $1
+                                               AND guild_id = $2
+                                             RETURNING user_id''',
+                                          note_id, guild_id)
+
+        if user_id is None:
+            return False
+
+        history_cache.invalidate(guild_id, user_id, 'notes')
+        return True
+
+    except Exception as e:
+        print(f"❌ Error deleting mod note: {e}")
+        return False
+
+
+# ============================================================================
+# HISTORY PAGINATION FUNCTIONS
+# ============================================================================
+
+# kind -> (table, id column) for the keyset-paginated history helpers
+HISTORY_TABLES = {
+    'warnings': ('moderation_warnings', 'warning_id'),
+    'cases': ('moderation_cases', 'case_id'),
+    'notes': ('moderation_notes', 'note_id'),
+}
+
+
+async def get_user_history_page(kind: str, guild_id: int, user_id: int,
+                                before: Optional[tuple] = None, limit: int = 5) -> List[Dict]:
+    """
+    Get one page of a user's warnings, cases or notes, newest first
+
+    Uses keyset pagination on (created_at, id): pass the (created_at, id) of the
+    last row of the previous page as `before` to get the next page. Only `limit`
+    rows are read, however long the history is.
+    """
+    if db_pool is None:
+        return []
+
+    table, id_column = HISTORY_TABLES[kind]
+    subkey = (kind, 'page', before, limit)
+
+    cached = history_cache.get(guild_id, user_id, subkey)
+    if cached is not None:
+        return cached
+
+    try:
+        version = history_cache.version(guild_id, user_id)
+        async with db_connection('get_user_history_page') as conn:
+            if before is None:
+                rows = await conn.fetch(f'''SELECT *
+                                            FROM {table}
+                                            WHERE guild_id = $1
+                                              AND user_id = $2
+                                            ORDER BY created_at DESC, {id_column} DESC
+                                            LIMIT $3''',
+                                        guild_id, user_id, limit)
+            else:
+                rows = await conn.fetch(f'''SELECT *
+                                            FROM {table}
+                                            WHERE guild_id = $1
+                                              AND user_id = $2
+                                              AND (created_at, {id_column}) < ($3, $4)
+                                            ORDER BY created_at DESC, {id_column} DESC
+                                            LIMIT $5''',
+                                        guild_id, user_id, before[0], before[1], limit)
+
+        page = [dict(row) for row in rows]
+        history_cache.set(guild_id, user_id, subkey, page, version)
+        return page
+
+    except Exception as e:
+        print(f"❌ [DATABASE] Error getting {kind} page: {type(e).__name__}")
+        print(f"   💥 Details: {e}")
+        return []
+
+
+async def get_user_warnings_page(guild_id: int, user_id: int,
+                                 before: Optional[tuple] = None, limit: int = 5) -> List[Dict]:
+    """Get one page of warnings for a user (see get_user_history_page)"""
+    return await get_user_history_page('warnings', guild_id, user_id, before, limit)
+
+
+async def get_user_mod_cases_page(guild_id: int, user_id: int,
+                                  before: Optional[tuple] = None, limit: int = 5) -> List[Dict]:
+    """Get one page of moderation cases for a user (see get_user_history_page)"""
+    return await get_user_history_page('cases', guild_id, user_id, before, limit)
+
+
+async def get_user_mod_notes_page(guild_id: int, user_id: int,
+                                  before: Optional[tuple] = None, limit: int = 5) -> List[Dict]:
+    """Get one page of moderation notes for a user (see get_user_history_page)"""
+    return await get_user_history_page('notes', guild_id, user_id, before, limit)
+
+
+# ============================================================================
+# AUDIT LOG PERSISTENCE FUNCTIONS
+# ============================================================================
+# Kick/ban/unban/timeout audit log entries are copied into moderation_audit_log
+# (see the AUDIT LOG MIRROR section for the sync itself). Discord only keeps
+# audit logs for 45 days and pages them 100 at a time; the table keeps every
+# entry and answers per-user history with one indexed query.
+
+AUDIT_LOG_COLUMNS = ('entry_id', 'guild_id', 'action', 'target_id', 'moderator_id', 'reason', 'created_at')
+
+
+async def persist_audit_entries(records: List[Dict]) -> Optional[int]:
+    """
+    Store mirrored audit log records, skipping entries that are already stored
+
+    Returns the number of new rows, or None if the write failed.
+    """
+    if db_pool is None:
+        return None
+    if not records:
+        return 0
+
+    width = len(AUDIT_LOG_COLUMNS)
+    inserted = 0
+    try:
+        async with db_connection('persist_audit_entries') as conn:
+            for start in range(0, len(records), 100):
+                chunk = records[start:start + 100]
+                placeholders = ', '.join(
+                    '(' + ', '.join(f'${i * width + j + 1}' for j in range(width)) + ')'
+                    for i in range(len(chunk))
+                )
+                args = [record[column] for record in chunk for column in AUDIT_LOG_COLUMNS]
+                status = await conn.execute(
+                    f'''INSERT INTO moderation_audit_log ({', '.join(AUDIT_LOG_COLUMNS)})
+                        VALUES {placeholders}
+                        ON CONFLICT (entry_id) DO NOTHING''',
+                    *args
+                )
+                inserted += _rows_affected(status)
+        return inserted
+
+    except Exception as e:
+        print(f"❌ [DATABASE] Error persisting audit log entries: {type(e).__name__}")
+        print(f"   💥 Details: {e}")
+        return None
+
+
+async def get_audit_cursor(guild_id: int) -> Optional[int]:
+    """Newest audit log entry ID already synced for a guild (None if never synced)"""
+    if db_pool is None:
+        return None
+
+    try:
+        async with db_connection('get_audit_cursor') as conn:
+            return await conn.fetchval('''SELECT last_entry_id
+                                          FROM moderation_audit_log_cursors
+                                          WHERE guild_id = $1''',
+                                       guild_id)
+
+    except Exception as e:
+        print(f"❌ [DATABASE] Error reading audit log cursor: {type(e).__name__}")
+        print(f"   💥 Details: {e}")
+        return None
+
+
+async def advance_audit_cursor(guild_id: int, entry_id: int) -> bool:
+    """Move a guild's sync cursor forward to entry_id (never backwards)"""
+    if db_pool is None:
+        return False
+
+    try:
+        async with db_connection('advance_audit_cursor') as conn:
+            await conn.execute('''INSERT INTO moderation_audit_log_cursors (guild_id, last_entry_id)
+                                  VALUES ($1, $2)
+                                  ON CONFLICT (guild_id) DO UPDATE
+                                      SET last_entry_id = excluded.last_entry_id,
+                                          updated_at    = CURRENT_TIMESTAMP
+                                      WHERE excluded.last_entry_id > moderation_audit_log_cursors.last_entry_id''',
+                               guild_id, entry_id)
+        return True
+
+    except Exception as e:
+        print(f"❌ [DATABASE] Error advancing audit log cursor: {type(e).__name__}")
+        print(f"   💥 Details: {e}")
+        return False
+
+
+async def get_user_audit_history(guild_id: int, target_id: int, limit: int = 5) -> List[Dict]:
+    """
+    Persisted moderation actions against a user, newest first
+
+    Each row also carries total_count, the user's full number of stored actions.
+    """
+    if db_pool is None:
+        return []
+
+    try:
+        async with db_connection('get_user_audit_history') as conn:
+            rows = await conn.fetch('''SELECT *, COUNT(*) OVER () AS total_count
+                                       FROM moderation_audit_log
+                                       WHERE guild_id = $1
+                                         AND target_id = $2
+                                       ORDER BY entry_id DESC
+                                       LIMIT $3''',
+                                    guild_id, target_id, limit)
+        return [dict(row) for row in rows]
+
+    except Exception as e:
+        print(f"❌ [DATABASE] Error getting audit log history: {type(e).__name__}")
+        print(f"   💥 Details: {e}")
+        return []
+
+
+# ============================================================================
+# LOCKDOWN SNAPSHOT FUNCTIONS
+# ============================================================================
+# /lockdown records each channel's @everyone overwrite as an (allow, deny)
+# bitfield pair, or None when the channel had no overwrite, and /unlockserver
+# puts it back. A channel's first snapshot is kept until it is restored, so
+# running /lockdown twice cannot replace the real prior state with the locked one.
+
+async def save_lockdown_snapshot(guild_id: int, states: Dict[int, Optional[Tuple[int, int]]]) -> bool:
+    """Store prior overwrite states by channel ID, keeping any existing snapshot rows"""
+    if db_pool is None:
+        return False
+    if not states:
+        return True
+
+    rows = [(guild_id, channel_id) + (state or (None, None)) for channel_id, state in states.items()]
+    try:
+        async with db_connection('save_lockdown_snapshot') as conn:
+            async with conn.transaction():
+                for start in range(0, len(rows), 100):
+                    chunk = rows[start:start + 100]
+                    placeholders = ', '.join(
+                        f'(${i * 4 + 1}, ${i * 4 + 2}, ${i * 4 + 3}, ${i * 4 + 4})' for i in range(len(chunk))
+                    )
+                    await conn.execute(
+                        f'''INSERT INTO lockdown_snapshots (guild_id, channel_id, allow_bits, deny_bits)
+                            VALUES {placeholders}
+                            ON CONFLICT (guild_id, channel_id) DO NOTHING''',
+                        *[value for row in chunk for value in row]
+                    )
+        return True
+
+    except Exception as e:
+        print(f"❌ [DATABASE] Error saving lockdown snapshot: {type(e).__name__}")
+        print(f"   💥 Details: {e}")
+        return False
+
+
+async def get_lockdown_snapshot(guild_id: int) -> Optional[Dict[int, Optional[Tuple[int, int]]]]:
+    """Prior overwrite states by channel ID ({} without a database, None if the read failed)"""
+    if db_pool is None:
+        return {}
+
+    try:
+        async with db_connection('get_lockdown_snapshot') as conn:
+            rows = await conn.fetch('''SELECT channel_id, allow_bits, deny_bits
+                                       FROM lockdown_snapshots
+                                       WHERE guild_id = $1''',
+                                    guild_id)
+        return {
+            row['channel_id']: None if row['allow_bits'] is None else (row['allow_bits'], row['deny_bits'])
+            for row in rows
+        }
+
+    except Exception as e:
+        print(f"❌ [DATABASE] Error reading lockdown snapshot: {type(e).__name__}")
+        print(f"   💥 Details: {e}")
+        return None
+
+
+async def delete_lockdown_snapshot(guild_id: int, keep_channel_ids: List[int] = ()) -> bool:
+    """Drop a guild's snapshot once restored, keeping rows for keep_channel_ids (failed restores)"""
+    if db_pool is None:
+        return False
+
+    try:
+        async with db_connection('delete_lockdown_snapshot') as conn:
+            if keep_channel_ids:
+                placeholders = ', '.join(f'${i + 2}' for i in range(len(keep_channel_ids)))
+                await conn.execute(f'''DELETE FROM lockdown_snapshots
+                                        WHERE guild_id = $1
+                                          AND channel_id NOT IN ({placeholders})''',
+                                   guild_id, *keep_channel_ids)
+            else:
+                await conn.execute('''DELETE FROM lockdown_snapshots
+                                      WHERE guild_id = $1''',
+                                   guild_id)
+        return True
+
+    except Exception as e:
+        print(f"❌ [DATABASE] Error deleting lockdown snapshot: {type(e).__name__}")
+        print(f"   💥 Details: {e}")
+        return False
+
+
+# ============================================================================
+# CLEANUP FUNCTION
+# ============================================================================
+
+def close_database():
+    """
+    Close all database connections and clean up the connection pool.
+    Called when the bot shuts down.
+    """
+    global db_pool
+
+    try:
+        if db_pool is None:
+            print("✅ No database pool to close")
+            return
+
+        # Close all connections in the pool. terminate() is synchronous, so it
+        # is safe to call after the event loop has stopped.
+        db_pool.terminate()
+        db_pool = None
+        print("✅ All database connections closed successfully")
+
+    except Exception as e:
+        print(f"❌ Error closing database connections: {e}")
+
+
+async def shutdown_database(timeout: float = 10):
+    """
+    Gracefully close the connection pool from inside the event loop, waiting for
+    in-flight queries. Falls back to close_database() if they do not finish.
+    """
+    global db_pool
+
+    if db_pool is None:
+        return
+
+    try:
+        await asyncio.wait_for(db_pool.close(), timeout=timeout)
+        db_pool = None
+        print("✅ All database connections closed successfully")
+    except Exception as e:
+        print(f"⚠️ Graceful database shutdown failed ({e!r}), terminating connections")
+        close_database()
+
+
+# ============================================================================
+# END OF DATABASE FUNCTIONS
+# ============================================================================
+# Remember to:
+# 1. Add SUPABASE_URL to your .env file (or use DATABASE_BACKEND=sqlite)
+# 2. init_moderation_database() is called once from setup_hook
+# 3. shutdown_database() is called from shutdown_lifecycle() when the bot stops
+# 4. Borrow connections with `async with db_connection(...)`, never db_pool directly
+# 5. Add new tables/indexes as a new entry in SCHEMA_MIGRATIONS
+# ============================================================================
+# End Initalization
+
+
+
+def load_env_file(filepath='.env'):
+    if not os.path.exists(filepath):
+        print(f"Warning: {filepath} not found")
+        return
+
+    with open(filepath, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                if '=' in line:
+                    key, value = line.split('=', 1)
+                    value = value.strip().strip('"').strip("'")
+                    os.environ[key.strip()] = value
+
+
+load_env_file()
+
+TOKEN = os.getenv('DISCORD_TOKEN')
+CLIENT = os.getenv('DISCORD_CLIENT_ID')
+URL = os.getenv('DISCORD_BOT_URL')
+PORT = os.getenv('PORT', 10000)
+STATS_USER = os.getenv('STATS_USER', 'admin')
+STATS_PASS = os.getenv('STATS_PASS', 'changeme')
+# Supabase Database URL (will be loaded from .env)
+SUPABASE_URL = os.getenv('SUPABASE_URL')
+# Storage backend: postgres, sqlite, none, or auto (postgres when SUPABASE_URL is set, else sqlite)
+DATABASE_BACKEND = os.getenv('DATABASE_BACKEND', 'auto').lower()
+if DATABASE_BACKEND == 'auto':
+    DATABASE_BACKEND = 'postgres' if SUPABASE_URL else 'sqlite'
+# Database file for the sqlite backend
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'moderation.db')
+# Apply pending schema migrations on startup (set to false if you run `migrate` before deploys)
+DB_AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', 'true').lower() in ('1', 'true', 'yes')
+# Case logging limits (concurrent inserts, seconds per insert)
+CASE_LOG_MAX_IN_FLIGHT = int(os.getenv('CASE_LOG_MAX_IN_FLIGHT', 10))
+CASE_LOG_TIMEOUT = float(os.getenv('CASE_LOG_TIMEOUT', 5))
+# Case insert batching (rows per INSERT, milliseconds to wait for more rows)
+CASE_BATCH_MAX_SIZE = int(os.getenv('CASE_BATCH_MAX_SIZE', 50))
+CASE_BATCH_MAX_DELAY_MS = float(os.getenv('CASE_BATCH_MAX_DELAY_MS', 5))
+# Per-user moderation history cache (users kept, seconds before an entry expires)
+HISTORY_CACHE_MAX_USERS = int(os.getenv('HISTORY_CACHE_MAX_USERS', 5000))
+HISTORY_CACHE_TTL = float(os.getenv('HISTORY_CACHE_TTL', 300))
+# Audit log mirror for /userinfo (entries kept per guild, entries fetched per action on backfill)
+AUDIT_MIRROR_MAX_ENTRIES = int(os.getenv('AUDIT_MIRROR_MAX_ENTRIES', 5000))
+AUDIT_MIRROR_BACKFILL_LIMIT = int(os.getenv('AUDIT_MIRROR_BACKFILL_LIMIT', 100))
+# Lean mode: no presences intent and a minimal member cache (see build_client_options)
+LEAN_MODE = os.getenv('LEAN_MODE', 'false').lower() in ('1', 'true', 'yes')
+# Seconds to reuse a guild's approximate member/presence counts in lean mode
+APPROX_COUNT_TTL = float(os.getenv('APPROX_COUNT_TTL', 300))
+# Seconds between progress edits of the followup message during /lockdown, /unlockserver and /purge
+PROGRESS_UPDATE_INTERVAL = float(os.getenv('PROGRESS_UPDATE_INTERVAL', 2))
+# Channel edits in flight at once during /lockdown and /unlockserver
+LOCKDOWN_CONCURRENCY = int(os.getenv('LOCKDOWN_CONCURRENCY', 8))
+# /purge: most messages one command may delete, and most history it will scan to find them
+PURGE_MAX_MESSAGES = int(os.getenv('PURGE_MAX_MESSAGES', 10000))
+PURGE_SCAN_LIMIT = int(os.getenv('PURGE_SCAN_LIMIT', 20000))
+# Most users one /massban may ban
+MASSBAN_MAX_TARGETS = int(os.getenv('MASSBAN_MAX_TARGETS', 1000))
+# Moderator-supplied regexes (/massban name_pattern, /purge pattern) run on the
+# event loop: longest pattern accepted, most quantifiers it may use, and items
+# matched between yields to the loop
+USER_PATTERN_MAX_LENGTH = 100
+USER_PATTERN_MAX_QUANTIFIERS = 3
+PATTERN_MATCH_YIELD_EVERY = 50
+# Seconds between full recounts of the per-guild member/presence counters
+MEMBER_COUNTER_RECONCILE_INTERVAL = float(os.getenv('MEMBER_COUNTER_RECONCILE_INTERVAL', 900))
+# Entries fetched per action the first time a guild's audit log is persisted
+AUDIT_SYNC_INITIAL_LIMIT = int(os.getenv('AUDIT_SYNC_INITIAL_LIMIT', 500))
+# Seconds to wait before re-syncing a guild whose live audit log entry could not be stored
+AUDIT_SYNC_RETRY_DELAY = float(os.getenv('AUDIT_SYNC_RETRY_DELAY', 60))
+# Pool health (seconds to wait for a free connection, before a checkout counts as a
+# leak, between health check pings, before an idle connection is recycled)
+DB_CHECKOUT_TIMEOUT = float(os.getenv('DB_CHECKOUT_TIMEOUT', 10))
+DB_LEAK_THRESHOLD = float(os.getenv('DB_LEAK_THRESHOLD', 30))
+DB_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_HEALTH_CHECK_INTERVAL', 60))
+DB_MAX_IDLE_SECONDS = float(os.getenv('DB_MAX_IDLE_SECONDS', 300))
+# Backoff (first and longest delay, in seconds) for retrying a database that failed to start
+DB_INIT_RETRY_DELAY = float(os.getenv('DB_INIT_RETRY_DELAY', 5))
+DB_INIT_RETRY_MAX_DELAY = float(os.getenv('DB_INIT_RETRY_MAX_DELAY', 300))
+# Seconds a rendered status page (/, /health, /stats) is served from cache
+STATUS_PAGE_TTL = float(os.getenv('STATUS_PAGE_TTL', 5))
+# Commands slower than this many seconds are logged with their phase breakdown
+SLOW_COMMAND_THRESHOLD = float(os.getenv('SLOW_COMMAND_THRESHOLD', 2))
+SLOW_COMMAND_LOG_SIZE = int(os.getenv('SLOW_COMMAND_LOG_SIZE', 50))
+# Seconds between event loop lag samples (exported on /metrics)
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv('EVENT_LOOP_LAG_INTERVAL', 0.5))
+# Lag samples kept for the percentiles on /stats and /metrics (600 x 0.5s = 5 minutes)
+EVENT_LOOP_LAG_WINDOW = int(os.getenv('EVENT_LOOP_LAG_WINDOW', 600))
+# Callbacks holding the event loop longer than this many seconds are logged by name.
+# Off (0) by default: it runs asyncio in debug mode, which captures a traceback for
+# every scheduled callback and coroutine, so only enable it while investigating lag
+SLOW_CALLBACK_THRESHOLD = float(os.getenv('SLOW_CALLBACK_THRESHOLD', 0))
+# REST requests per second the bulk operations (lockdown, purge, mass ban) may make
+# between them (Discord's global limit is 50)
+RATE_LIMIT_GLOBAL_PER_SECOND = float(os.getenv('RATE_LIMIT_GLOBAL_PER_SECOND', 45))
+
+
+# Connection pool for database
+db_pool = None
+# Last error from init_moderation_database (None once it succeeds or if it failed on config)
+db_init_error = None
+# Bounds how many moderation case insert batches may be in flight at once
+case_log_semaphore = asyncio.Semaphore(CASE_LOG_MAX_IN_FLIGHT)
+# Write-behind queue shared by create_mod_case and log_moderation_case
+case_batcher = ModerationCaseBatcher(CASE_BATCH_MAX_SIZE, CASE_BATCH_MAX_DELAY_MS / 1000)
+# Read-through cache in front of get_user_warnings/get_user_mod_cases/get_user_mod_notes
+history_cache = UserHistoryCache(HISTORY_CACHE_MAX_USERS, HISTORY_CACHE_TTL)
+
+
+# ============================================================================
+# DISCORD HTTP METRICS AND BULK PACING
+# ============================================================================
+# discord.py's HTTPClient already keeps per-route buckets from the
+# X-RateLimit-* headers and waits out 429s (including global ones), so REST
+# calls are left to it. DiscordHttpStats only observes: the client's aiohttp
+# trace hooks count requests and 429 responses per route for /metrics.
+#
+# The bulk operations (lockdown edits, purge deletes, mass ban batches) also
+# take a token from bulk_pacer before each call, which keeps a large guild's
+# lockdown or purge under RATE_LIMIT_GLOBAL_PER_SECOND instead of running into
+# Discord's global limit and stalling every other command behind it.
+
+# Snowflakes, interaction/webhook tokens and reaction emoji in REST paths, replaced
+# so each route is one metric series
+HTTP_ROUTE_PREFIX = re.compile(r'^/api/v\d+')
+HTTP_ROUTE_ID = re.compile(r'/\d{15,20}(?=/|$)')
+HTTP_ROUTE_TOKEN = re.compile(r'(/(?:interactions|webhooks)/\{id\})/[^/]+')
+HTTP_ROUTE_EMOJI = re.compile(r'(/reactions)/[^/]+')
+
+
+def http_route_key(method: str, path: str) -> str:
+    """'GET /channels/{id}/messages' style route for a Discord API request path"""
+    path = HTTP_ROUTE_ID.sub('/{id}', HTTP_ROUTE_PREFIX.sub('', path))
+    path = HTTP_ROUTE_EMOJI.sub(r'\1/{emoji}', HTTP_ROUTE_TOKEN.sub(r'\1/{token}', path))
+    return f"{method} {path}"
+
+
+class DiscordHttpStats:
+    """Counts Discord REST requests and 429 responses by route, from aiohttp trace hooks"""
+
+    def __init__(self):
+        self.requests_by_route = Counter()
+        self.rate_limited_by_route = Counter()
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_request_end.append(self._on_request_end)
+
+    async def _on_request_end(self, session, trace_context, params):
+        if not params.url.path.startswith('/api/'):
+            return  # CDN downloads (avatars, attachments) share the session
+        route = http_route_key(params.method, params.url.path)
+        self.requests_by_route[route] += 1
+        if params.response.status == 429:
+            self.rate_limited_by_route[route] += 1
+            retry_after = params.response.headers.get('Retry-After', '?')
+            scope = 'global' if params.response.headers.get('X-RateLimit-Global') else 'route'
+            print(f"⚠️ [RATE LIMIT] 429 ({scope}) on {route}, discord.py retries after {retry_after}s", flush=True)
+
+
+class TokenBucket:
+    """Continuously refilling token bucket (rate tokens per second, up to capacity)"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.delayed = 0
+        self.total_delay = 0.0
+
+    def reserve(self) -> float:
+        """Take a token, returning how long to wait before using it (0 if one is free now)"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        # Tokens go negative while callers queue; each one waits for its own refill
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def wait(self):
+        """Take a token, sleeping until it is available"""
+        delay = self.reserve()
+        if delay > 0:
+            self.delayed += 1
+            self.total_delay += delay
+            record_phase('rate_limit_wait', delay)
+            await asyncio.sleep(delay)
+
+
+http_stats = DiscordHttpStats()
+bulk_pacer = TokenBucket(RATE_LIMIT_GLOBAL_PER_SECOND, RATE_LIMIT_GLOBAL_PER_SECOND)
+
+
+def build_client_options(lean_mode: bool) -> Dict:
+    """
+    Intents and member cache settings for normal or lean mode
+
+    Normal mode receives presences and caches every member (exact status and
+    bot/human counts). Lean mode drops the presences intent, only caches
+    members in voice and skips startup chunking; status numbers then come from
+    Discord's approximate counts instead.
+    """
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.members = True
+    intents.presences = not lean_mode
+
+    if lean_mode:
+        member_cache_flags = discord.MemberCacheFlags.none()
+        member_cache_flags.voice = True
+    else:
+        member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+
+    return {
+        'intents': intents,
+        'member_cache_flags': member_cache_flags,
+        'chunk_guilds_at_startup': not lean_mode,
+        'http_trace': http_stats.trace_config,
+    }
+
+
+bot = commands.Bot(command_prefix='!', **build_client_options(LEAN_MODE))
+
+
+if TOKEN:
+    print("Token Found")
+else:
+    print("Token not found")
+if CLIENT:
+    print("Client found")
+else:
+    print("Client not found")
+if URL:
+    print("URL found")
+    print(URL)
+else:
+    print("URL not found")
+
+
+def check_auth(request):
+    """Check if the request has valid basic auth credentials"""
+    auth_header = request.headers.get('Authorization', '')
+
+    if not auth_header.startswith('Basic '):
+        return False
+
+    try:
+        encoded = auth_header[6:]
+        decoded = base64.b64decode(encoded).decode('utf-8')
+        username, password = decoded.split(':', 1)
+        return username == STATS_USER and password == STATS_PASS
+    except:
+        return False
+
+
+def require_auth_response():
+    """Return a 401 response requiring authentication"""
+    return web.Response(
+        text='Authentication Required',
+        status=401,
+        headers={'WWW-Authenticate': 'Basic realm="Stats Access"'}
+    )
+
+
+# ============================================================================
+# BOT LIFECYCLE
+# ============================================================================
+# setup_hook runs exactly once per process, before the first gateway connect.
+# Everything that must exist for the whole life of the process (database pool,
+# web server, background tasks) is started there and torn down in
+# shutdown_lifecycle(). on_ready / on_resumed only record gateway events.
+
+# aiohttp runner for the status pages, set by start_web_server()
+web_runner = None
+# Long-running tasks owned by the lifecycle (cancelled on shutdown)
+background_tasks = set()
+# Gateway session counters
+gateway_stats = {
+    'ready_count': 0,      # full IDENTIFY handshakes (first connect + reconnects)
+    'resume_count': 0,     # sessions resumed without a new READY
+    'disconnect_count': 0,
+    'last_ready': None,
+    'last_resumed': None,
+    'last_disconnect': None,
+}
+
+
+def start_background_task(coro, name: str) -> asyncio.Task:
+    """Start a task that lives until shutdown_lifecycle() cancels it"""
+    task = asyncio.get_running_loop().create_task(coro, name=name)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+# ============================================================================
+# EVENT LOOP MONITOR
+# ============================================================================
+# Gateway heartbeats, commands, database calls and the status pages all share
+# one event loop, so anything that holds it too long delays heartbeats - the
+# cause of the reconnect storms in Crash_Summery.md. event_loop_lag_loop()
+# measures how late a timer fires and keeps a rolling window of samples for
+# the percentiles on /stats and /metrics. With SLOW_CALLBACK_THRESHOLD set,
+# asyncio debug mode reports every callback that ran longer than that, and
+# SlowCallbackHandler records which coroutine it was.
+
+event_loop_lag_samples = deque(maxlen=EVENT_LOOP_LAG_WINDOW)
+slow_callbacks = Counter()
+slow_callback_log = deque(maxlen=SLOW_COMMAND_LOG_SIZE)
+
+# Task reprs look like "<Task pending name='...' coro=<slash_ban() running at ...>>",
+# other callbacks like "<Handle DiscordWebSocket.poll_event() created at ...>"
+SLOW_CALLBACK_NAME = re.compile(r"coro=<([^\s(>]+)|Handle (?:when=\S+ )?([^\s(>]+)")
+
+
+def event_loop_lag_percentiles() -> Dict:
+    """p50/p95/p99/max lag in seconds over the rolling window"""
+    samples = sorted(event_loop_lag_samples)
+    if not samples:
+        return {'samples': 0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+
+    def pick(pct):
+        return samples[min(len(samples) - 1, int(pct / 100 * len(samples)))]
+
+    return {'samples': len(samples), 'p50': pick(50), 'p95': pick(95), 'p99': pick(99), 'max': samples[-1]}
+
+
+async def event_loop_lag_loop():
+    """Background task: measure how late the event loop wakes a sleeping task"""
+    while True:
+        expected = time.perf_counter() + EVENT_LOOP_LAG_INTERVAL
+        await asyncio.sleep(EVENT_LOOP_LAG_INTERVAL)
+        lag = max(time.perf_counter() - expected, 0.0)
+        event_loop_lag.observe('', lag)
+        event_loop_lag_samples.append(lag)
+
+
+class SlowCallbackHandler(logging.Handler):
+    """Picks up asyncio's "Executing <handle> took N seconds" debug mode warnings"""
+
+    def emit(self, record: logging.LogRecord):
+        if record.msg != 'Executing %s took %.3f seconds':
+            return
+        handle, duration = record.args
+        match = SLOW_CALLBACK_NAME.search(handle)
+        name = (match.group(1) or match.group(2)) if match else handle[:80]
+
+        slow_callbacks[name] += 1
+        slow_callback_log.append({'callback': name, 'at': datetime.now(), 'duration': duration})
+        print(f"🐌 Event loop blocked for {duration * 1000:.0f}ms by {name}", flush=True)
+
+
+def enable_slow_callback_detection():
+    """Turn on asyncio debug mode so callbacks slower than SLOW_CALLBACK_THRESHOLD are reported"""
+    if SLOW_CALLBACK_THRESHOLD <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    loop.slow_callback_duration = SLOW_CALLBACK_THRESHOLD
+    loop.set_debug(True)
+    logging.getLogger('asyncio').addHandler(SlowCallbackHandler(logging.WARNING))
+    print(f"🐌 Slow callback detection on (threshold {SLOW_CALLBACK_THRESHOLD * 1000:.0f}ms) - "
+          f"asyncio debug mode slows every callback, turn it off when done", flush=True)
+
+
+def start_database_tasks():
+    """Start the tasks that need the database, once the pool is up"""
+    start_background_task(db_health_check_loop(), 'db-health-check')
+    # on_ready skips the audit log sync while there is no pool, so a database
+    # that came up late has to start it here
+    if bot.is_ready():
+        start_audit_log_sync()
+
+
+@bot.event
+async def setup_hook():
+    """Runs once before the bot connects - starts the web server and database"""
+    print(f"[{datetime.now()}] Running setup_hook...", flush=True)
+    await start_web_server()
+    start_background_task(event_loop_lag_loop(), 'event-loop-lag')
+    enable_slow_callback_detection()
+
+    print("🔄 Initializing moderation database...", flush=True)
+    if await init_moderation_database():
+        print("✅ Moderation database ready", flush=True)
+        start_database_tasks()
+    else:
+        print("⚠️ Moderation database initialization failed", flush=True)
+        if db_init_error is not None:
+            start_background_task(database_startup_retry_loop(), 'db-startup-retry')
+
+    if LEAN_MODE:
+        print("🪶 Lean mode: presences intent off, minimal member cache, approximate counts", flush=True)
+    else:
+        start_background_task(member_counter_reconcile_loop(), 'member-counter-reconcile')
+
+
+async def shutdown_lifecycle():
+    """Stop background tasks, flush queued cases and release the pool and web server"""
+    global web_runner
+
+    print(f"[{datetime.now()}] 🛑 Shutting down...", flush=True)
+
+    for task in list(background_tasks):
+        task.cancel()
+    if background_tasks:
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+
+    # Write out any moderation cases still waiting in the batch queue
+    if db_pool is not None:
+        try:
+            await asyncio.wait_for(case_batcher.drain(), timeout=CASE_LOG_TIMEOUT)
+        except asyncio.TimeoutError:
+            print("⚠️ Timed out flushing queued moderation cases", flush=True)
+
+    if web_runner is not None:
+        await web_runner.cleanup()
+        web_runner = None
+        print("✅ Web server stopped", flush=True)
+
+    await shutdown_database()
+
+
+@bot.event
+async def on_resumed():
+    gateway_stats['resume_count'] += 1
+    gateway_stats['last_resumed'] = datetime.now()
+    print(f"[{datetime.now()}] 🔁 Gateway session resumed "
+          f"(resumes: {gateway_stats['resume_count']})", flush=True)
+
+
+@bot.event
+async def on_disconnect():
+    gateway_stats['disconnect_count'] += 1
+    gateway_stats['last_disconnect'] = datetime.now()
+
+
+# ============================================================================
+# AUDIT LOG MIRROR
+# ============================================================================
+# /userinfo used to page through guild.audit_logs() on every call. Instead,
+# kick/ban/unban/timeout entries are mirrored in memory from the
+# audit_log_entry_create gateway event and indexed by (guild_id, target_id).
+# A guild's recent history is backfilled once, lazily, on its first lookup;
+# after that every lookup is a dictionary read.
+
+# Audit log actions kept in the mirror, and the name each is recorded under
+MIRRORED_AUDIT_ACTIONS = {
+    discord.AuditLogAction.kick: 'kick',
+    discord.AuditLogAction.ban: 'ban',
+    discord.AuditLogAction.unban: 'unban',
+    discord.AuditLogAction.member_update: 'timeout',
+}
+
+
+def audit_entry_record(entry: discord.AuditLogEntry) -> Optional[Dict]:
+    """Convert an audit log entry to a mirror record, or None if it is not a moderation action"""
+    action = MIRRORED_AUDIT_ACTIONS.get(entry.action)
+    if action is None:
+        return None
+
+    if action == 'timeout':
+        # member_update covers nick/role edits too; only keep timeouts being applied
+        before_timeout = getattr(entry.before, 'timed_out_until', None)
+        after_timeout = getattr(entry.after, 'timed_out_until', None)
+        if before_timeout == after_timeout or after_timeout is None:
+            return None
+
+    target = entry.target
+    target_id = target if isinstance(target, int) else getattr(target, 'id', None)
+    if target_id is None:
+        return None
+
+    return {
+        'entry_id': entry.id,
+        'guild_id': entry.guild.id,
+        'action': action,
+        'target_id': target_id,
+        'moderator_id': entry.user_id,
+        'reason': entry.reason,
+        'created_at': entry.created_at,
+    }
+
+
+class GuildAuditLog:
+    """Mirrored moderation entries for one guild"""
+
+    def __init__(self):
+        self.records = {}       # entry_id -> record
+        self.order = []         # entry ids, oldest first (snowflakes sort by time)
+        self.by_target = {}     # target_id -> entry ids, oldest first
+        self.backfilled = False
+        self.truncated = False  # older entries exist than the mirror holds
+        self.backfill_lock = asyncio.Lock()
+
+
+class AuditLogMirror:
+    """
+    Bounded per-guild mirror of moderation audit log entries
+
+    Each guild keeps at most max_entries records; the oldest are evicted first
+    and the guild is then marked truncated so callers know the mirror no longer
+    holds its full history.
+    """
+
+    def __init__(self, max_entries: int, backfill_limit: int):
+        self.max_entries = max_entries
+        self.backfill_limit = backfill_limit
+        self._guilds = {}
+        self.events = 0
+        self.backfills = 0
+        self.lookups = 0
+
+    def _guild(self, guild_id: int) -> GuildAuditLog:
+        log = self._guilds.get(guild_id)
+        if log is None:
+            log = self._guilds[guild_id] = GuildAuditLog()
+        return log
+
+    def add(self, record: Dict) -> bool:
+        """Index a record; returns False if the entry was already mirrored"""
+        log = self._guild(record['guild_id'])
+        entry_id = record['entry_id']
+        if entry_id in log.records:
+            return False
+
+        log.records[entry_id] = record
+        bisect.insort(log.order, entry_id)
+        bisect.insort(log.by_target.setdefault(record['target_id'], []), entry_id)
+
+        while len(log.order) > self.max_entries:
+            evicted = log.records.pop(log.order.pop(0))
+            target_ids = log.by_target[evicted['target_id']]
+            # The globally oldest entry is also the oldest for its target
+            target_ids.pop(0)
+            if not target_ids:
+                del log.by_target[evicted['target_id']]
+            log.truncated = True
+
+        return True
+
+    async def ensure_backfilled(self, guild: discord.Guild):
+        """Load the guild's recent moderation entries once (raises discord.Forbidden without View Audit Log)"""
+        log = self._guild(guild.id)
+        if log.backfilled:
+            return
+
+        async with log.backfill_lock:
+            if log.backfilled:
+                return
+
+            for audit_action in MIRRORED_AUDIT_ACTIONS:
+                fetched = 0
+                async for entry in guild.audit_logs(limit=self.backfill_limit, action=audit_action):
+                    fetched += 1
+                    record = audit_entry_record(entry)
+                    if record is not None:
+                        self.add(record)
+                if fetched >= self.backfill_limit:
+                    log.truncated = True
+
+            log.backfilled = True
+            self.backfills += 1
+            print(f"📋 Audit log mirror backfilled for {guild.name}: {len(log.order)} moderation entries",
+                  flush=True)
+
+    def history(self, guild_id: int, target_id: int, limit: int = None) -> List[Dict]:
+        """Mirrored moderation actions against a user, newest first"""
+        self.lookups += 1
+        log = self._guilds.get(guild_id)
+        if log is None:
+            return []
+        entry_ids = log.by_target.get(target_id, [])
+        newest_first = reversed(entry_ids) if limit is None else reversed(entry_ids[-limit:])
+        return [log.records[entry_id] for entry_id in newest_first]
+
+    def is_complete(self, guild_id: int) -> bool:
+        """True when the mirror holds every entry Discord still has for this guild"""
+        log = self._guilds.get(guild_id)
+        return log is not None and log.backfilled and not log.truncated
+
+    def forget_guild(self, guild_id: int):
+        self._guilds.pop(guild_id, None)
+
+    def stats(self) -> Dict:
+        return {
+            'guilds': len(self._guilds),
+            'entries': sum(len(log.order) for log in self._guilds.values()),
+            'events': self.events,
+            'backfills': self.backfills,
+            'lookups': self.lookups,
+        }
+
+
+audit_log_mirror = AuditLogMirror(AUDIT_MIRROR_MAX_ENTRIES, AUDIT_MIRROR_BACKFILL_LIMIT)
+
+# Guilds whose persisted audit log is caught up in this gateway session. Live
+# events only advance a guild's cursor once it is in here; otherwise a cursor
+# could jump past entries missed while the bot was offline.
+audit_synced_guilds = set()
+# Live events are persisted one at a time per guild, in gateway order, and
+# never while the guild is being synced, so the cursor cannot pass an entry
+# that is still being written or failed
+audit_event_locks = defaultdict(asyncio.Lock)
+# Guilds with a catch-up sync scheduled after a failed live write
+audit_resync_pending = set()
+# Current sync_all_audit_logs() task (restarted on every READY)
+audit_sync_task = None
+
+
+async def sync_guild_audit_log(guild: discord.Guild) -> Optional[int]:
+    """
+    Persist the guild's moderation audit log entries newer than its cursor
+
+    The first sync of a guild takes the newest AUDIT_SYNC_INITIAL_LIMIT entries
+    per action; later syncs only fetch the delta since the cursor. Returns the
+    number of new rows, or None if the guild could not be synced.
+    """
+    if db_pool is None or not guild.me.guild_permissions.view_audit_log:
+        return None
+
+    # Live events for the guild wait until the sync is done, so a failed live
+    # write either happens before the fetch (and is fetched) or after it
+    async with audit_event_locks[guild.id]:
+        return await _sync_guild_audit_log(guild)
+
+
+async def _sync_guild_audit_log(guild: discord.Guild) -> Optional[int]:
+    cursor = await get_audit_cursor(guild.id)
+    records = []
+    newest_entry_id = cursor or 0
+
+    for audit_action in MIRRORED_AUDIT_ACTIONS:
+        if cursor is None:
+            entries = guild.audit_logs(limit=AUDIT_SYNC_INITIAL_LIMIT, action=audit_action)
+        else:
+            entries = guild.audit_logs(limit=None, action=audit_action, after=discord.Object(id=cursor))
+
+        async for entry in entries:
+            newest_entry_id = max(newest_entry_id, entry.id)
+            record = audit_entry_record(entry)
+            if record is not None:
+                records.append(record)
+
+    inserted = await persist_audit_entries(records)
+    if inserted is None:
+        return None
+
+    for record in records:
+        audit_log_mirror.add(record)
+    if newest_entry_id and not await advance_audit_cursor(guild.id, newest_entry_id):
+        return None
+
+    audit_synced_guilds.add(guild.id)
+    return inserted
+
+
+async def sync_all_audit_logs():
+    """Catch every guild's persisted audit log up after a (re)connect, one guild at a time"""
+    synced = inserted = 0
+    for guild in list(bot.guilds):
+        try:
+            new_rows = await sync_guild_audit_log(guild)
+        except discord.HTTPException as e:
+            print(f"⚠️ Audit log sync failed for {guild.name}: {e}", flush=True)
+            continue
+        if new_rows is not None:
+            synced += 1
+            inserted += new_rows
+
+    print(f"📋 Audit log sync complete: {synced}/{len(bot.guilds)} guild(s), {inserted} new entries",
+          flush=True)
+
+
+def start_audit_log_sync():
+    """(Re)start the audit log sync; called on every READY"""
+    global audit_sync_task
+
+    if db_pool is None:
+        return
+    if audit_sync_task is not None and not audit_sync_task.done():
+        audit_sync_task.cancel()
+    # A new session may have missed events, so every guild must catch up again
+    audit_synced_guilds.clear()
+    audit_sync_task = start_background_task(sync_all_audit_logs(), 'audit-log-sync')
+
+
+@bot.event
+async def on_audit_log_entry_create(entry: discord.AuditLogEntry):
+    record = audit_entry_record(entry)
+    if record is None:
+        return
+
+    if audit_log_mirror.add(record):
+        audit_log_mirror.events += 1
+
+    if db_pool is not None:
+        async with audit_event_locks[entry.guild.id]:
+            stored = await persist_audit_entries([record])
+            if stored is None:
+                # Keep the cursor at the last stored entry until a sync fills the gap
+                audit_synced_guilds.discard(entry.guild.id)
+                schedule_audit_resync(entry.guild)
+            elif entry.guild.id in audit_synced_guilds:
+                await advance_audit_cursor(entry.guild.id, entry.id)
 
-    try:
-        print(f"🔍 [DATABASE] Fetching mod notes for user ID {user_id}...")
 
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+def schedule_audit_resync(guild: discord.Guild):
+    """Re-sync a guild from its cursor after AUDIT_SYNC_RETRY_DELAY (once at a time)"""
+    if guild.id in audit_resync_pending:
+        return
+    audit_resync_pending.add(guild.id)
 
-        cur.execute('''SELECT *
-                       FROM moderation_notes
-                       WHERE guild_id = %s
-                         AND user_id = %s
-                       ORDER BY created_at DESC''',
-                    (guild_id, user_id))
+    async def resync():
+        try:
+            while guild.id not in audit_synced_guilds and db_pool is not None:
+                await asyncio.sleep(AUDIT_SYNC_RETRY_DELAY)
+                if bot.get_guild(guild.id) is None or not guild.me.guild_permissions.view_audit_log:
+                    return
+                try:
+                    await sync_guild_audit_log(guild)
+                except discord.HTTPException as e:
+                    print(f"⚠️ Audit log re-sync failed for {guild.name}: {e}", flush=True)
+        finally:
+            audit_resync_pending.discard(guild.id)
 
-        rows = cur.fetchall()
-        cur.close()
-        return_db_connection(conn)
+    print(f"⚠️ Audit log entry for {guild.name} not stored; re-syncing in {AUDIT_SYNC_RETRY_DELAY:.0f}s",
+          flush=True)
+    start_background_task(resync(), f'audit-log-resync-{guild.id}')
 
-        print(f"✅ [DATABASE] Found {len(rows)} note(s)")
-        return [dict(row) for row in rows]
 
-    except Exception as e:
-        print(f"❌ [DATABASE] Error getting mod notes: {type(e).__name__}")
-        print(f"   💥 Details: {e}")
-        return []
+@bot.event
+async def on_guild_join(guild: discord.Guild):
+    role_index.rebuild(guild)
+    if not LEAN_MODE:
+        member_counters.rebuild(guild)
+    if db_pool is not None:
+        start_background_task(sync_guild_audit_log(guild), f'audit-log-sync-{guild.id}')
 
 
-def delete_mod_note(note_id: int, guild_id: int) -> bool:
-    """Delete a moderation note"""
-    if db_pool is None:
-        return False
+@bot.event
+async def on_guild_remove(guild: discord.Guild):
+    audit_log_mirror.forget_guild(guild.id)
+    audit_synced_guilds.discard(guild.id)
+    audit_event_locks.pop(guild.id, None)
+    member_counters.forget_guild(guild.id)
+    approximate_counts.forget_guild(guild.id)
+    role_index.forget_guild(guild.id)
 
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
 
-        cur.execute('''DELETE
-                       FROM moderation_notes
-                       WHERE note_id = %s
-                         AND guild_id = %s''',
-                    (note_id, guild_id))
+# ============================================================================
+# MEMBER COUNTERS
+# ============================================================================
+# /serverinfo and /membercount used to make five passes over guild.members per
+# call. Per-guild totals are now kept up to date from member join/remove and
+# presence events, so both commands read them in O(1). A guild's counters are
+# rebuilt in one pass when first needed, when its member list finishes
+# chunking, and by the reconcile task, which also reports any drift.
+
+def status_bucket(status: discord.Status) -> str:
+    """Counter a presence status falls under (invisible members show as offline)"""
+    if status in (discord.Status.online, discord.Status.idle, discord.Status.dnd):
+        return status.value
+    return 'offline'
+
+
+class MemberCounters:
+    """Incrementally maintained member, bot and presence totals per guild"""
+
+    COUNTER_KEYS = ('members', 'bots', 'online', 'idle', 'dnd', 'offline')
+
+    def __init__(self):
+        self._counts = {}
+        # Guilds whose counters were built before their member list was chunked
+        self._partial = set()
+        self.rebuilds = 0
+        self.reconciles = 0
+        self.drift_corrections = 0
+
+    @classmethod
+    def count_members(cls, guild: discord.Guild) -> Dict[str, int]:
+        """Count a guild's cached members in a single pass"""
+        counts = dict.fromkeys(cls.COUNTER_KEYS, 0)
+        for member in guild.members:
+            counts['members'] += 1
+            if member.bot:
+                counts['bots'] += 1
+            counts[status_bucket(member.status)] += 1
+        return counts
+
+    def rebuild(self, guild: discord.Guild) -> Dict[str, int]:
+        counts = self._counts[guild.id] = self.count_members(guild)
+        if guild.chunked:
+            self._partial.discard(guild.id)
+        else:
+            self._partial.add(guild.id)
+        self.rebuilds += 1
+        return counts
+
+    def get(self, guild: discord.Guild) -> Dict[str, int]:
+        """Current totals for a guild (humans = members - bots)"""
+        counts = self._counts.get(guild.id)
+        if counts is None or (guild.id in self._partial and guild.chunked):
+            counts = self.rebuild(guild)
+        return dict(counts, humans=counts['members'] - counts['bots'])
+
+    def member_joined(self, member: discord.Member):
+        counts = self._counts.get(member.guild.id)
+        if counts is None:
+            return
+        counts['members'] += 1
+        if member.bot:
+            counts['bots'] += 1
+        counts[status_bucket(member.status)] += 1
+
+    def member_left(self, member: discord.Member):
+        counts = self._counts.get(member.guild.id)
+        if counts is None:
+            return
+        counts['members'] -= 1
+        if member.bot:
+            counts['bots'] -= 1
+        counts[status_bucket(member.status)] -= 1
+
+    def status_changed(self, before: discord.Member, after: discord.Member):
+        counts = self._counts.get(after.guild.id)
+        if counts is None:
+            return
+        old_bucket, new_bucket = status_bucket(before.status), status_bucket(after.status)
+        if old_bucket != new_bucket:
+            counts[old_bucket] -= 1
+            counts[new_bucket] += 1
 
-        rows_affected = cur.rowcount
-        conn.commit()
-        cur.close()
-        return_db_connection(conn)
+    def reconcile(self, guild: discord.Guild) -> int:
+        """Recount a guild from the member cache; returns how far the counters had drifted"""
+        old = self._counts.get(guild.id)
+        new = self.rebuild(guild)
+        self.reconciles += 1
+        if old is None:
+            return 0
+        drift = sum(abs(new[key] - old[key]) for key in self.COUNTER_KEYS)
+        if drift:
+            self.drift_corrections += 1
+        return drift
 
-        return rows_affected > 0
+    def forget_guild(self, guild_id: int):
+        self._counts.pop(guild_id, None)
+        self._partial.discard(guild_id)
 
-    except Exception as e:
-        print(f"❌ Error deleting mod note: {e}")
-        if conn:
-            conn.rollback()
-            return_db_connection(conn)
-        return False
 
+member_counters = MemberCounters()
 
-# ============================================================================
-# CLEANUP FUNCTION
-# ============================================================================
 
-def close_database():
+class ApproximateCountCache:
     """
-    Close all database connections and clean up the connection pool.
-    Called when the bot shuts down.
+    Lean mode source for member/status numbers: Discord's approximate counts
+    from fetch_guild(with_counts=True), reused per guild for ttl seconds.
+    Concurrent lookups for the same guild share one request.
     """
-    global db_pool
-
-    try:
-        if db_pool is None:
-            print("✅ No database pool to close")
-            return
-
-        # Close all connections in the pool
-        db_pool.closeall()
-        print("✅ All database connections closed successfully")
 
-    except Exception as e:
-        print(f"❌ Error closing database connections: {e}")
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._counts = {}
+        self._pending = {}
+        self.fetches = 0
 
+    async def get(self, guild_id: int) -> Dict[str, int]:
+        cached = self._counts.get(guild_id)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
 
-# ============================================================================
-# CLEANUP FUNCTION
-# ============================================================================
+        pending = self._pending.get(guild_id)
+        if pending is None:
+            pending = self._pending[guild_id] = asyncio.ensure_future(self._fetch(guild_id))
+            pending.add_done_callback(lambda _: self._pending.pop(guild_id, None))
+        return await asyncio.shield(pending)
 
+    async def _fetch(self, guild_id: int) -> Dict[str, int]:
+        fetched = await bot.fetch_guild(guild_id, with_counts=True)
+        counts = {
+            'members': fetched.approximate_member_count,
+            'present': fetched.approximate_presence_count,
+        }
+        self._counts[guild_id] = (time.monotonic(), counts)
+        self.fetches += 1
+        return counts
 
-# ============================================================================
-# END OF DATABASE FUNCTIONS
-# ============================================================================
-# Remember to:
-# 1. Add SUPABASE_URL to your .env file
-# 2. Call init_moderation_database() in the on_ready event
-# 3. Call close_database() in the finally block of __main__
-# ============================================================================
-# End Initalization
+    def forget_guild(self, guild_id: int):
+        self._counts.pop(guild_id, None)
 
 
-intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
-intents.presences = True  # Add this line
-bot = commands.Bot(command_prefix='!', intents=intents)
+approximate_counts = ApproximateCountCache(APPROX_COUNT_TTL)
 
 
-def close_database():
+async def get_guild_member_stats(guild: discord.Guild) -> Dict:
     """
-    Close all database connections and clean up the connection pool.
-    Called when the bot shuts down.
+    Member and status totals for /serverinfo and /membercount
+
+    Exact counters normally. In lean mode: approximate totals, where 'present'
+    is everyone online, idle or dnd, and per-status and bot counts are None.
     """
-    global db_pool
+    if not LEAN_MODE:
+        return dict(member_counters.get(guild), approximate=False)
+
+    counts = await approximate_counts.get(guild.id)
+    return {
+        'members': counts['members'],
+        'present': counts['present'],
+        'offline': counts['members'] - counts['present'],
+        'online': None, 'idle': None, 'dnd': None,
+        'bots': None, 'humans': None,
+        'approximate': True,
+    }
+
+
+async def member_counter_reconcile_loop():
+    """Background task: periodically recount every guild (and re-index its roles) and log any drift"""
+    while True:
+        await asyncio.sleep(MEMBER_COUNTER_RECONCILE_INTERVAL)
+        if not bot.is_ready():
+            continue
+
+        for guild in list(bot.guilds):
+            drift = member_counters.reconcile(guild)
+            if drift:
+                print(f"⚠️ Member counters for {guild.name} drifted by {drift}, corrected", flush=True)
+            role_index.rebuild(guild)
+            # Let gateway events through between guilds
+            await asyncio.sleep(0)
 
-    try:
-        if db_pool is None:
-            print("✅ No database pool to close")
-            return
 
-        # Close all connections in the pool
-        db_pool.closeall()
-        print("✅ All database connections closed successfully")
+@bot.event
+async def on_member_join(member: discord.Member):
+    member_counters.member_joined(member)
+    role_index.member_joined(member)
 
-    except Exception as e:
-        print(f"❌ Error closing database connections: {e}")
 
-def load_env_file(filepath='.env'):
-    if not os.path.exists(filepath):
-        print(f"Warning: {filepath} not found")
-        return
+@bot.event
+async def on_member_remove(member: discord.Member):
+    member_counters.member_left(member)
+    role_index.member_left(member)
 
-    with open(filepath, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line and not line.startswith('#'):
-                if '=' in line:
-                    key, value = line.split('=', 1)
-                    value = value.strip().strip('"').strip("'")
-                    os.environ[key.strip()] = value
 
+@bot.event
+async def on_presence_update(before: discord.Member, after: discord.Member):
+    member_counters.status_changed(before, after)
 
-load_env_file()
 
-TOKEN = os.getenv('DISCORD_TOKEN')
-CLIENT = os.getenv('DISCORD_CLIENT_ID')
-URL = os.getenv('DISCORD_BOT_URL')
-PORT = os.getenv('PORT', 10000)
-STATS_USER = os.getenv('STATS_USER', 'admin')
-STATS_PASS = os.getenv('STATS_PASS', 'changeme')
-# Supabase Database URL (will be loaded from .env)
-SUPABASE_URL = os.getenv('SUPABASE_URL')
+# ============================================================================
+# ROLE MEMBERSHIP INDEX
+# ============================================================================
+# discord.py's role.members scans every cached member. The index keeps each
+# role's member IDs per guild, updated from member and role events, so
+# /role-count, /roleinfo and /rolemembers get counts in O(1) and only resolve
+# the members on the page being shown.
+
+def member_role_ids(member: discord.Member) -> set:
+    """IDs of a member's roles, without @everyone"""
+    return {role.id for role in member.roles if not role.is_default()}
+
+
+class RoleIndex:
+    """Per-guild role ID -> member ID sets, maintained from gateway events"""
+
+    def __init__(self):
+        self._roles = {}        # guild_id -> {role_id: set of member ids}
+        self._sorted = {}       # (guild_id, role_id) -> member ids sorted, for paging
+        self._partial = set()   # guilds indexed before their member list was chunked
+        self.rebuilds = 0
+
+    def rebuild(self, guild: discord.Guild):
+        roles = {}
+        for member in guild.members:
+            for role_id in member_role_ids(member):
+                roles.setdefault(role_id, set()).add(member.id)
+        self._roles[guild.id] = roles
+        self._drop_sorted(guild.id)
+        if guild.chunked:
+            self._partial.discard(guild.id)
+        else:
+            self._partial.add(guild.id)
+        self.rebuilds += 1
+
+    def _guild_roles(self, guild: discord.Guild) -> Dict[int, set]:
+        roles = self._roles.get(guild.id)
+        if roles is None or (guild.id in self._partial and guild.chunked):
+            self.rebuild(guild)
+            roles = self._roles[guild.id]
+        return roles
+
+    def _drop_sorted(self, guild_id: int, role_id: int = None):
+        if role_id is not None:
+            self._sorted.pop((guild_id, role_id), None)
+            return
+        for key in [key for key in self._sorted if key[0] == guild_id]:
+            del self._sorted[key]
+
+    def _add(self, guild_id: int, role_id: int, member_id: int):
+        self._roles[guild_id].setdefault(role_id, set()).add(member_id)
+        self._drop_sorted(guild_id, role_id)
+
+    def _remove(self, guild_id: int, role_id: int, member_id: int):
+        members = self._roles[guild_id].get(role_id)
+        if members is not None:
+            members.discard(member_id)
+            if not members:
+                del self._roles[guild_id][role_id]
+        self._drop_sorted(guild_id, role_id)
+
+    def member_joined(self, member: discord.Member):
+        if member.guild.id in self._roles:
+            for role_id in member_role_ids(member):
+                self._add(member.guild.id, role_id, member.id)
+
+    def member_left(self, member: discord.Member):
+        if member.guild.id in self._roles:
+            for role_id in member_role_ids(member):
+                self._remove(member.guild.id, role_id, member.id)
+
+    def member_updated(self, before: discord.Member, after: discord.Member):
+        if after.guild.id not in self._roles:
+            return
+        before_roles, after_roles = member_role_ids(before), member_role_ids(after)
+        if before_roles == after_roles:
+            return
+        for role_id in after_roles - before_roles:
+            self._add(after.guild.id, role_id, after.id)
+        for role_id in before_roles - after_roles:
+            self._remove(after.guild.id, role_id, after.id)
 
+    def role_deleted(self, role: discord.Role):
+        roles = self._roles.get(role.guild.id)
+        if roles is not None:
+            roles.pop(role.id, None)
+            self._drop_sorted(role.guild.id, role.id)
 
-# Connection pool for database
-db_pool = None
+    def count(self, role: discord.Role) -> int:
+        return len(self._guild_roles(role.guild).get(role.id, ()))
 
+    def is_partial(self, guild: discord.Guild) -> bool:
+        """
+        Whether the index only covers part of the guild's members
 
-if TOKEN:
-    print("Token Found")
-else:
-    print("Token not found")
-if CLIENT:
-    print("Client found")
-else:
-    print("Client not found")
-if URL:
-    print("URL found")
-    print(URL)
-else:
-    print("URL not found")
+        In lean mode only voice members are cached, and members that leave voice
+        drop out of the cache without any role events, so counts are never exact.
+        Without lean mode the index is partial until the guild has been chunked.
+        """
+        return LEAN_MODE or not guild.chunked
 
+    def page(self, role: discord.Role, page_index: int, page_size: int) -> List[int]:
+        """Member IDs on one page of a role's members (ordered by member ID)"""
+        key = (role.guild.id, role.id)
+        ordered = self._sorted.get(key)
+        if ordered is None:
+            ordered = self._sorted[key] = sorted(self._guild_roles(role.guild).get(role.id, ()))
+        start = page_index * page_size
+        return ordered[start:start + page_size]
 
-def check_auth(request):
-    """Check if the request has valid basic auth credentials"""
-    auth_header = request.headers.get('Authorization', '')
+    def forget_guild(self, guild_id: int):
+        self._roles.pop(guild_id, None)
+        self._partial.discard(guild_id)
+        self._drop_sorted(guild_id)
 
-    if not auth_header.startswith('Basic '):
-        return False
 
-    try:
-        encoded = auth_header[6:]
-        decoded = base64.b64decode(encoded).decode('utf-8')
-        username, password = decoded.split(':', 1)
-        return username == STATS_USER and password == STATS_PASS
-    except:
-        return False
+role_index = RoleIndex()
 
 
-def require_auth_response():
-    """Return a 401 response requiring authentication"""
-    return web.Response(
-        text='Authentication Required',
-        status=401,
-        headers={'WWW-Authenticate': 'Basic realm="Stats Access"'}
-    )
+def format_role_count(role: discord.Role) -> str:
+    """Member count of a role for embeds, flagged when the index is partial"""
+    count = role_index.count(role)
+    if role_index.is_partial(role.guild):
+        return f"**{count}** (cached members only)"
+    return f"**{count}**"
 
 
 @bot.event
-async def setup_hook():
-    """Runs before bot connects - starts web server immediately"""
-    print(f"[{datetime.now()}] Running setup_hook...", flush=True)
-    await start_web_server()
+async def on_member_update(before: discord.Member, after: discord.Member):
+    role_index.member_updated(before, after)
 
 
-async def health_check(request):
-    global bot_updating, bot_emergency_shutdown, bot_owner_sleeping
-    # Add this line at the top
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    role_index.role_deleted(role)
 
-    if bot_start_time is None:
-        return web.Response(
-            text="Bot is starting up, please wait...",
-            content_type='text/plain',
-            status=503
-        )
 
-    # Check if bot is in emergency shutdown mode
-    if bot_emergency_shutdown:
-        html = """
+# ============================================================================
+# STATUS PAGES
+# ============================================================================
+# The dynamic status pages are string.Template objects built once at import
+# (the emergency and update pages have no fields and are plain strings), so a
+# request only substitutes a handful of fields instead of rebuilding kilobytes
+# of inline CSS with f-strings. Rendered pages are cached per state
+# (normal/sleeping/updating/emergency, plus /stats) for STATUS_PAGE_TTL
+# seconds; the static pages are rendered only once. Every page carries an
+# ETag, and monitors sending a matching If-None-Match get a bodiless 304 while
+# the cached page is still current.
+
+STATUS_PAGE_EMERGENCY = """
         <!DOCTYPE html>
         <html>
         <head>
@@ -987,26 +3053,20 @@ async def health_check(request):
         </body>
         </html>
         """
-        return web.Response(text=html, content_type='text/html', status=503)
 
-    # Check if owner is sleeping
-    if bot_owner_sleeping:
-        uptime = datetime.now() - bot_start_time
-        hours, remainder = divmod(int(uptime.total_seconds()), 3600)
-        minutes, seconds = divmod(remainder, 60)
-        html = f"""
+STATUS_PAGE_SLEEPING = Template("""
         <!DOCTYPE html>
         <html>
         <head>
             <title>Discord Bot Status</title>
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
             <style>
-                * {{
+                * {
                     margin: 0;
                     padding: 0;
                     box-sizing: border-box;
-                }}
-                body {{
+                }
+                body {
                     font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
                     background: linear-gradient(180deg, #003366 0%, #006699 50%, #003366 100%);
                     min-height: 100vh;
@@ -1016,8 +3076,8 @@ async def health_check(request):
                     padding: 20px;
                     position: relative;
                     overflow: hidden;
-                }}
-                body::before {{
+                }
+                body::before {
                     content: '';
                     position: absolute;
                     top: 0;
@@ -1028,27 +3088,27 @@ async def health_check(request):
                         radial-gradient(ellipse at 30% 30%, rgba(0, 200, 255, 0.15) 0%, transparent 50%),
                         radial-gradient(ellipse at 70% 70%, rgba(0, 150, 200, 0.15) 0%, transparent 50%);
                     animation: oceanWaves 10s ease-in-out infinite;
-                }}
-                @keyframes oceanWaves {{
-                    0%, 100% {{ opacity: 0.5; }}
-                    50% {{ opacity: 0.8; }}
-                }}
-                .fish {{
+                }
+                @keyframes oceanWaves {
+                    0%, 100% { opacity: 0.5; }
+                    50% { opacity: 0.8; }
+                }
+                .fish {
                     position: absolute;
                     font-size: 25px;
                     opacity: 0.4;
                     animation: fishSwim 15s linear infinite;
-                }}
-                .fish:nth-child(1) {{ top: 20%; animation-delay: 0s; }}
-                .fish:nth-child(2) {{ top: 50%; animation-delay: 5s; }}
-                .fish:nth-child(3) {{ top: 80%; animation-delay: 10s; }}
-                @keyframes fishSwim {{
-                    0% {{ left: -100px; transform: scaleX(1); }}
-                    48% {{ transform: scaleX(1); }}
-                    52% {{ transform: scaleX(-1); }}
-                    100% {{ left: 110%; transform: scaleX(-1); }}
-                }}
-                .container {{
+                }
+                .fish:nth-child(1) { top: 20%; animation-delay: 0s; }
+                .fish:nth-child(2) { top: 50%; animation-delay: 5s; }
+                .fish:nth-child(3) { top: 80%; animation-delay: 10s; }
+                @keyframes fishSwim {
+                    0% { left: -100px; transform: scaleX(1); }
+                    48% { transform: scaleX(1); }
+                    52% { transform: scaleX(-1); }
+                    100% { left: 110%; transform: scaleX(-1); }
+                }
+                .container {
                     background: rgba(0, 60, 100, 0.9);
                     border-radius: 20px;
                     box-shadow: 0 20px 60px rgba(0, 0, 0, 0.5), inset 0 0 40px rgba(0, 200, 255, 0.1);
@@ -1059,8 +3119,8 @@ async def health_check(request):
                     position: relative;
                     z-index: 10;
                     border: 2px solid rgba(0, 200, 255, 0.3);
-                }}
-                .status-icon {{
+                }
+                .status-icon {
                     width: 100px;
                     height: 100px;
                     background: linear-gradient(135deg, #00cc88 0%, #008855 100%);
@@ -1071,39 +3131,39 @@ async def health_check(request):
                     margin: 0 auto 20px;
                     animation: pulse 2s infinite;
                     border: 3px solid rgba(0, 204, 136, 0.5);
-                }}
-                @keyframes pulse {{
-                    0%, 100% {{
+                }
+                @keyframes pulse {
+                    0%, 100% {
                         transform: scale(1);
                         box-shadow: 0 0 20px rgba(0, 204, 136, 0.5);
-                    }}
-                    50% {{
+                    }
+                    50% {
                         transform: scale(1.05);
                         box-shadow: 0 0 40px rgba(0, 204, 136, 0.8);
-                    }}
-                }}
-                .shark-icon {{
+                    }
+                }
+                .shark-icon {
                     font-size: 50px;
-                }}
-                h1 {{
+                }
+                h1 {
                     color: #e0f7ff;
                     margin-bottom: 10px;
                     font-size: 28px;
                     text-shadow: 0 0 10px rgba(0, 200, 255, 0.5);
-                }}
-                .status {{
+                }
+                .status {
                     color: #00ff88;
                     font-weight: bold;
                     font-size: 18px;
                     margin-bottom: 30px;
                     text-shadow: 0 0 10px rgba(0, 255, 136, 0.5);
-                }}
-                .info-grid {{
+                }
+                .info-grid {
                     display: grid;
                     gap: 15px;
                     margin-top: 30px;
-                }}
-                .info-item {{
+                }
+                .info-item {
                     background: rgba(0, 100, 150, 0.3);
                     padding: 15px;
                     border-radius: 10px;
@@ -1111,21 +3171,21 @@ async def health_check(request):
                     justify-content: space-between;
                     align-items: center;
                     border: 1px solid rgba(0, 200, 255, 0.2);
-                }}
-                .info-label {{
+                }
+                .info-label {
                     color: #7eb8d6;
                     font-weight: 500;
-                }}
-                .info-value {{
+                }
+                .info-value {
                     color: #e0f7ff;
                     font-weight: bold;
-                }}
-                .bot-name {{
+                }
+                .bot-name {
                     color: #00ddff;
                     font-weight: bold;
                     text-shadow: 0 0 5px rgba(0, 221, 255, 0.5);
-                }}
-                .github-button {{
+                }
+                .github-button {
                     display: inline-block;
                     margin-top: 20px;
                     padding: 12px 24px;
@@ -1136,21 +3196,21 @@ async def health_check(request):
                     border: 2px solid rgba(100, 180, 220, 0.3);
                     transition: all 0.3s ease;
                     font-weight: 500;
-                }}
-                .github-button:hover {{
+                }
+                .github-button:hover {
                     background: rgba(48, 54, 61, 1);
                     border-color: rgba(100, 180, 220, 0.6);
                     transform: translateY(-2px);
                     box-shadow: 0 4px 12px rgba(0, 0, 0, 0.3);
-                }}
-                @media (max-width: 480px) {{
-                    .container {{
+                }
+                @media (max-width: 480px) {
+                    .container {
                         padding: 30px 20px;
-                    }}
-                    h1 {{
+                    }
+                    h1 {
                         font-size: 24px;
-                    }}
-                }}
+                    }
+                }
             </style>
         </head>
         <body>
@@ -1166,19 +3226,19 @@ async def health_check(request):
                 <div class="info-grid">
                     <div class="info-item">
                         <span class="info-label">🦈 Shark Name</span>
-                        <span class="info-value bot-name">{bot.user.name if bot.user else "Loading..."}</span>
+                        <span class="info-value bot-name">$bot_name</span>
                     </div>
                     <div class="info-item">
                         <span class="info-label">⏱️ Swim Time</span>
-                        <span class="info-value">{hours}h {minutes}m {seconds}s</span>
+                        <span class="info-value">$uptime</span>
                     </div>
                     <div class="info-item">
                         <span class="info-label">🏝️ Ocean Territories</span>
-                        <span class="info-value">{len(bot.guilds)}</span>
+                        <span class="info-value">$guilds</span>
                     </div>
                     <div class="info-item">
                         <span class="info-label">📡 Sonar Ping</span>
-                        <span class="info-value">{round(bot.latency * 1000)}ms</span>
+                        <span class="info-value">${latency}ms</span>
                     </div>
                 </div>
                 <a href="https://github.com/soryntech/discord-moderation-bot-" target="_blank" class="github-button">
@@ -1191,12 +3251,9 @@ async def health_check(request):
             </div>
         </body>
         </html>
-"""
-        return web.Response(text=html, content_type='text/html', status=200)
+""")
 
-    # Check if bot is in update mode
-    if bot_updating:
-        html = """
+STATUS_PAGE_UPDATING = """
         <!DOCTYPE html>
         <html>
         <head>
@@ -1348,25 +3405,20 @@ async def health_check(request):
         </body>
         </html>
         """
-        return web.Response(text=html, content_type='text/html', status=503)
 
-    # Normal status (bot is running)
-    uptime = datetime.now() - bot_start_time
-    hours, remainder = divmod(int(uptime.total_seconds()), 3600)
-    minutes, seconds = divmod(remainder, 60)
-    html = f"""
+STATUS_PAGE_NORMAL = Template("""
     <!DOCTYPE html>
     <html>
     <head>
         <title>Discord Bot Status</title>
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <style>
-            * {{
+            * {
                 margin: 0;
                 padding: 0;
                 box-sizing: border-box;
-            }}
-            body {{
+            }
+            body {
                 font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
                 background: linear-gradient(180deg, #003366 0%, #006699 50%, #003366 100%);
                 min-height: 100vh;
@@ -1376,8 +3428,8 @@ async def health_check(request):
                 padding: 20px;
                 position: relative;
                 overflow: hidden;
-            }}
-            body::before {{
+            }
+            body::before {
                 content: '';
                 position: absolute;
                 top: 0;
@@ -1388,27 +3440,27 @@ async def health_check(request):
                     radial-gradient(ellipse at 30% 30%, rgba(0, 200, 255, 0.15) 0%, transparent 50%),
                     radial-gradient(ellipse at 70% 70%, rgba(0, 150, 200, 0.15) 0%, transparent 50%);
                 animation: oceanWaves 10s ease-in-out infinite;
-            }}
-            @keyframes oceanWaves {{
-                0%, 100% {{ opacity: 0.5; }}
-                50% {{ opacity: 0.8; }}
-            }}
-            .fish {{
+            }
+            @keyframes oceanWaves {
+                0%, 100% { opacity: 0.5; }
+                50% { opacity: 0.8; }
+            }
+            .fish {
                 position: absolute;
                 font-size: 25px;
                 opacity: 0.4;
                 animation: fishSwim 15s linear infinite;
-            }}
-            .fish:nth-child(1) {{ top: 20%; animation-delay: 0s; }}
-            .fish:nth-child(2) {{ top: 50%; animation-delay: 5s; }}
-            .fish:nth-child(3) {{ top: 80%; animation-delay: 10s; }}
-            @keyframes fishSwim {{
-                0% {{ left: -100px; transform: scaleX(1); }}
-                48% {{ transform: scaleX(1); }}
-                52% {{ transform: scaleX(-1); }}
-                100% {{ left: 110%; transform: scaleX(-1); }}
-            }}
-            .container {{
+            }
+            .fish:nth-child(1) { top: 20%; animation-delay: 0s; }
+            .fish:nth-child(2) { top: 50%; animation-delay: 5s; }
+            .fish:nth-child(3) { top: 80%; animation-delay: 10s; }
+            @keyframes fishSwim {
+                0% { left: -100px; transform: scaleX(1); }
+                48% { transform: scaleX(1); }
+                52% { transform: scaleX(-1); }
+                100% { left: 110%; transform: scaleX(-1); }
+            }
+            .container {
                 background: rgba(0, 60, 100, 0.9);
                 border-radius: 20px;
                 box-shadow: 0 20px 60px rgba(0, 0, 0, 0.5), inset 0 0 40px rgba(0, 200, 255, 0.1);
@@ -1419,8 +3471,8 @@ async def health_check(request):
                 position: relative;
                 z-index: 10;
                 border: 2px solid rgba(0, 200, 255, 0.3);
-            }}
-            .status-icon {{
+            }
+            .status-icon {
                 width: 100px;
                 height: 100px;
                 background: linear-gradient(135deg, #00cc88 0%, #008855 100%);
@@ -1431,39 +3483,39 @@ async def health_check(request):
                 margin: 0 auto 20px;
                 animation: pulse 2s infinite;
                 border: 3px solid rgba(0, 204, 136, 0.5);
-            }}
-            @keyframes pulse {{
-                0%, 100% {{
+            }
+            @keyframes pulse {
+                0%, 100% {
                     transform: scale(1);
                     box-shadow: 0 0 20px rgba(0, 204, 136, 0.5);
-                }}
-                50% {{
+                }
+                50% {
                     transform: scale(1.05);
                     box-shadow: 0 0 40px rgba(0, 204, 136, 0.8);
-                }}
-            }}
-            .shark-icon {{
+                }
+            }
+            .shark-icon {
                 font-size: 50px;
-            }}
-            h1 {{
+            }
+            h1 {
                 color: #e0f7ff;
                 margin-bottom: 10px;
                 font-size: 28px;
                 text-shadow: 0 0 10px rgba(0, 200, 255, 0.5);
-            }}
-            .status {{
+            }
+            .status {
                 color: #00ff88;
                 font-weight: bold;
                 font-size: 18px;
                 margin-bottom: 30px;
                 text-shadow: 0 0 10px rgba(0, 255, 136, 0.5);
-            }}
-            .info-grid {{
+            }
+            .info-grid {
                 display: grid;
                 gap: 15px;
                 margin-top: 30px;
-            }}
-            .info-item {{
+            }
+            .info-item {
                 background: rgba(0, 100, 150, 0.3);
                 padding: 15px;
                 border-radius: 10px;
@@ -1471,21 +3523,21 @@ async def health_check(request):
                 justify-content: space-between;
                 align-items: center;
                 border: 1px solid rgba(0, 200, 255, 0.2);
-            }}
-            .info-label {{
+            }
+            .info-label {
                 color: #7eb8d6;
                 font-weight: 500;
-            }}
-            .info-value {{
+            }
+            .info-value {
                 color: #e0f7ff;
                 font-weight: bold;
-            }}
-            .bot-name {{
+            }
+            .bot-name {
                 color: #00ddff;
                 font-weight: bold;
                 text-shadow: 0 0 5px rgba(0, 221, 255, 0.5);
-            }}
-            .github-button {{
+            }
+            .github-button {
                 display: inline-block;
                 margin-top: 20px;
                 padding: 12px 24px;
@@ -1496,21 +3548,21 @@ async def health_check(request):
                 border: 2px solid rgba(100, 180, 220, 0.3);
                 transition: all 0.3s ease;
                 font-weight: 500;
-            }}
-            .github-button:hover {{
+            }
+            .github-button:hover {
                 background: rgba(48, 54, 61, 1);
                 border-color: rgba(100, 180, 220, 0.6);
                 transform: translateY(-2px);
                 box-shadow: 0 4px 12px rgba(0, 0, 0, 0.3);
-            }}
-            @media (max-width: 480px) {{
-                .container {{
+            }
+            @media (max-width: 480px) {
+                .container {
                     padding: 30px 20px;
-                }}
-                h1 {{
+                }
+                h1 {
                     font-size: 24px;
-                }}
-            }}
+                }
+            }
         </style>
     </head>
     <body>
@@ -1526,19 +3578,19 @@ async def health_check(request):
             <div class="info-grid">
                 <div class="info-item">
                     <span class="info-label">🦈 Shark Name</span>
-                    <span class="info-value bot-name">{bot.user.name if bot.user else "Loading..."}</span>
+                    <span class="info-value bot-name">$bot_name</span>
                 </div>
                 <div class="info-item">
                     <span class="info-label">⏱️ Swim Time</span>
-                    <span class="info-value">{hours}h {minutes}m {seconds}s</span>
+                    <span class="info-value">$uptime</span>
                 </div>
                 <div class="info-item">
                     <span class="info-label">🏝️ Ocean Territories</span>
-                    <span class="info-value">{len(bot.guilds)}</span>
+                    <span class="info-value">$guilds</span>
                 </div>
                 <div class="info-item">
                     <span class="info-label">📡 Sonar Ping</span>
-                    <span class="info-value">{round(bot.latency * 1000)}ms</span>
+                    <span class="info-value">${latency}ms</span>
                 </div>
             </div>
             <a href="https://github.com/soryntech/discord-moderation-bot-" target="_blank" class="github-button">
@@ -1551,33 +3603,9 @@ async def health_check(request):
         </div>
     </body>
     </html>
-    """
-    return web.Response(text=html, content_type='text/html')
-
-
-async def stats_page(request):
-    """Password-protected detailed stats page"""
-    # Check authentication
-    if not check_auth(request):
-        return require_auth_response()
-
-    # Calculate uptime
-    uptime = datetime.now() - bot_start_time
-    days = uptime.days
-    hours, remainder = divmod(uptime.seconds, 3600)
-    minutes, seconds = divmod(remainder, 60)
-
-    # Safe latency calculation with fallback
-    try:
-        latency_ms = round(bot.latency * 1000) if bot.latency is not None else 0
-    except (TypeError, ValueError):
-        latency_ms = 0
-
-    # Get guild list
-    guild_list = "\n".join([f"                <li>{guild.name} ({guild.member_count} members)</li>"
-                            for guild in bot.guilds])
+    """)
 
-    html = f"""
+STATS_PAGE = Template("""
     <!DOCTYPE html>
     <html>
     <head>
@@ -1585,99 +3613,99 @@ async def stats_page(request):
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <meta http-equiv="refresh" content="30">
         <style>
-            * {{
+            * {
                 margin: 0;
                 padding: 0;
                 box-sizing: border-box;
-            }}
-            body {{
+            }
+            body {
                 font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
                 background: linear-gradient(180deg, #003366 0%, #006699 50%, #003366 100%);
                 min-height: 100vh;
                 padding: 20px;
                 color: #e0f7ff;
-            }}
-            .container {{
+            }
+            .container {
                 max-width: 1200px;
                 margin: 0 auto;
-            }}
-            .header {{
+            }
+            .header {
                 text-align: center;
                 padding: 40px 20px;
                 background: rgba(0, 60, 100, 0.9);
                 border-radius: 20px;
                 margin-bottom: 30px;
                 border: 2px solid rgba(0, 200, 255, 0.3);
-            }}
-            h1 {{
+            }
+            h1 {
                 font-size: 2.5em;
                 margin-bottom: 10px;
                 text-shadow: 0 0 10px rgba(0, 200, 255, 0.5);
-            }}
-            .stats-grid {{
+            }
+            .stats-grid {
                 display: grid;
                 grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
                 gap: 20px;
                 margin-bottom: 30px;
-            }}
-            .stat-card {{
+            }
+            .stat-card {
                 background: rgba(0, 60, 100, 0.9);
                 border-radius: 15px;
                 padding: 25px;
                 border: 2px solid rgba(0, 200, 255, 0.3);
-            }}
-            .stat-card h2 {{
+            }
+            .stat-card h2 {
                 color: #00ddff;
                 margin-bottom: 15px;
                 font-size: 1.3em;
-            }}
-            .stat-item {{
+            }
+            .stat-item {
                 display: flex;
                 justify-content: space-between;
                 padding: 10px 0;
                 border-bottom: 1px solid rgba(0, 200, 255, 0.1);
-            }}
-            .stat-item:last-child {{
+            }
+            .stat-item:last-child {
                 border-bottom: none;
-            }}
-            .stat-label {{
+            }
+            .stat-label {
                 color: #7eb8d6;
-            }}
-            .stat-value {{
+            }
+            .stat-value {
                 color: #00ff88;
                 font-weight: bold;
-            }}
-            .guild-list {{
+            }
+            .guild-list {
                 background: rgba(0, 60, 100, 0.9);
                 border-radius: 15px;
                 padding: 25px;
                 border: 2px solid rgba(0, 200, 255, 0.3);
-            }}
-            .guild-list h2 {{
+            }
+            .guild-list h2 {
                 color: #00ddff;
                 margin-bottom: 15px;
-            }}
-            .guild-list ul {{
+            }
+            .guild-list ul {
                 list-style-position: inside;
                 color: #7eb8d6;
-            }}
-            .guild-list li {{
+            }
+            .guild-list li {
                 padding: 8px 0;
                 border-bottom: 1px solid rgba(0, 200, 255, 0.1);
-            }}
-            .footer {{
+            }
+            .footer {
                 text-align: center;
                 margin-top: 30px;
                 padding: 20px;
                 color: #7eb8d6;
-            }}
-            .refresh-note {{
+            }
+            .refresh-note {
                 background: rgba(0, 100, 150, 0.3);
                 padding: 10px;
                 border-radius: 8px;
                 display: inline-block;
                 margin-top: 10px;
-            }}
+            }
         </style>
     </head>
     <body>
@@ -1687,86 +3715,580 @@ async def stats_page(request):
                 <p>Detailed Bot Analytics & Monitoring</p>
             </div>
 
-            <div class="stats-grid">
+            <div class="stats-grid">
+                <div class="stat-card">
+                    <h2>📊 General Stats</h2>
+                    <div class="stat-item">
+                        <span class="stat-label">Bot Name</span>
+                        <span class="stat-value">$bot_name</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Bot ID</span>
+                        <span class="stat-value">$bot_id</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Total Guilds</span>
+                        <span class="stat-value">$guild_count</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Total Users</span>
+                        <span class="stat-value">$member_count</span>
+                    </div>
+                </div>
+
+                <div class="stat-card">
+                    <h2>⏱️ Uptime & Performance</h2>
+                    <div class="stat-item">
+                        <span class="stat-label">Uptime</span>
+                        <span class="stat-value">$uptime</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Latency</span>
+                        <span class="stat-value">${latency_ms}ms</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Started At</span>
+                        <span class="stat-value">$started_at</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Loop Lag p50 / p95 / p99</span>
+                        <span class="stat-value">$loop_lag</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Loop Lag Max / Slow Callbacks</span>
+                        <span class="stat-value">$loop_lag_max / $slow_callback_count</span>
+                    </div>
+                </div>
+
+                <div class="stat-card">
+                    <h2>🔧 Bot Status</h2>
+                    <div class="stat-item">
+                        <span class="stat-label">Emergency Shutdown</span>
+                        <span class="stat-value">$emergency_status</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Update Mode</span>
+                        <span class="stat-value">$update_status</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Owner Sleep Mode</span>
+                        <span class="stat-value">$sleep_status</span>
+                    </div>
+                </div>
+
                 <div class="stat-card">
-                    <h2>📊 General Stats</h2>
+                    <h2>🔌 Gateway</h2>
                     <div class="stat-item">
-                        <span class="stat-label">Bot Name</span>
-                        <span class="stat-value">{bot.user.name if bot.user else "Loading..."}</span>
+                        <span class="stat-label">Reconnects (new session)</span>
+                        <span class="stat-value">$reconnects</span>
                     </div>
                     <div class="stat-item">
-                        <span class="stat-label">Bot ID</span>
-                        <span class="stat-value">{bot.user.id if bot.user else "Loading..."}</span>
+                        <span class="stat-label">Resumes</span>
+                        <span class="stat-value">$resumes</span>
                     </div>
                     <div class="stat-item">
-                        <span class="stat-label">Total Guilds</span>
-                        <span class="stat-value">{len(bot.guilds)}</span>
+                        <span class="stat-label">Disconnects</span>
+                        <span class="stat-value">$disconnects</span>
                     </div>
                     <div class="stat-item">
-                        <span class="stat-label">Total Users</span>
-                        <span class="stat-value">{sum(g.member_count for g in bot.guilds)}</span>
+                        <span class="stat-label">Last Disconnect</span>
+                        <span class="stat-value">$last_disconnect</span>
                     </div>
                 </div>
 
                 <div class="stat-card">
-                    <h2>⏱️ Uptime & Performance</h2>
+                    <h2>🗄️ Database Pool</h2>
                     <div class="stat-item">
-                        <span class="stat-label">Uptime</span>
-                        <span class="stat-value">{days}d {hours}h {minutes}m {seconds}s</span>
+                        <span class="stat-label">In Use / Idle / Max</span>
+                        <span class="stat-value">$db_connections</span>
                     </div>
                     <div class="stat-item">
-                        <span class="stat-label">Latency</span>
-                        <span class="stat-value">{latency_ms}ms</span>
+                        <span class="stat-label">Checkout Wait (avg / max)</span>
+                        <span class="stat-value">$db_wait</span>
                     </div>
                     <div class="stat-item">
-                        <span class="stat-label">Started At</span>
-                        <span class="stat-value">{bot_start_time.strftime('%Y-%m-%d %H:%M UTC')}</span>
+                        <span class="stat-label">Checkout Timeouts</span>
+                        <span class="stat-value">$db_checkout_timeouts</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Leaks Detected</span>
+                        <span class="stat-value">$db_leaks</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Health Pings (ok / failed)</span>
+                        <span class="stat-value">$db_pings</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Last Ping</span>
+                        <span class="stat-value">$db_last_ping</span>
                     </div>
                 </div>
 
                 <div class="stat-card">
-                    <h2>🔧 Bot Status</h2>
+                    <h2>📋 Audit Log Mirror</h2>
                     <div class="stat-item">
-                        <span class="stat-label">Emergency Shutdown</span>
-                        <span class="stat-value">{'🔴 Active' if bot_emergency_shutdown else '🟢 Normal'}</span>
+                        <span class="stat-label">Mirrored Entries</span>
+                        <span class="stat-value">$audit_entries</span>
                     </div>
                     <div class="stat-item">
-                        <span class="stat-label">Update Mode</span>
-                        <span class="stat-value">{'🟡 Active' if bot_updating else '🟢 Normal'}</span>
+                        <span class="stat-label">Live Events / Backfills</span>
+                        <span class="stat-value">$audit_events</span>
                     </div>
                     <div class="stat-item">
-                        <span class="stat-label">Owner Sleep Mode</span>
-                        <span class="stat-value">{'😴 Active' if bot_owner_sleeping else '🟢 Awake'}</span>
+                        <span class="stat-label">Lookups</span>
+                        <span class="stat-value">$audit_lookups</span>
                     </div>
                 </div>
+
+                <div class="stat-card">
+                    <h2>🧠 History Cache</h2>
+                    <div class="stat-item">
+                        <span class="stat-label">Cached Users</span>
+                        <span class="stat-value">$cache_users</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Hits / Misses</span>
+                        <span class="stat-value">$cache_hits</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Hit Rate</span>
+                        <span class="stat-value">$cache_hit_rate</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Invalidations / Evictions</span>
+                        <span class="stat-value">$cache_invalidations</span>
+                    </div>
+                </div>
+
+                <div class="stat-card">
+                    <h2>🌐 Status Pages</h2>
+                    <div class="stat-item">
+                        <span class="stat-label">Cache Hits / Renders</span>
+                        <span class="stat-value">$page_hits / $page_renders</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-label">Not Modified (304)</span>
+                        <span class="stat-value">$page_not_modified</span>
+                    </div>
+                </div>
+            </div>
+            <div class="guild-list">
+                <h2>🐢 Slow Commands ($slow_command_count over ${slow_threshold}s)</h2>
+                <ul>
+$slow_command_list
+                 </ul>
+            </div>
+
+            <div class="guild-list">
+                <h2>🐌 Slow Callbacks ($slow_callback_threshold)</h2>
+                <ul>
+$slow_callback_list
+                 </ul>
             </div>
+
             <div class="guild-list">
-                <h2>🏝️ Connected Servers ({len(bot.guilds)})</h2>
+                <h2>🏝️ Connected Servers ($guild_count)</h2>
                 <ul>
-{guild_list}
+$guild_list
                  </ul>
             </div>
 
             <div class="footer">
                 <p>🦈 SorynTech Bot Suite - Shark Moderation Bot</p>
                 <div class="refresh-note">⟳ Auto-refreshing every 30 seconds</div>
-                <p style="margin-top: 10px; font-size: 0.9em;">Last Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}</p>
+                <p style="margin-top: 10px; font-size: 0.9em;">Last Updated: $updated_at</p>
             </div>
         </div>
     </body>
     </html>
-    """
-    return web.Response(text=html, content_type='text/html')
+    """)
+
+
+class StatusPageCache:
+    """Rendered pages by state, reused for a TTL and served with ETags"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._pages = {}
+        self.hits = 0
+        self.renders = 0
+        self.not_modified = 0
+
+    def respond(self, request, state: str, render, status: int = 200, static: bool = False) -> web.Response:
+        """
+        Serve the cached page for state, calling render() for a fresh copy once it expires
+
+        static pages never expire. Only 200 pages answer If-None-Match with a
+        304, so monitors always see the 503 of the emergency and update pages.
+        """
+        now = time.monotonic()
+        page = self._pages.get(state)
+        if page is None or now >= page[0]:
+            body = render().encode('utf-8')
+            etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+            page = self._pages[state] = (float('inf') if static else now + self.ttl, body, etag)
+            self.renders += 1
+        else:
+            self.hits += 1
+
+        _, body, etag = page
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if status == 200 and etag in request.headers.get('If-None-Match', '').replace(' ', '').split(','):
+            self.not_modified += 1
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body, status=status, content_type='text/html', charset='utf-8', headers=headers)
+
+    def stats(self) -> Dict:
+        return {'hits': self.hits, 'renders': self.renders, 'not_modified': self.not_modified}
+
+
+status_page_cache = StatusPageCache(STATUS_PAGE_TTL)
+
+
+def current_latency_ms() -> int:
+    # bot.latency is nan until the first heartbeat is acknowledged
+    try:
+        return round(bot.latency * 1000) if bot.latency is not None else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def status_page_fields() -> Dict:
+    uptime = datetime.now() - bot_start_time
+    hours, remainder = divmod(int(uptime.total_seconds()), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return {
+        'bot_name': html.escape(bot.user.name) if bot.user else "Loading...",
+        'uptime': f"{hours}h {minutes}m {seconds}s",
+        'guilds': len(bot.guilds),
+        'latency': current_latency_ms(),
+    }
+
+
+async def health_check(request):
+    if bot_start_time is None:
+        return web.Response(
+            text="Bot is starting up, please wait...",
+            content_type='text/plain',
+            status=503
+        )
+
+    # Check if bot is in emergency shutdown mode
+    if bot_emergency_shutdown:
+        return status_page_cache.respond(request, 'emergency', lambda: STATUS_PAGE_EMERGENCY,
+                                         status=503, static=True)
+
+    # Check if owner is sleeping
+    if bot_owner_sleeping:
+        return status_page_cache.respond(request, 'sleeping',
+                                         lambda: STATUS_PAGE_SLEEPING.substitute(status_page_fields()))
+
+    # Check if bot is in update mode
+    if bot_updating:
+        return status_page_cache.respond(request, 'updating', lambda: STATUS_PAGE_UPDATING,
+                                         status=503, static=True)
+
+    # Normal status (bot is running)
+    return status_page_cache.respond(request, 'normal',
+                                     lambda: STATUS_PAGE_NORMAL.substitute(status_page_fields()))
+
+
+def render_stats_page() -> str:
+    # Calculate uptime
+    uptime = datetime.now() - bot_start_time
+    days = uptime.days
+    hours, remainder = divmod(uptime.seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+
+    # Moderation history cache counters
+    cache_stats = history_cache.stats()
+
+    # Database pool usage and health
+    db_stats = get_pool_stats()
+    last_ping = f"{db_stats['last_ping_ms']:.1f} ms" if db_stats['last_ping_ms'] is not None else 'N/A'
+
+    # Audit log mirror counters
+    audit_stats = audit_log_mirror.stats()
+
+    # Status page cache counters
+    page_stats = status_page_cache.stats()
+
+    # Gateway session counters
+    last_disconnect = (gateway_stats['last_disconnect'].strftime('%Y-%m-%d %H:%M:%S')
+                       if gateway_stats['last_disconnect'] else 'Never')
+
+    # Latest slow commands with their phase breakdown, newest first
+    slow_command_list = "\n".join([
+        f"                <li>{entry['at'].strftime('%H:%M:%S')} /{html.escape(entry['command'])} "
+        f"{entry['total'] * 1000:.0f} ms"
+        + (f" (first response {entry['first_response'] * 1000:.0f} ms)" if entry['first_response'] is not None else "")
+        + " - "
+        + ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in entry['phases'].items())
+        + "</li>"
+        for entry in reversed(list(slow_command_log)[-10:])
+    ]) or "                <li>None recorded</li>"
+
+    # Event loop lag over the rolling window and the latest blocking callbacks
+    lag = event_loop_lag_percentiles()
+    slow_callback_list = "\n".join([
+        f"                <li>{entry['at'].strftime('%H:%M:%S')} {html.escape(entry['callback'])} "
+        f"{entry['duration'] * 1000:.0f} ms</li>"
+        for entry in reversed(list(slow_callback_log)[-10:])
+    ]) or ("                <li>None recorded</li>" if SLOW_CALLBACK_THRESHOLD > 0
+           else "                <li>Detection off (SLOW_CALLBACK_THRESHOLD=0)</li>")
+
+    # Get guild list
+    guild_list = "\n".join([f"                <li>{html.escape(guild.name)} ({guild.member_count} members)</li>"
+                            for guild in bot.guilds])
+
+    return STATS_PAGE.substitute(
+        bot_name=html.escape(bot.user.name) if bot.user else "Loading...",
+        bot_id=bot.user.id if bot.user else "Loading...",
+        guild_count=len(bot.guilds),
+        member_count=sum(g.member_count or 0 for g in bot.guilds),
+        uptime=f"{days}d {hours}h {minutes}m {seconds}s",
+        latency_ms=current_latency_ms(),
+        started_at=bot_start_time.strftime('%Y-%m-%d %H:%M UTC'),
+        loop_lag=f"{lag['p50'] * 1000:.1f} / {lag['p95'] * 1000:.1f} / {lag['p99'] * 1000:.1f} ms",
+        loop_lag_max=f"{lag['max'] * 1000:.1f} ms",
+        slow_callback_count=sum(slow_callbacks.values()),
+        emergency_status='🔴 Active' if bot_emergency_shutdown else '🟢 Normal',
+        update_status='🟡 Active' if bot_updating else '🟢 Normal',
+        sleep_status='😴 Active' if bot_owner_sleeping else '🟢 Awake',
+        reconnects=max(gateway_stats['ready_count'] - 1, 0),
+        resumes=gateway_stats['resume_count'],
+        disconnects=gateway_stats['disconnect_count'],
+        last_disconnect=last_disconnect,
+        db_connections=f"{db_stats['in_use']} / {db_stats['idle']} / {db_stats['max_size']}",
+        db_wait=f"{db_stats['wait_avg_ms']:.1f} / {db_stats['wait_max_ms']:.1f} ms",
+        db_checkout_timeouts=db_stats['checkout_timeouts'],
+        db_leaks=db_stats['leaks_detected'],
+        db_pings=f"{db_stats['pings_ok']} / {db_stats['pings_failed']}",
+        db_last_ping=last_ping,
+        audit_entries=f"{audit_stats['entries']} ({audit_stats['guilds']} guilds)",
+        audit_events=f"{audit_stats['events']} / {audit_stats['backfills']}",
+        audit_lookups=audit_stats['lookups'],
+        cache_users=f"{cache_stats['users']} / {cache_stats['max_users']}",
+        cache_hits=f"{cache_stats['hits']} / {cache_stats['misses']}",
+        cache_hit_rate=f"{cache_stats['hit_rate']:.1f}%",
+        cache_invalidations=f"{cache_stats['invalidations']} / {cache_stats['evictions']}",
+        page_hits=page_stats['hits'],
+        page_renders=page_stats['renders'],
+        page_not_modified=page_stats['not_modified'],
+        slow_command_count=sum(slow_commands.values()),
+        slow_threshold=f"{SLOW_COMMAND_THRESHOLD:g}",
+        slow_command_list=slow_command_list,
+        slow_callback_threshold=(f"over {SLOW_CALLBACK_THRESHOLD * 1000:.0f}ms" if SLOW_CALLBACK_THRESHOLD > 0
+                                 else "detection off"),
+        slow_callback_list=slow_callback_list,
+        guild_list=guild_list,
+        updated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC'),
+    )
+
+
+async def stats_page(request):
+    """Password-protected detailed stats page"""
+    # Check authentication
+    if not check_auth(request):
+        return require_auth_response()
+
+    return status_page_cache.respond(request, 'stats', render_stats_page)
+
+
+# ============================================================================
+# LIVENESS AND READINESS PROBES
+# ============================================================================
+# /livez and /readyz are small JSON documents for Render and uptime monitors:
+# no templates and no auth, just the flags and counters already in memory.
+# /livez answers 200 whenever the event loop can run a handler. /readyz
+# answers 503 unless the gateway session is up, the database (when one is
+# configured) is usable, and the bot is not in emergency shutdown or update mode.
+
+def _json_probe(payload: Dict, status: int) -> web.Response:
+    return web.Response(
+        text=json.dumps(payload, separators=(',', ':')),
+        status=status,
+        content_type='application/json',
+        headers={'Cache-Control': 'no-store'}
+    )
+
+
+def gateway_probe() -> Dict:
+    latency = bot.latency
+    connected = bot.is_ready() and not bot.is_closed() and bot.ws is not None and bot.ws.open
+    return {
+        'connected': connected,
+        'shard_id': bot.shard_id or 0,
+        'latency_ms': round(latency * 1000, 1) if latency is not None and math.isfinite(latency) else None,
+        'reconnects': max(gateway_stats['ready_count'] - 1, 0),
+        'resumes': gateway_stats['resume_count'],
+    }
+
+
+def database_probe() -> Dict:
+    if DATABASE_BACKEND == 'none':
+        return {'backend': 'none', 'ready': True}
+    return {
+        'backend': DATABASE_BACKEND,
+        # A failed health ping means the pool is being recycled
+        'ready': db_pool is not None and pool_stats['last_ping_ok'] is not False,
+        'in_use': len(_checked_out),
+        'max_size': pool_max_size(),
+        'error': db_init_error,
+    }
+
+
+async def livez(request):
+    return _json_probe({
+        'status': 'ok',
+        'uptime_s': int((datetime.now() - bot_start_time).total_seconds()) if bot_start_time else 0,
+    }, 200)
+
+
+async def readyz(request):
+    gateway = gateway_probe()
+    database = database_probe()
+    ready = gateway['connected'] and database['ready'] and not bot_emergency_shutdown and not bot_updating
+    return _json_probe({
+        'status': 'ready' if ready else 'not_ready',
+        'gateway': gateway,
+        'database': database,
+        'emergency_shutdown': bot_emergency_shutdown,
+        'updating': bot_updating,
+        'owner_sleeping': bot_owner_sleeping,
+    }, 200 if ready else 503)
+
+
+# ============================================================================
+# PROMETHEUS METRICS
+# ============================================================================
+# /metrics renders everything in the Prometheus text exposition format on
+# demand. Nothing is precomputed; each scrape reads the histograms from the
+# METRICS section plus the counters the pool, gateway, HTTP hooks and bulk pacer keep.
+# The endpoint is on the public port, so it requires the /stats credentials.
+
+def _label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_label_value(value)}"' for key, value in labels.items()) + '}'
+
+
+def _metric(lines: list, name: str, kind: str, help_text: str, samples):
+    """Append one metric family; samples are (labels dict, value) pairs"""
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+    for labels, value in samples:
+        lines.append(f'{name}{_labels(**labels)} {value}')
+
+
+def _histogram(lines: list, name: str, help_text: str, histogram: Histogram, labels: Tuple[str, ...] = ()):
+    """labels names the parts of the series key (a tuple key for several labels)"""
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for key, series in sorted(histogram.series.items()):
+        base = dict(zip(labels, key if isinstance(key, tuple) else (key,)))
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, series):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(**base, le=bound)} {cumulative}')
+        lines.append(f'{name}_bucket{_labels(**base, le="+Inf")} {series[-1]}')
+        lines.append(f'{name}_sum{_labels(**base)} {series[-2]}')
+        lines.append(f'{name}_count{_labels(**base)} {series[-1]}')
+
+
+def render_metrics() -> str:
+    lines = []
+    invocations = {name: series[-1] for name, series in command_duration.series.items()}
+    _metric(lines, 'modbot_commands_total', 'counter', 'Slash command invocations (completed or failed)',
+            [({'command': name}, count) for name, count in sorted(invocations.items())])
+    _metric(lines, 'modbot_command_errors_total', 'counter', 'Slash commands that raised, by error type',
+            [({'command': name, 'error': error}, count) for (name, error), count in sorted(command_errors.items())])
+    _histogram(lines, 'modbot_command_duration_seconds', 'Time from invocation to command completion',
+               command_duration, ('command',))
+    _histogram(lines, 'modbot_command_phase_seconds', 'Time spent in each phase of a command',
+               command_phase_duration, ('command', 'phase'))
+    _metric(lines, 'modbot_slow_commands_total', 'counter', 'Commands slower than SLOW_COMMAND_THRESHOLD',
+            [({'command': name}, count) for name, count in sorted(slow_commands.items())])
+
+    _metric(lines, 'modbot_discord_requests_total', 'counter', 'Discord REST requests by route',
+            [({'route': route}, count) for route, count in sorted(http_stats.requests_by_route.items())])
+    _metric(lines, 'modbot_discord_rate_limited_total', 'counter', 'Discord REST 429 responses by route',
+            [({'route': route}, count) for route, count in sorted(http_stats.rate_limited_by_route.items())])
+    _metric(lines, 'modbot_bulk_delayed_requests_total', 'counter',
+            'Bulk operation requests held back by the pacer', [({}, bulk_pacer.delayed)])
+    _metric(lines, 'modbot_bulk_delay_seconds_total', 'counter',
+            'Total time bulk operation requests waited for the pacer', [({}, bulk_pacer.total_delay)])
+
+    db_stats = get_pool_stats()
+    _histogram(lines, 'modbot_db_query_duration_seconds', 'Time each database helper held a pooled connection',
+               db_query_duration, ('helper',))
+    _metric(lines, 'modbot_db_pool_connections', 'gauge', 'Pooled database connections by state',
+            [({'state': 'in_use'}, db_stats['in_use']), ({'state': 'idle'}, db_stats['idle'])])
+    _metric(lines, 'modbot_db_pool_max_connections', 'gauge', 'Database pool size limit',
+            [({}, db_stats['max_size'] if db_pool is not None else 0)])
+    _metric(lines, 'modbot_db_checkout_wait_seconds_total', 'counter', 'Total time spent waiting for a connection',
+            [({}, db_stats['wait_total'])])
+    _metric(lines, 'modbot_db_checkout_timeouts_total', 'counter', 'Connection checkouts that timed out',
+            [({}, db_stats['checkout_timeouts'])])
+    _metric(lines, 'modbot_db_leaks_detected_total', 'counter', 'Checkouts held past DB_LEAK_THRESHOLD',
+            [({}, db_stats['leaks_detected'])])
+
+    _histogram(lines, 'modbot_event_loop_lag_seconds', 'How late the event loop woke a sleeping task',
+               event_loop_lag)
+    lag = event_loop_lag_percentiles()
+    _metric(lines, 'modbot_event_loop_lag_quantile_seconds', 'gauge',
+            f'Event loop lag percentiles over the last {EVENT_LOOP_LAG_WINDOW} samples',
+            [({'quantile': quantile}, lag[key]) for quantile, key in
+             (('0.5', 'p50'), ('0.95', 'p95'), ('0.99', 'p99'), ('1', 'max'))])
+    _metric(lines, 'modbot_slow_callbacks_total', 'counter',
+            'Callbacks that held the event loop longer than SLOW_CALLBACK_THRESHOLD',
+            [({'callback': name}, count) for name, count in sorted(slow_callbacks.items())])
+
+    latency = bot.latency
+    _metric(lines, 'modbot_guilds', 'gauge', 'Guilds the bot is in', [({}, len(bot.guilds))])
+    _metric(lines, 'modbot_members', 'gauge', 'Members across all guilds',
+            [({}, sum(guild.member_count or 0 for guild in bot.guilds))])
+    _metric(lines, 'modbot_gateway_latency_seconds', 'gauge', 'Gateway heartbeat latency',
+            [({}, latency if latency is not None and math.isfinite(latency) else 0)])
+    _metric(lines, 'modbot_gateway_reconnects_total', 'counter', 'Gateway sessions re-identified after the first',
+            [({}, max(gateway_stats['ready_count'] - 1, 0))])
+    _metric(lines, 'modbot_gateway_resumes_total', 'counter', 'Gateway sessions resumed',
+            [({}, gateway_stats['resume_count'])])
+    _metric(lines, 'modbot_gateway_disconnects_total', 'counter', 'Gateway disconnects',
+            [({}, gateway_stats['disconnect_count'])])
+    _metric(lines, 'modbot_uptime_seconds', 'gauge', 'Seconds since the bot first connected',
+            [({}, (datetime.now() - bot_start_time).total_seconds() if bot_start_time else 0)])
+    return '\n'.join(lines) + '\n'
+
+
+async def metrics(request):
+    """Prometheus metrics, behind the same basic auth as /stats (scrape with basic_auth)"""
+    if not check_auth(request):
+        return require_auth_response()
+
+    return web.Response(text=render_metrics(), content_type='text/plain', charset='utf-8',
+                        headers={'Cache-Control': 'no-store'})
+
+
 async def start_web_server():
+    global web_runner
+
     print(f"[{datetime.now()}] Starting web server on port {PORT}...", flush=True)
     app = web.Application()
     app.router.add_get('/', health_check)
     app.router.add_get('/health', health_check)
     app.router.add_get('/stats', stats_page)
+    app.router.add_get('/livez', livez)
+    app.router.add_get('/readyz', readyz)
+    app.router.add_get('/metrics', metrics)
 
-    runner = web.AppRunner(app)
-    await runner.setup()
-    site = web.TCPSite(runner, '0.0.0.0', PORT)
+    web_runner = web.AppRunner(app)
+    await web_runner.setup()
+    site = web.TCPSite(web_runner, '0.0.0.0', PORT)
     await site.start()
     print(f'[{datetime.now()}] ✅ Web server started on port {PORT}', flush=True)
     print(f'[{datetime.now()}] 📊 Stats page: http://0.0.0.0:{PORT}/stats (requires auth)', flush=True)
@@ -1775,18 +4297,29 @@ async def start_web_server():
 @bot.event
 async def on_ready():
     global bot_start_time, commands_synced
-    bot_start_time = datetime.now()
-    print(f'[{datetime.now()}] {bot.user} has connected to Discord!', flush=True)
 
-    # Initialize database FIRST, before anything else
-    print("🔄 Initializing moderation database...", flush=True)
-    db_init_success = init_moderation_database()
-    if db_init_success:
-        print("✅ Moderation database ready", flush=True)
+    # READY fires again after every full reconnect; the database pool and web
+    # server are owned by setup_hook, so only record the event here
+    gateway_stats['ready_count'] += 1
+    gateway_stats['last_ready'] = datetime.now()
+    if gateway_stats['ready_count'] > 1:
+        print(f'[{datetime.now()}] 🔁 {bot.user} reconnected with a new session '
+              f'(reconnects: {gateway_stats["ready_count"] - 1})', flush=True)
     else:
-        print("⚠️ Moderation database initialization failed", flush=True)
+        bot_start_time = datetime.now()
+        print(f'[{datetime.now()}] {bot.user} has connected to Discord!', flush=True)
+
+    # Member lists are chunked by now; a new session may have missed member
+    # and presence events, so recount from the fresh cache
+    for guild in bot.guilds:
+        role_index.rebuild(guild)
+        if not LEAN_MODE:
+            member_counters.rebuild(guild)
 
-    # Then sync commands
+    # Persist audit log entries created while the bot was offline or reconnecting
+    start_audit_log_sync()
+
+    # Sync commands
     if not commands_synced:
         try:
             print("Attempting to sync commands...", flush=True)
@@ -1857,9 +4390,129 @@ async def on_command_error(ctx, error):
 # =============================
 # FOR DISCORD.PY (app_commands)
 # =============================
+def command_elapsed(interaction: discord.Interaction) -> float:
+    """Seconds since the user invoked the command (interaction IDs carry their creation time)"""
+    return (discord.utils.utcnow() - interaction.created_at).total_seconds()
+
+
+# ============================================================================
+# COMMAND INSTRUMENTATION
+# ============================================================================
+# Every slash command is decorated with @timed_command (directly under
+# @bot.tree.command), so each invocation gets a CommandTiming in
+# current_command_timing. Code the command awaits adds its time to a phase
+# through record_phase():
+#   dispatch        - interaction created -> callback started (gateway + queueing)
+#   response        - the initial interaction response (defer/send_message)
+#   followup        - followup messages and edits of the response
+#   discord_api     - REST calls made with the bot token (DMs, kicks, bans, timeouts, sends)
+#   rate_limit_wait - time a bulk operation was held back by bulk_pacer
+#   db              - connection checkout, queries and waiting on queued case inserts
+#   other           - whatever is left (our own code)
+# REST calls, responses and followups are all timed from the client's
+# http_trace hooks, told apart by URL.
+# Phases are recorded into command_phase_duration, and commands slower than
+# SLOW_COMMAND_THRESHOLD are kept in slow_command_log for /stats.
+
+PHASES = ('dispatch', 'response', 'followup', 'discord_api', 'rate_limit_wait', 'db', 'other')
+
+# Interaction callback (initial response) and interaction webhook (followups, edits) URLs
+INTERACTION_RESPONSE_PATH = re.compile(r'/interactions/\d+/[^/]+/callback$')
+INTERACTION_WEBHOOK_PATH = re.compile(r'/webhooks/\d+/[^/]+(/|$)')
+
+# Most recent slow commands, newest last
+slow_command_log = deque(maxlen=SLOW_COMMAND_LOG_SIZE)
+slow_commands = Counter()
+
+
+class CommandTiming:
+    """Phase breakdown of one slash command invocation"""
+
+    def __init__(self, command: str, interaction: discord.Interaction):
+        self.command = command
+        self.created_at = interaction.created_at
+        self.started = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.phases['dispatch'] = max(command_elapsed(interaction), 0.0)
+        self.first_response = None
+
+    def finish(self):
+        total = self.phases['dispatch'] + time.perf_counter() - self.started
+        # Phases overlap when a command awaits things concurrently, so other can bottom out at 0
+        self.phases['other'] = max(total - sum(self.phases.values()), 0.0)
+        for phase, seconds in self.phases.items():
+            command_phase_duration.observe((self.command, phase), seconds)
+
+        if total >= SLOW_COMMAND_THRESHOLD:
+            slow_commands[self.command] += 1
+            slow_command_log.append({
+                'command': self.command,
+                'at': datetime.now(),
+                'total': total,
+                'first_response': self.first_response,
+                'phases': {phase: self.phases[phase] for phase in PHASES if self.phases[phase] >= 0.001},
+            })
+            breakdown = ', '.join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in
+                                  sorted(self.phases.items(), key=lambda item: -item[1]) if seconds >= 0.001)
+            print(f"🐢 Slow command /{self.command}: {total * 1000:.0f}ms ({breakdown})", flush=True)
+
+
+def timed_command(func):
+    """Record a phase breakdown for every invocation of a slash command callback"""
+    @functools.wraps(func)
+    async def wrapper(interaction: discord.Interaction, *args, **kwargs):
+        command = interaction.command.qualified_name if interaction.command else func.__name__
+        timing = CommandTiming(command, interaction)
+        token = current_command_timing.set(timing)
+        try:
+            return await func(interaction, *args, **kwargs)
+        finally:
+            current_command_timing.reset(token)
+            timing.finish()
+
+    return wrapper
+
+
+async def _trace_request_start(session, trace_context, params):
+    trace_context.command_phase_started = time.perf_counter()
+
+
+async def _trace_request_end(session, trace_context, params):
+    timing = current_command_timing.get()
+    started = getattr(trace_context, 'command_phase_started', None)
+    if timing is None or started is None:
+        return
+
+    path = params.url.path
+    if INTERACTION_RESPONSE_PATH.search(path):
+        record_phase('response', time.perf_counter() - started)
+        if timing.first_response is None:
+            timing.first_response = timing.phases['dispatch'] + time.perf_counter() - timing.started
+    elif INTERACTION_WEBHOOK_PATH.search(path):
+        record_phase('followup', time.perf_counter() - started)
+    else:
+        record_phase('discord_api', time.perf_counter() - started)
+
+
+# Must be registered before the client opens its HTTP session (aiohttp freezes the config then)
+http_stats.trace_config.on_request_start.append(_trace_request_start)
+http_stats.trace_config.on_request_end.append(_trace_request_end)
+http_stats.trace_config.on_request_exception.append(_trace_request_end)
+
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    command_duration.observe(command.qualified_name, command_elapsed(interaction))
+
+
 @bot.tree.error
 async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
     """Global error handler for app commands (discord.py)"""
+    if interaction.command is not None:
+        name = interaction.command.qualified_name
+        cause = error.original if isinstance(error, app_commands.CommandInvokeError) else error
+        command_errors[(name, type(cause).__name__)] += 1
+        command_duration.observe(name, command_elapsed(interaction))
 
     if isinstance(error, app_commands.MissingPermissions):
         message = "❌ You don't have permission to use this command!"
@@ -1902,6 +4555,21 @@ async def on_app_command_error(interaction: discord.Interaction, error: app_comm
         print(f"Failed to send error message: {e}")
 
 
+async def send_deferred_error(interaction: discord.Interaction, message: str):
+    """
+    Reply privately after a public defer()
+
+    Discord ignores ephemeral=True on the first followup after a public defer
+    (it replaces the "thinking..." message), so the placeholder is deleted
+    first and the error is sent as a new ephemeral message.
+    """
+    try:
+        await interaction.delete_original_response()
+    except discord.HTTPException:
+        pass
+    await interaction.followup.send(message, ephemeral=True)
+
+
 @app_commands.checks.has_permissions(kick_members=True)
 async def slash_kick(interaction: discord.Interaction, member: discord.Member, reason: str = "No reason provided"):
     """Kick a member from the server"""
@@ -1918,6 +4586,9 @@ async def slash_kick(interaction: discord.Interaction, member: discord.Member, r
             "❌ You cannot kick this member (their role is higher than or equal to yours).", ephemeral=True)
         return
 
+    # Case logging can wait up to CASE_LOG_TIMEOUT, longer than Discord's 3 second response window
+    await interaction.response.defer()
+
     try:
         # Log to database BEFORE kicking
         case_id = await log_moderation_case(
@@ -1964,13 +4635,13 @@ async def slash_kick(interaction: discord.Interaction, member: discord.Member, r
             embed.add_field(name="Case ID", value=f"#{case_id}", inline=False)
         embed.set_footer(text="SorynTech Moderation")
 
-        await interaction.response.send_message(embed=embed)
+        await interaction.followup.send(embed=embed)
         print(f"✅ {interaction.user} kicked {member} from {interaction.guild.name} | Case: {case_id}", flush=True)
 
     except discord.Forbidden:
-        await interaction.response.send_message("❌ I don't have permission to kick this member.", ephemeral=True)
+        await send_deferred_error(interaction, "❌ I don't have permission to kick this member.")
     except Exception as e:
-        await interaction.response.send_message(f"❌ An error occurred: {str(e)}", ephemeral=True)
+        await send_deferred_error(interaction, f"❌ An error occurred: {str(e)}")
         print(f"❌ Error in kick command: {e}", flush=True)
         import traceback
         traceback.print_exc()
@@ -1978,6 +4649,7 @@ async def slash_kick(interaction: discord.Interaction, member: discord.Member, r
 
 # Fixed BAN command with database logging
 @bot.tree.command(name="ban", description="Ban a member from the server")
+@timed_command
 @app_commands.describe(
     member="The member to ban",
     reason="Reason for banning",
@@ -2002,6 +4674,9 @@ async def slash_ban(interaction: discord.Interaction, member: discord.Member, re
             "❌ You cannot ban this member (their role is higher than or equal to yours).", ephemeral=True)
         return
 
+    # Case logging can wait up to CASE_LOG_TIMEOUT, longer than Discord's 3 second response window
+    await interaction.response.defer()
+
     try:
         case_id = await log_moderation_case(
             guild_id=interaction.guild.id,
@@ -2043,19 +4718,274 @@ async def slash_ban(interaction: discord.Interaction, member: discord.Member, re
             embed.add_field(name="Case ID", value=f"#{case_id}", inline=False)
         embed.set_footer(text="SorynTech Moderation")
 
-        await interaction.response.send_message(embed=embed)
+        await interaction.followup.send(embed=embed)
         print(f"✅ {interaction.user} banned {member} from {interaction.guild.name} | Case: {case_id}", flush=True)
 
-    except discord.Forbidden:
-        await interaction.response.send_message("❌ I don't have permission to ban this member.", ephemeral=True)
-    except Exception as e:
-        await interaction.response.send_message(f"❌ An error occurred: {str(e)}", ephemeral=True)
-        print(f"❌ Error in ban command: {e}", flush=True)
-        import traceback
-        traceback.print_exc()
+    except discord.Forbidden:
+        await send_deferred_error(interaction, "❌ I don't have permission to ban this member.")
+    except Exception as e:
+        await send_deferred_error(interaction, f"❌ An error occurred: {str(e)}")
+        print(f"❌ Error in ban command: {e}", flush=True)
+        import traceback
+        traceback.print_exc()
+
+
+# ============================================================================
+# MODERATOR-SUPPLIED PATTERNS
+# ============================================================================
+# Python's re engine backtracks and cannot be interrupted: a pattern like
+# (a+)+b, or even .*a.*b, takes seconds to minutes on one long message while
+# holding the event loop (and the GIL, so an executor would not help either).
+# Patterns are parsed first and rejected if they contain the constructs that
+# make backtracking blow up: backreferences, a quantifier or alternation inside
+# a quantified group, or more than one open-ended quantifier.
+
+REGEX_REPEATS = tuple(getattr(sre_constants, name)
+                      for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+                      if hasattr(sre_constants, name))
+REGEX_BACKREFERENCES = (sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS)
+
+
+def check_pattern_items(items, in_repeat: bool, counts: Counter):
+    """Walk a parsed pattern, raising re.error on constructs that backtrack badly"""
+    for op, av in items:
+        if op in REGEX_BACKREFERENCES:
+            raise re.error("backreferences are not allowed")
+        if op in REGEX_REPEATS:
+            low, high, sub = av
+            if in_repeat:
+                raise re.error("quantifiers inside a quantified group are not allowed")
+            if high != low:
+                counts['quantifiers'] += 1
+                if high > 1:
+                    counts['open_ended'] += 1
+            check_pattern_items(sub, True, counts)
+        elif op == sre_constants.BRANCH:
+            if in_repeat:
+                raise re.error("alternation inside a quantified group is not allowed")
+            for branch in av[1]:
+                check_pattern_items(branch, in_repeat, counts)
+        elif op == sre_constants.SUBPATTERN:
+            check_pattern_items(av[-1], in_repeat, counts)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            check_pattern_items(av[1], in_repeat, counts)
+        elif op == getattr(sre_constants, 'ATOMIC_GROUP', None):
+            check_pattern_items(av, in_repeat, counts)
+
+
+def compile_user_pattern(pattern: str) -> re.Pattern:
+    """
+    Compile a moderator-supplied regex (case-insensitive)
+
+    Raises re.error with a message fit to show the moderator if the pattern is
+    invalid, too long, or could backtrack catastrophically.
+    """
+    if len(pattern) > USER_PATTERN_MAX_LENGTH:
+        raise re.error(f"patterns can be at most {USER_PATTERN_MAX_LENGTH} characters")
+    counts = Counter()
+    check_pattern_items(sre_parse.parse(pattern, re.IGNORECASE), False, counts)
+    if counts['open_ended'] > 1:
+        raise re.error("use at most one *, + or {m,n} quantifier")
+    if counts['quantifiers'] > USER_PATTERN_MAX_QUANTIFIERS:
+        raise re.error(f"use at most {USER_PATTERN_MAX_QUANTIFIERS} quantifiers")
+    return re.compile(pattern, re.IGNORECASE)
+
+
+# ============================================================================
+# MASS BAN
+# ============================================================================
+# /massban resolves raid accounts from the member cache (explicit IDs, a
+# join-time window and/or a username regex; the last two are refused in lean
+# mode, where the cache only holds voice members) and bans them through the bulk
+# ban endpoint, up to 200 users per call. No DMs are sent, and all cases are
+# recorded with one batched write once the bans are done.
+
+BULK_BAN_BATCH_SIZE = 200
+SNOWFLAKE_PATTERN = re.compile(r'\d{15,20}')
+
+
+async def resolve_massban_targets(guild: discord.Guild, moderator: discord.Member, user_ids: List[int],
+                                  joined_after: Optional[datetime], name_pattern: Optional[re.Pattern]):
+    """
+    Resolve mass ban targets from the member cache
+
+    Explicit IDs are always included (IDs of users not in the server are banned
+    pre-emptively). Cached members matching the join window and name pattern
+    are added; when both are given a member must match both. Returns
+    (targets, protected) where protected members were excluded by role
+    hierarchy or ownership.
+    """
+    candidates = {}
+    for user_id in user_ids:
+        candidates[user_id] = guild.get_member(user_id) or discord.Object(id=user_id)
+
+    if joined_after is not None or name_pattern is not None:
+        for scanned, member in enumerate(guild.members, 1):
+            if scanned % PATTERN_MATCH_YIELD_EVERY == 0:
+                # Let heartbeats and other commands run during a scan of a large guild
+                await asyncio.sleep(0)
+            if joined_after is not None and (member.joined_at is None or member.joined_at < joined_after):
+                continue
+            if name_pattern is not None and not any(
+                    name and name_pattern.search(name) for name in (member.name, member.global_name, member.nick)):
+                continue
+            candidates[member.id] = member
+
+    targets, protected = [], []
+    for user_id, target in candidates.items():
+        if user_id in (guild.owner_id, guild.me.id, moderator.id):
+            protected.append(target)
+        elif isinstance(target, discord.Member) and (
+                target.top_role >= guild.me.top_role
+                or (target.top_role >= moderator.top_role and moderator.id != guild.owner_id)):
+            protected.append(target)
+        else:
+            targets.append(target)
+    return targets, protected
+
+
+def describe_massban_target(target) -> str:
+    if isinstance(target, discord.Member):
+        return f"{target} ({target.id})"
+    return f"{target.id} (not in server)"
+
+
+@bot.tree.command(name="massban", description="Ban many members at once during a raid")
+@timed_command
+@app_commands.describe(
+    user_ids="(Optional) User IDs to ban, separated by spaces or commas",
+    joined_within="(Optional) Ban members who joined within this many minutes",
+    name_pattern="(Optional) Ban members whose username matches this regular expression",
+    reason="Reason for banning",
+    delete_messages="Delete messages from the last X days (0-7)",
+    dry_run="Only preview who would be banned"
+)
+@app_commands.checks.has_permissions(ban_members=True)
+async def slash_massban(interaction: discord.Interaction, user_ids: str = None, joined_within: int = None,
+                        name_pattern: str = None, reason: str = "Raid", delete_messages: int = 0,
+                        dry_run: bool = False):
+    """Ban every member matching the given IDs, join window and/or name pattern"""
+    if not await check_emergency_shutdown(interaction):
+        return
+
+    if not (user_ids or joined_within or name_pattern):
+        await interaction.response.send_message(
+            "❌ Give at least one of user_ids, joined_within or name_pattern.", ephemeral=True)
+        return
+    if delete_messages < 0 or delete_messages > 7:
+        await interaction.response.send_message("❌ delete_messages must be between 0 and 7 days.", ephemeral=True)
+        return
+    if joined_within is not None and joined_within <= 0:
+        await interaction.response.send_message("❌ joined_within must be greater than 0 minutes.", ephemeral=True)
+        return
+
+    if LEAN_MODE and (joined_within or name_pattern):
+        # Lean mode only caches members in voice, so a scan would miss nearly everyone
+        await interaction.response.send_message(
+            "❌ joined_within and name_pattern need the full member list, which lean mode doesn't keep. "
+            "Pass user_ids instead.", ephemeral=True)
+        return
+
+    compiled = None
+    if name_pattern:
+        try:
+            compiled = compile_user_pattern(name_pattern)
+        except re.error as e:
+            await interaction.response.send_message(f"❌ Invalid name_pattern: {e}", ephemeral=True)
+            return
+
+    permissions = interaction.guild.me.guild_permissions
+    if not dry_run and not (permissions.ban_members and permissions.manage_guild):
+        await interaction.response.send_message(
+            "❌ I need the Ban Members and Manage Server permissions to mass ban.", ephemeral=True)
+        return
+
+    await interaction.response.defer()
+
+    guild = interaction.guild
+    if (joined_within or name_pattern) and not guild.chunked:
+        # Startup chunking hasn't reached this guild yet
+        await guild.chunk()
+    joined_after = discord.utils.utcnow() - timedelta(minutes=joined_within) if joined_within else None
+    ids = [int(match) for match in SNOWFLAKE_PATTERN.findall(user_ids or "")]
+    targets, protected = await resolve_massban_targets(guild, interaction.user, ids, joined_after, compiled)
+
+    if len(targets) > MASSBAN_MAX_TARGETS:
+        await send_deferred_error(
+            interaction,
+            f"❌ {len(targets)} members matched, more than the limit of {MASSBAN_MAX_TARGETS}. "
+            f"Narrow the filters and try again.")
+        return
+    if not targets:
+        await send_deferred_error(
+            interaction, f"ℹ️ No members matched ({len(protected)} protected by role hierarchy).")
+        return
+
+    if dry_run:
+        embed = discord.Embed(
+            title="🔍 Mass Ban Preview",
+            description=f"**{len(targets)}** users would be banned. Nothing has been done yet.",
+            color=discord.Color.orange(),
+            timestamp=datetime.now()
+        )
+        preview = "\n".join(describe_massban_target(target) for target in targets[:20])
+        if len(targets) > 20:
+            preview += f"\n...and {len(targets) - 20} more"
+        embed.add_field(name="Targets", value=preview, inline=False)
+        if protected:
+            embed.add_field(name="Protected (skipped)", value=str(len(protected)), inline=False)
+        embed.set_footer(text="SorynTech Moderation")
+        await interaction.followup.send(embed=embed)
+        return
+
+    banned, failed = [], []
+    audit_reason = f"{reason} | Moderator: {interaction.user} | Mass ban"[:512]
+    for start in range(0, len(targets), BULK_BAN_BATCH_SIZE):
+        batch = targets[start:start + BULK_BAN_BATCH_SIZE]
+        await bulk_pacer.wait()
+        try:
+            result = await guild.bulk_ban(batch, reason=audit_reason,
+                                          delete_message_seconds=delete_messages * 86400)
+        except discord.Forbidden:
+            failed.extend(targets[start:])
+            break
+        except discord.HTTPException as e:
+            # Discord rejects the whole call when no user in the batch could be banned
+            print(f"⚠️ Bulk ban batch of {len(batch)} failed in {guild.name}: {e}", flush=True)
+            failed.extend(batch)
+            continue
+        banned_ids = {user.id for user in result.banned}
+        banned.extend(target for target in batch if target.id in banned_ids)
+        failed.extend(target for target in batch if target.id not in banned_ids)
+
+    case_ids = await log_moderation_cases([
+        (guild.id, target.id, interaction.user.id, "ban", reason,
+         str(target) if isinstance(target, discord.Member) else None, str(interaction.user))
+        for target in banned
+    ])
+
+    embed = discord.Embed(
+        title="✅ Mass Ban Complete" if banned else "❌ Mass Ban Failed",
+        color=discord.Color.green() if banned else discord.Color.red(),
+        timestamp=datetime.now()
+    )
+    embed.add_field(name="Banned", value=str(len(banned)), inline=True)
+    embed.add_field(name="Failed", value=str(len(failed)), inline=True)
+    embed.add_field(name="Protected (skipped)", value=str(len(protected)), inline=True)
+    embed.add_field(name="Reason", value=reason, inline=False)
+    embed.add_field(name="Moderator", value=interaction.user.mention, inline=False)
+    if case_ids:
+        # IDs are not contiguous when other cases are logged at the same time
+        embed.add_field(name="Cases Recorded", value=str(len(case_ids)), inline=False)
+    embed.set_footer(text="SorynTech Moderation")
+
+    await interaction.followup.send(embed=embed)
+    print(f"✅ {interaction.user} mass banned {len(banned)} users from {guild.name} "
+          f"({len(failed)} failed)", flush=True)
 
 
 @bot.tree.command(name="unban", description="Unban a user from the server")
+@timed_command
 @app_commands.describe(
     user_id="The user ID to unban"
 )
@@ -2065,7 +4995,6 @@ async def slash_unban(interaction: discord.Interaction, user_id: str):
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.5)
 
     if not interaction.guild.me.guild_permissions.ban_members:
         await interaction.followup.send("❌ I don't have permission to unban members!", ephemeral=True)
@@ -2085,6 +5014,7 @@ async def slash_unban(interaction: discord.Interaction, user_id: str):
 
 # Fixed MUTE command with proper timedelta usage
 @bot.tree.command(name="mute", description="Timeout a member")
+@timed_command
 @app_commands.describe(
     member="The member to timeout",
     duration="Duration in minutes",
@@ -2180,6 +5110,7 @@ async def slash_mute(interaction: discord.Interaction, member: discord.Member, d
 
 
 @bot.tree.command(name="unmute", description="Unmute a member")
+@timed_command
 @app_commands.describe(member="The member to unmute")
 @app_commands.checks.has_permissions(moderate_members=True)
 async def slash_unmute(interaction: discord.Interaction, member: discord.Member):
@@ -2187,7 +5118,6 @@ async def slash_unmute(interaction: discord.Interaction, member: discord.Member)
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.5)
 
     if not interaction.guild.me.guild_permissions.moderate_members:
         await interaction.followup.send("❌ I don't have permission!", ephemeral=True)
@@ -2225,6 +5155,7 @@ async def slash_unmute(interaction: discord.Interaction, member: discord.Member)
 
 
 @bot.tree.command(name="dc", description="Disconnect a user from voice")
+@timed_command
 @app_commands.describe(member="Member to disconnect")
 @app_commands.checks.has_permissions(send_polls=True)
 async def slash_disconnect(interaction: discord.Interaction, member: discord.Member):
@@ -2251,7 +5182,6 @@ async def slash_disconnect(interaction: discord.Interaction, member: discord.Mem
 
     try:
         await interaction.response.defer()
-        await asyncio.sleep(0.5)
         await member.move_to(None, reason=f"Disconnected by {interaction.user}")
         await interaction.followup.send(
             f"✅ Successfully disconnected {member.mention}!"
@@ -2269,6 +5199,7 @@ async def slash_disconnect(interaction: discord.Interaction, member: discord.Mem
 
 
 @bot.tree.command(name="userpicture", description="Get a User's Profile Picture")
+@timed_command
 @app_commands.describe(member="The member to get picture of")
 @app_commands.checks.has_permissions(send_messages=True)
 @app_commands.checks.has_permissions(embed_links=True)
@@ -2277,12 +5208,12 @@ async def slash_userpicture(interaction: discord.Interaction, member: discord.Me
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.3)
     picture = member.display_avatar.url
     await interaction.followup.send(picture)
 
 
 @bot.tree.command(name="userbanner", description="Get a user's nitro banner")
+@timed_command
 @app_commands.describe(member="The member to get nitro banner of")
 @app_commands.checks.has_permissions(send_messages=True)
 @app_commands.checks.has_permissions(embed_links=True)
@@ -2291,7 +5222,6 @@ async def slash_userbanner(interaction: discord.Interaction, member: discord.Mem
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.3)
     user = await bot.fetch_user(member.id)
 
     if user.banner:
@@ -2302,6 +5232,7 @@ async def slash_userbanner(interaction: discord.Interaction, member: discord.Mem
 
 
 @bot.tree.command(name="userinfo", description="Get information about a user")
+@timed_command
 @app_commands.describe(member="The member to get info about (leave empty for yourself)")
 @app_commands.checks.has_permissions(moderate_members=True)
 async def slash_userinfo(interaction: discord.Interaction, member: discord.Member = None):
@@ -2309,7 +5240,6 @@ async def slash_userinfo(interaction: discord.Interaction, member: discord.Membe
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.5)
 
     member = member or interaction.user
 
@@ -2347,54 +5277,34 @@ async def slash_userinfo(interaction: discord.Interaction, member: discord.Membe
             embed.add_field(name="📋 Moderation History", value="⚠️ Bot lacks permission to view audit logs",
                             inline=False)
         else:
-            async for entry in interaction.guild.audit_logs(limit=200):
-                if not entry.target:
-                    continue
-
-                target_id = None
-                if hasattr(entry.target, 'id'):
-                    target_id = entry.target.id
-                elif isinstance(entry.target, int):
-                    target_id = entry.target
-
-                if target_id != member.id:
-                    continue
-
-                if entry.action == discord.AuditLogAction.kick:
-                    timestamp = entry.created_at.strftime("%Y-%m-%d %H:%M")
-                    moderator = entry.user.mention if entry.user else "Unknown"
-                    reason = entry.reason or "No reason provided"
-                    mod_history.append(f"👢 **Kick** - {timestamp}\nBy: {moderator}\nReason: {reason}")
-
-                elif entry.action == discord.AuditLogAction.ban:
-                    timestamp = entry.created_at.strftime("%Y-%m-%d %H:%M")
-                    moderator = entry.user.mention if entry.user else "Unknown"
-                    reason = entry.reason or "No reason provided"
-                    mod_history.append(f"🔨 **Ban** - {timestamp}\nBy: {moderator}\nReason: {reason}")
-
-                elif entry.action == discord.AuditLogAction.unban:
-                    timestamp = entry.created_at.strftime("%Y-%m-%d %H:%M")
-                    moderator = entry.user.mention if entry.user else "Unknown"
-                    reason = entry.reason or "No reason provided"
-                    mod_history.append(f"✅ **Unban** - {timestamp}\nBy: {moderator}\nReason: {reason}")
-
-                elif entry.action == discord.AuditLogAction.member_update:
-                    try:
-                        before_timeout = getattr(entry.before, 'timed_out_until', None)
-                        after_timeout = getattr(entry.after, 'timed_out_until', None)
-
-                        if before_timeout != after_timeout and after_timeout is not None:
-                            timestamp = entry.created_at.strftime("%Y-%m-%d %H:%M")
-                            moderator = entry.user.mention if entry.user else "Unknown"
-                            reason = entry.reason or "No reason provided"
-                            mod_history.append(f"⏱️ **Timeout** - {timestamp}\nBy: {moderator}\nReason: {reason}")
-                    except AttributeError:
-                        pass
+            # Served from the audit log mirror; only the guild's first lookup hits the API
+            await audit_log_mirror.ensure_backfilled(interaction.guild)
+            history = audit_log_mirror.history(interaction.guild.id, member.id)
+            total_actions = len(history)
+
+            # The mirror has dropped older entries: the persisted log goes back further
+            if not audit_log_mirror.is_complete(interaction.guild.id) and db_pool is not None:
+                stored_history = await get_user_audit_history(interaction.guild.id, member.id, limit=5)
+                if stored_history and stored_history[0]['total_count'] >= total_actions:
+                    history = stored_history
+                    total_actions = stored_history[0]['total_count']
+
+            action_labels = {
+                'kick': "👢 **Kick**",
+                'ban': "🔨 **Ban**",
+                'unban': "✅ **Unban**",
+                'timeout': "⏱️ **Timeout**",
+            }
+            for record in history[:5]:
+                timestamp = record['created_at'].strftime("%Y-%m-%d %H:%M")
+                moderator = f"<@{record['moderator_id']}>" if record['moderator_id'] else "Unknown"
+                reason = record['reason'] or "No reason provided"
+                mod_history.append(f"{action_labels[record['action']]} - {timestamp}\nBy: {moderator}\nReason: {reason}")
 
             if mod_history:
-                history_text = "\n\n".join(mod_history[:5])
-                if len(mod_history) > 5:
-                    history_text += f"\n\n*...and {len(mod_history) - 5} more action(s)*"
+                history_text = "\n\n".join(mod_history)
+                if total_actions > 5:
+                    history_text += f"\n\n*...and {total_actions - 5} more action(s)*"
                 embed.add_field(name="📋 Moderation History", value=history_text, inline=False)
             else:
                 embed.add_field(name="📋 Moderation History", value="No moderation actions found", inline=False)
@@ -2410,6 +5320,7 @@ async def slash_userinfo(interaction: discord.Interaction, member: discord.Membe
 
 
 @bot.tree.command(name="server-deafen", description="Deafen a user")
+@timed_command
 @app_commands.describe(member="The member to deafen")
 @app_commands.checks.has_permissions(send_polls=True)
 async def slash_deaf(interaction: discord.Interaction, member: discord.Member):
@@ -2417,7 +5328,6 @@ async def slash_deaf(interaction: discord.Interaction, member: discord.Member):
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.5)
 
     if not interaction.guild.me.guild_permissions.deafen_members:
         await interaction.followup.send("❌ I don't have permission to deafen members!", ephemeral=True)
@@ -2462,6 +5372,7 @@ async def slash_deaf(interaction: discord.Interaction, member: discord.Member):
 
 
 @bot.tree.command(name="server-mute", description="Mute a user")
+@timed_command
 @app_commands.describe(member="The member to mute")
 @app_commands.checks.has_permissions(send_polls=True)
 async def slash_servermute(interaction: discord.Interaction, member: discord.Member):
@@ -2469,7 +5380,6 @@ async def slash_servermute(interaction: discord.Interaction, member: discord.Mem
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.5)
 
     if not interaction.guild.me.guild_permissions.mute_members:
         await interaction.followup.send("I dont have permissions :angry_face:")
@@ -2509,6 +5419,7 @@ async def slash_servermute(interaction: discord.Interaction, member: discord.Mem
 
 
 @bot.tree.command(name="server-unmute", description="Unmute a user from voice")
+@timed_command
 @app_commands.describe(member="The member to unmute")
 @app_commands.checks.has_permissions(send_polls=True)
 async def slash_unmute_voice(interaction: discord.Interaction, member: discord.Member):
@@ -2516,7 +5427,6 @@ async def slash_unmute_voice(interaction: discord.Interaction, member: discord.M
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.5)
 
     if not interaction.guild.me.guild_permissions.mute_members:
         await interaction.followup.send("❌ I don't have permission to mute/unmute members!", ephemeral=True)
@@ -2561,6 +5471,7 @@ async def slash_unmute_voice(interaction: discord.Interaction, member: discord.M
 
 
 @bot.tree.command(name="server-undeafen", description="Undeafen a user from voice")
+@timed_command
 @app_commands.describe(member="The member to undeafen")
 @app_commands.checks.has_permissions(send_polls=True)
 async def slash_undeaf_voice(interaction: discord.Interaction, member: discord.Member):
@@ -2568,7 +5479,6 @@ async def slash_undeaf_voice(interaction: discord.Interaction, member: discord.M
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.5)
 
     if not interaction.guild.me.guild_permissions.deafen_members:
         await interaction.followup.send("❌ I don't have permission to deafen/undeafen members!", ephemeral=True)
@@ -2612,15 +5522,175 @@ async def slash_undeaf_voice(interaction: discord.Interaction, member: discord.M
         )
 
 
+# ============================================================================
+# BULK OPERATION PROGRESS
+# ============================================================================
+
+async def run_with_progress(message: discord.WebhookMessage, describe, work):
+    """Await work, editing message to describe() every PROGRESS_UPDATE_INTERVAL seconds until it finishes"""
+    task = asyncio.ensure_future(work)
+    while not task.done():
+        await asyncio.wait({task}, timeout=PROGRESS_UPDATE_INTERVAL)
+        if not task.done():
+            try:
+                await message.edit(content=describe())
+            except discord.HTTPException:
+                pass
+    return await task
+
+
+# ============================================================================
+# MESSAGE PURGE ENGINE
+# ============================================================================
+# /purge streams channel history newest first and deletes the messages that
+# pass its filters. Messages younger than 14 days go out in bulk-delete calls
+# of 100, with the next batch collected while the previous one is deleted.
+# Older messages cannot be bulk deleted, so they are deleted one at a time and
+# discord.py waits out the (much stricter) per-message rate limit.
+
+# Bulk delete rejects messages older than 14 days; the margin covers time spent scanning
+BULK_DELETE_MAX_AGE = timedelta(days=14) - timedelta(minutes=5)
+BULK_DELETE_BATCH_SIZE = 100
+LINK_PATTERN = re.compile(r'https?://|discord\.gg/', re.IGNORECASE)
+
+
+class PurgeProgress:
+    """Counters for a running purge, read by the progress reporter"""
+
+    def __init__(self, target: int):
+        self.target = target
+        self.scanned = 0
+        self.matched = 0
+        self.deleted = 0
+        self.failed = 0
+
+
+def build_purge_check(user: Optional[discord.abc.User] = None, bots_only: bool = False,
+                      pattern: Optional[re.Pattern] = None, links: bool = False, attachments: bool = False):
+    """Predicate matching messages that pass every given filter"""
+    def check(message: discord.Message) -> bool:
+        if user is not None and message.author.id != user.id:
+            return False
+        if bots_only and not message.author.bot:
+            return False
+        if pattern is not None and not pattern.search(message.content):
+            return False
+        if links and not LINK_PATTERN.search(message.content):
+            return False
+        if attachments and not message.attachments:
+            return False
+        return True
+
+    return check
+
+
+async def purge_channel(channel, limit: int, check, progress: PurgeProgress, reason: str,
+                        before: Optional[int] = None, after: Optional[int] = None):
+    """
+    Delete up to limit messages passing check, scanning at most PURGE_SCAN_LIMIT messages
+
+    before/after are message IDs bounding the scan. Counts are kept in progress.
+    """
+    async def bulk_delete(batch):
+        await bulk_pacer.wait()
+        try:
+            await channel.delete_messages(batch, reason=reason)
+            progress.deleted += len(batch)
+        except discord.NotFound:
+            # Some were already deleted; Discord rejects the whole batch, so go one by one
+            for message in batch:
+                await single_delete(message)
+        except discord.Forbidden:
+            raise
+        except discord.HTTPException:
+            progress.failed += len(batch)
+
+    async def single_delete(message):
+        await bulk_pacer.wait()
+        try:
+            await message.delete()
+            progress.deleted += 1
+        except discord.NotFound:
+            pass
+        except discord.Forbidden:
+            raise
+        except discord.HTTPException:
+            progress.failed += 1
+
+    batch = []
+    in_flight = None
+    history = channel.history(
+        limit=PURGE_SCAN_LIMIT,
+        before=discord.Object(id=before) if before else None,
+        after=discord.Object(id=after) if after else None,
+        oldest_first=False,
+    )
+    try:
+        async for message in history:
+            if after and message.id <= after:
+                # Newest-first history only filters the after bound page by page;
+                # stop at the boundary instead of relying on that
+                break
+            progress.scanned += 1
+            if progress.scanned % PATTERN_MATCH_YIELD_EVERY == 0:
+                # A history page holds 100 messages; give the loop a turn partway through one
+                await asyncio.sleep(0)
+            if not check(message):
+                continue
+            progress.matched += 1
+
+            if discord.utils.utcnow() - message.created_at < BULK_DELETE_MAX_AGE:
+                batch.append(message)
+                if len(batch) == BULK_DELETE_BATCH_SIZE:
+                    if in_flight is not None:
+                        await in_flight
+                    in_flight = asyncio.create_task(bulk_delete(batch))
+                    batch = []
+            else:
+                # Too old for bulk delete. History runs newest first, so matches from
+                # here on are all deleted one at a time (bounded by after, if given)
+                await single_delete(message)
+
+            if progress.matched >= limit:
+                break
+
+        if in_flight is not None:
+            await in_flight
+            in_flight = None
+        if batch:
+            await bulk_delete(batch)
+    finally:
+        if in_flight is not None and not in_flight.done():
+            in_flight.cancel()
+
+
+def parse_message_id(value: Optional[str]) -> Optional[int]:
+    """Message ID option (strings, since snowflakes exceed Discord's integer option range)"""
+    if value is None or not value.strip():
+        return None
+    return int(value.strip())
+
+
 @bot.tree.command(name="purge", description="Mass Delete Messages")
+@timed_command
 @app_commands.checks.has_permissions(manage_messages=True)
-@app_commands.describe(msgamount="How many Messages you want to delete")
-async def slash_purge_messages(interaction: discord.Interaction, msgamount: int):
+@app_commands.describe(
+    msgamount="How many Messages you want to delete",
+    user="(Optional) Only delete messages from this user",
+    bots_only="(Optional) Only delete messages from bots",
+    pattern="(Optional) Only delete messages matching this regular expression",
+    links="(Optional) Only delete messages containing links",
+    attachments="(Optional) Only delete messages with attachments",
+    before="(Optional) Only delete messages before this message ID",
+    after="(Optional) Only delete messages after this message ID"
+)
+async def slash_purge_messages(interaction: discord.Interaction, msgamount: int, user: discord.User = None,
+                               bots_only: bool = False, pattern: str = None, links: bool = False,
+                               attachments: bool = False, before: str = None, after: str = None):
     if not await check_emergency_shutdown(interaction):
         return
 
-    await interaction.response.defer()
-    await asyncio.sleep(0.5)
+    await interaction.response.defer(ephemeral=True)
 
     if not interaction.guild.me.guild_permissions.manage_messages:
         await interaction.followup.send("I do not have Permissions!", ephemeral=True)
@@ -2628,19 +5698,184 @@ async def slash_purge_messages(interaction: discord.Interaction, msgamount: int)
     if msgamount <= 0:
         await interaction.followup.send("The message amount needs to be greater than 0!", ephemeral=True)
         return
-    if msgamount > 100:
-        await interaction.followup.send("You cannot do over 100 messages at a time", ephemeral=True)
+    if msgamount > PURGE_MAX_MESSAGES:
+        await interaction.followup.send(f"You cannot do over {PURGE_MAX_MESSAGES} messages at a time", ephemeral=True)
         return
+
+    try:
+        before_id = parse_message_id(before)
+        after_id = parse_message_id(after)
+    except ValueError:
+        await interaction.followup.send("❌ Message IDs must be numbers!", ephemeral=True)
+        return
+
+    compiled = None
+    if pattern:
+        try:
+            compiled = compile_user_pattern(pattern)
+        except re.error as e:
+            await interaction.followup.send(f"❌ Invalid pattern: {e}", ephemeral=True)
+            return
+
+    progress = PurgeProgress(msgamount)
+    check = build_purge_check(user, bots_only, compiled, links, attachments)
+    status_message = await interaction.followup.send(f"🧹 Purging up to {msgamount} messages...",
+                                                     ephemeral=True, wait=True)
     try:
-        deleted = await interaction.channel.purge(limit=msgamount)
-        await interaction.followup.send(f"Successfully deleted {len(deleted)} messages!", ephemeral=True)
+        await run_with_progress(
+            status_message,
+            lambda: (f"🧹 Purging... deleted {progress.deleted}/{progress.target} messages "
+                     f"({progress.scanned} scanned)"),
+            purge_channel(interaction.channel, msgamount, check, progress,
+                          f"Purge by {interaction.user}", before_id, after_id)
+        )
+        response = f"Successfully deleted {progress.deleted} messages! ({progress.scanned} scanned)"
+        if progress.failed:
+            response += f"\n❌ {progress.failed} messages could not be deleted"
+        await status_message.edit(content=response)
     except discord.Forbidden:
-        await interaction.followup.send("I don't have permission to delete messages in this channel!", ephemeral=True)
+        await status_message.edit(content="I don't have permission to delete messages in this channel!")
     except discord.HTTPException as e:
-        await interaction.followup.send(f"An error occurred while deleting messages: {e}", ephemeral=True)
+        await status_message.edit(content=f"An error occurred while deleting messages: {e}")
+
+
+# ============================================================================
+# CHANNEL LOCKDOWN ENGINE
+# ============================================================================
+# /lockdown and /unlockserver edit the @everyone overwrite on every text,
+# announcement, forum, voice and stage channel. Edits run LOCKDOWN_CONCURRENCY
+# at a time, paced by bulk_pacer. There are no fixed sleeps: discord.py reads
+# each route's X-RateLimit-* headers and only waits when a bucket is exhausted.
+# Channels already in the target state are skipped without an API call, and
+# the followup message is edited with progress while the edits run.
+#
+# Before locking, each channel's @everyone overwrite is snapshotted (see
+# LOCKDOWN SNAPSHOT FUNCTIONS). Unlock puts back the exact prior overwrite,
+# including intentional per-channel denies, and only calls the API for channels
+# whose overwrite differs from the snapshot. Without a database the snapshot is
+# kept in memory until the next restart.
+
+# Permissions each channel type has denied for @everyone during a lockdown
+LOCKDOWN_PERMISSIONS = {
+    discord.ChannelType.text: ('send_messages', 'send_messages_in_threads',
+                               'create_public_threads', 'create_private_threads'),
+    discord.ChannelType.news: ('send_messages', 'send_messages_in_threads', 'create_public_threads'),
+    discord.ChannelType.forum: ('send_messages', 'send_messages_in_threads', 'create_public_threads'),
+    discord.ChannelType.voice: ('connect', 'send_messages'),
+    discord.ChannelType.stage_voice: ('connect', 'send_messages'),
+}
+
+
+# Snapshots that could not be persisted (no database or a failed write), by guild ID
+lockdown_snapshot_fallback: Dict[int, Dict[int, Optional[Tuple[int, int]]]] = {}
+
+
+class ChannelEditProgress:
+    """Counters for a bulk channel edit, read by the progress reporter"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.edited = 0
+        self.skipped = 0
+        self.failed = []
+
+    @property
+    def completed(self) -> int:
+        return self.edited + self.skipped + len(self.failed)
+
+
+def lockable_channels(guild: discord.Guild) -> list:
+    return [channel for channel in guild.channels if channel.type in LOCKDOWN_PERMISSIONS]
+
+
+def overwrite_state(channel, role: discord.Role) -> Optional[Tuple[int, int]]:
+    """The role's overwrite on channel as an (allow, deny) bitfield pair, or None if it has none"""
+    overwrite = channel.overwrites.get(role)
+    if overwrite is None:
+        return None
+    allow, deny = overwrite.pair()
+    return allow.value, deny.value
+
+
+def overwrite_from_state(state: Optional[Tuple[int, int]]) -> Optional[discord.PermissionOverwrite]:
+    if state is None:
+        return None
+    return discord.PermissionOverwrite.from_pair(discord.Permissions(state[0]), discord.Permissions(state[1]))
+
+
+def lockdown_overwrite(channel, role: discord.Role, value: Optional[bool]) -> Optional[discord.PermissionOverwrite]:
+    """
+    The role's overwrite with the channel type's lockdown permissions set to value
+    (False to lock, None to clear), or None if the channel is already in that state
+    """
+    overwrite = channel.overwrites_for(role)
+    names = LOCKDOWN_PERMISSIONS[channel.type]
+    if all(getattr(overwrite, name) is value for name in names):
+        return None
+    overwrite.update(**{name: value for name in names})
+    return overwrite
+
+
+async def edit_channel_overwrites(edits: list, role: discord.Role, reason: str, progress: ChannelEditProgress):
+    """
+    Apply (channel, overwrite) edits for role concurrently
+
+    An overwrite of None deletes the role's overwrite. Failures are collected
+    in progress.failed (as channels) instead of raised.
+    """
+    semaphore = asyncio.Semaphore(LOCKDOWN_CONCURRENCY)
+
+    async def edit(channel, overwrite):
+        async with semaphore:
+            await bulk_pacer.wait()
+            try:
+                await channel.set_permissions(role, overwrite=overwrite, reason=reason)
+                progress.edited += 1
+            except discord.HTTPException:
+                progress.failed.append(channel)
+
+    await asyncio.gather(*(edit(channel, overwrite) for channel, overwrite in edits))
+
+
+async def snapshot_lockdown(guild: discord.Guild, channels: list):
+    """Record the @everyone overwrite of each channel before it is locked"""
+    states = {channel.id: overwrite_state(channel, guild.default_role) for channel in channels}
+    if await save_lockdown_snapshot(guild.id, states):
+        return
+    fallback = lockdown_snapshot_fallback.setdefault(guild.id, {})
+    for channel_id, state in states.items():
+        fallback.setdefault(channel_id, state)
+
+
+async def load_lockdown_snapshot(guild: discord.Guild) -> Optional[Dict[int, Optional[Tuple[int, int]]]]:
+    """The guild's lockdown snapshot, {} if there is none, or None if it could not be read"""
+    snapshot = await get_lockdown_snapshot(guild.id)
+    if snapshot is None:
+        return None
+    # In-memory entries only exist when the database write failed, so they win
+    snapshot.update(lockdown_snapshot_fallback.get(guild.id, {}))
+    return snapshot
+
+
+async def clear_lockdown_snapshot(guild: discord.Guild, failed_channels: list):
+    """Forget the snapshot after an unlock, keeping channels that still need restoring"""
+    keep = {channel.id for channel in failed_channels}
+    await delete_lockdown_snapshot(guild.id, list(keep))
+    fallback = lockdown_snapshot_fallback.pop(guild.id, {})
+    remaining = {channel_id: state for channel_id, state in fallback.items() if channel_id in keep}
+    if remaining:
+        lockdown_snapshot_fallback[guild.id] = remaining
+
+
+def format_failed_channels(failed: list, limit: int = 10) -> str:
+    text = ", ".join(channel.name for channel in failed[:limit])
+    if len(failed) > limit:
+        text += f" (+{len(failed) - limit} more)"
+    return text
 
 
 @bot.tree.command(name="lockdown", description="Lock down the server")
+@timed_command
 @app_commands.checks.has_permissions(administrator=True)
 @app_commands.describe(message="(Optional) Lockdown Message")
 async def slash_lockdown(interaction: discord.Interaction, message: str = None):
@@ -2657,36 +5892,42 @@ async def slash_lockdown(interaction: discord.Interaction, message: str = None):
         return
 
     try:
-        locked_count = 0
-        failed_channels = []
+        guild = interaction.guild
+        channels = lockable_channels(guild)
+        progress = ChannelEditProgress(len(channels))
+        status_message = await interaction.followup.send(f"🔒 Locking down {len(channels)} channels...", wait=True)
+
+        await snapshot_lockdown(guild, channels)
+        edits = []
+        for channel in channels:
+            overwrite = lockdown_overwrite(channel, guild.default_role, False)
+            if overwrite is None:
+                progress.skipped += 1
+            else:
+                edits.append((channel, overwrite))
 
-        for channel in interaction.guild.text_channels:
-            try:
-                await channel.set_permissions(
-                    interaction.guild.default_role,
-                    send_messages=False,
-                    reason=f"Server lockdown by {interaction.user}"
-                )
-                locked_count += 1
-                await asyncio.sleep(0.3)  # Delay between channel locks
-            except discord.Forbidden:
-                failed_channels.append(channel.name)
-            except discord.HTTPException:
-                failed_channels.append(channel.name)
+        await run_with_progress(
+            status_message,
+            lambda: f"🔒 Locking down... {progress.completed}/{progress.total} channels",
+            edit_channel_overwrites(edits, guild.default_role, f"Server lockdown by {interaction.user}", progress)
+        )
 
-        response = f"🔒 **Server Locked Down**\n✅ Locked {locked_count} channels"
-        if failed_channels:
-            response += f"\n❌ Failed to lock: {', '.join(failed_channels)}"
+        response = f"🔒 **Server Locked Down**\n✅ Locked {progress.edited} channels"
+        if progress.skipped:
+            response += f" ({progress.skipped} already locked)"
+        if progress.failed:
+            response += f"\n❌ Failed to lock: {format_failed_channels(progress.failed)}"
         if message:
             response += f"\n\n📢 **Message:** {message}"
 
-        await interaction.followup.send(response)
+        await status_message.edit(content=response)
 
     except Exception as e:
         await interaction.followup.send(f"❌ An error occurred during lockdown: {e}", ephemeral=True)
 
 
 @bot.tree.command(name="killswitch", description="Emergency bot shutdown (Owner Only)")
+@timed_command
 async def slash_killswitch(interaction: discord.Interaction):
     global bot_emergency_shutdown
 
@@ -2716,6 +5957,7 @@ async def slash_killswitch(interaction: discord.Interaction):
 
 
 @bot.tree.command(name="restart-bot", description="Restart the bot from emergency shutdown (Owner Only)")
+@timed_command
 async def slash_restart_bot(interaction: discord.Interaction):
     global bot_emergency_shutdown
 
@@ -2741,6 +5983,7 @@ async def slash_restart_bot(interaction: discord.Interaction):
 
 
 @bot.tree.command(name="owner-sleep", description="Toggle owner sleep status page (Owner Only)")
+@timed_command
 async def slash_owner_sleep(interaction: discord.Interaction):
     global bot_owner_sleeping
 
@@ -2768,6 +6011,7 @@ async def slash_owner_sleep(interaction: discord.Interaction):
 
 
 @bot.tree.command(name="update-mode", description="Toggle update mode for the bot status page (Owner Only)")
+@timed_command
 async def slash_updatemode(interaction: discord.Interaction):
     global bot_updating
 
@@ -2797,6 +6041,7 @@ async def slash_updatemode(interaction: discord.Interaction):
 
 
 @bot.tree.command(name="ping", description="Check the bot's latency")
+@timed_command
 async def slash_ping(interaction: discord.Interaction):
     if not await check_emergency_shutdown(interaction):
         return
@@ -2813,6 +6058,7 @@ async def slash_ping(interaction: discord.Interaction):
 
 
 @bot.tree.command(name="unlockserver", description="Unlock the server")
+@timed_command
 @app_commands.checks.has_permissions(administrator=True)
 async def slash_unlockserver(interaction: discord.Interaction):
     if not await check_emergency_shutdown(interaction):
@@ -2828,34 +6074,61 @@ async def slash_unlockserver(interaction: discord.Interaction):
         return
 
     try:
-        unlocked_count = 0
-        failed_channels = []
+        guild = interaction.guild
+        snapshot = await load_lockdown_snapshot(guild)
+        if snapshot is None:
+            # Treating this as "no snapshot" would clear every deny and then
+            # delete the snapshot, losing the prior state for good
+            await interaction.followup.send(
+                "❌ Could not read the lockdown snapshot from the database, so no channels were changed. "
+                "Please try again in a moment.", ephemeral=True)
+            return
 
-        for channel in interaction.guild.text_channels:
-            try:
-                await channel.set_permissions(
-                    interaction.guild.default_role,
-                    send_messages=None,
-                    reason=f"Server unlocked by {interaction.user}"
-                )
-                unlocked_count += 1
-                await asyncio.sleep(0.3)  # Delay between channel unlocks
-            except discord.Forbidden:
-                failed_channels.append(channel.name)
-            except discord.HTTPException:
-                failed_channels.append(channel.name)
+        channels = lockable_channels(guild)
+        progress = ChannelEditProgress(len(channels))
+        status_message = await interaction.followup.send(f"🔓 Unlocking {len(channels)} channels...", wait=True)
+
+        edits = []
+        for channel in channels:
+            if not snapshot:
+                # Locked before snapshots existed: clear the lockdown denies
+                overwrite = lockdown_overwrite(channel, guild.default_role, None)
+                if overwrite is None:
+                    progress.skipped += 1
+                else:
+                    edits.append((channel, overwrite))
+            elif channel.id not in snapshot:
+                # Created after the lockdown, so it was never locked
+                progress.skipped += 1
+            else:
+                # Restore the exact prior overwrite, unless the channel already has it
+                state = snapshot[channel.id]
+                if overwrite_state(channel, guild.default_role) == state:
+                    progress.skipped += 1
+                else:
+                    edits.append((channel, overwrite_from_state(state)))
+
+        await run_with_progress(
+            status_message,
+            lambda: f"🔓 Unlocking... {progress.completed}/{progress.total} channels",
+            edit_channel_overwrites(edits, guild.default_role, f"Server unlocked by {interaction.user}", progress)
+        )
+        await clear_lockdown_snapshot(guild, progress.failed)
 
-        response = f"🔓 **Server Unlocked**\n✅ Unlocked {unlocked_count} channels"
-        if failed_channels:
-            response += f"\n❌ Failed to unlock: {', '.join(failed_channels)}"
+        response = f"🔓 **Server Unlocked**\n✅ Restored {progress.edited} channels"
+        if progress.skipped:
+            response += f" ({progress.skipped} unchanged)"
+        if progress.failed:
+            response += f"\n❌ Failed to unlock: {format_failed_channels(progress.failed)}"
 
-        await interaction.followup.send(response)
+        await status_message.edit(content=response)
 
     except Exception as e:
         await interaction.followup.send(f"❌ An error occurred during unlock: {e}", ephemeral=True)
 
 
 @bot.tree.command(name="nickname", description="Change a users nickname")
+@timed_command
 @app_commands.checks.has_permissions(manage_nicknames=True)
 @app_commands.describe(
     member="The member to change nickname",
@@ -2867,7 +6140,6 @@ async def slash_nickname(interaction: discord.Interaction, member: discord.Membe
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.5)
 
     if not interaction.guild.me.guild_permissions.manage_nicknames:
         await interaction.followup.send("❌ I don't have permission to manage nicknames!", ephemeral=True)
@@ -2895,27 +6167,20 @@ async def slash_nickname(interaction: discord.Interaction, member: discord.Membe
 
 
 @bot.tree.command(name="serverinfo", description="Display server information")
+@timed_command
 async def slash_serverinfo(interaction: discord.Interaction):
     if not await check_emergency_shutdown(interaction):
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.3)
 
     guild = interaction.guild
-
-    online = sum(1 for m in guild.members if m.status == discord.Status.online)
-    idle = sum(1 for m in guild.members if m.status == discord.Status.idle)
-    dnd = sum(1 for m in guild.members if m.status == discord.Status.dnd)
-    offline = sum(1 for m in guild.members if m.status == discord.Status.offline)
-
-    bots = sum(1 for m in guild.members if m.bot)
-    humans = len(guild.members) - bots
+    counts = await get_guild_member_stats(guild)
 
     embed = discord.Embed(
         title=f"📊 {guild.name} Server Information",
         color=discord.Color.blue(),
-        timestamp=datetime.datetime.now()
+        timestamp=datetime.now()
     )
 
     if guild.icon:
@@ -2925,17 +6190,31 @@ async def slash_serverinfo(interaction: discord.Interaction):
     embed.add_field(name="Owner", value=guild.owner.mention if guild.owner else "Unknown", inline=True)
     embed.add_field(name="Created On", value=guild.created_at.strftime("%Y-%m-%d"), inline=True)
 
-    embed.add_field(
-        name=f"Members ({len(guild.members)})",
-        value=f"👤 Humans: {humans}\n🤖 Bots: {bots}",
-        inline=True
-    )
+    if counts['approximate']:
+        embed.add_field(
+            name=f"Members (~{counts['members']})",
+            value="👤 Humans / 🤖 Bots: N/A in lean mode",
+            inline=True
+        )
 
-    embed.add_field(
-        name="Member Status",
-        value=f"🟢 | Online | {online}\n🟡 | Idle | {idle}\n🔴 | DND | {dnd}\n⚫ | Offline | {offline}",
-        inline=True
-    )
+        embed.add_field(
+            name="Member Status (approx.)",
+            value=f"🟢 | Online/Idle/DND | ~{counts['present']}\n⚫ | Offline | ~{counts['offline']}",
+            inline=True
+        )
+    else:
+        embed.add_field(
+            name=f"Members ({counts['members']})",
+            value=f"👤 Humans: {counts['humans']}\n🤖 Bots: {counts['bots']}",
+            inline=True
+        )
+
+        embed.add_field(
+            name="Member Status",
+            value=f"🟢 | Online | {counts['online']}\n🟡 | Idle | {counts['idle']}\n"
+                  f"🔴 | DND | {counts['dnd']}\n⚫ | Offline | {counts['offline']}",
+            inline=True
+        )
 
     text_channels = len(guild.text_channels)
     voice_channels = len(guild.voice_channels)
@@ -2964,6 +6243,7 @@ async def slash_serverinfo(interaction: discord.Interaction):
 
 
 @bot.tree.command(name="addrole", description="Add a role to a user")
+@timed_command
 async def slash_addrole(interaction: discord.Interaction, member: discord.Member, role: discord.Role):
     if not await check_emergency_shutdown(interaction):
         return
@@ -3001,19 +6281,18 @@ async def slash_addrole(interaction: discord.Interaction, member: discord.Member
 
 
 @bot.tree.command(name="role-count", description="Show how many users have a role")
+@timed_command
 async def slash_rolecount(interaction: discord.Interaction, role: discord.Role):
     if not await check_emergency_shutdown(interaction):
         return
 
-    member_count = len(role.members)
-
     embed = discord.Embed(
         title="📊 Role Statistics",
         color=role.color
     )
 
     embed.add_field(name="Role", value=role.mention, inline=True)
-    embed.add_field(name="Member Count", value=f"**{member_count}**", inline=True)
+    embed.add_field(name="Member Count", value=format_role_count(role), inline=True)
     embed.add_field(name="Role ID", value=f"`{role.id}`", inline=False)
 
     embed.set_footer(text=f"Requested by {interaction.user.name}")
@@ -3023,24 +6302,17 @@ async def slash_rolecount(interaction: discord.Interaction, role: discord.Role):
 
 
 @bot.tree.command(name="membercount", description="Display server member statistics")
+@timed_command
 async def slash_membercount(interaction: discord.Interaction):
     if not await check_emergency_shutdown(interaction):
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.3)
 
     guild = interaction.guild
 
-    # Count member statuses
-    online = sum(1 for m in guild.members if m.status == discord.Status.online)
-    idle = sum(1 for m in guild.members if m.status == discord.Status.idle)
-    dnd = sum(1 for m in guild.members if m.status == discord.Status.dnd)
-    offline = sum(1 for m in guild.members if m.status == discord.Status.offline)
-
-    # Count bots vs humans
-    bots = sum(1 for m in guild.members if m.bot)
-    humans = len(guild.members) - bots
+    # Precomputed member and status totals (see MEMBER COUNTERS)
+    counts = await get_guild_member_stats(guild)
 
     embed = discord.Embed(
         title=f"👥 {guild.name} Member Statistics",
@@ -3051,36 +6323,52 @@ async def slash_membercount(interaction: discord.Interaction):
     if guild.icon:
         embed.set_thumbnail(url=guild.icon.url)
 
-    embed.add_field(
-        name="📊 Total Members",
-        value=f"**{len(guild.members)}**",
-        inline=False
-    )
+    if counts['approximate']:
+        embed.add_field(
+            name="📊 Total Members",
+            value=f"**~{counts['members']}**",
+            inline=False
+        )
 
-    embed.add_field(
-        name="👤 Member Types",
-        value=f"Humans: **{humans}**\nBots: **{bots}**",
-        inline=True
-    )
+        embed.add_field(
+            name="📱 Member Status",
+            value=f"🟢 Online/Idle/DND: **~{counts['present']}**\n⚫ Offline: **~{counts['offline']}**",
+            inline=True
+        )
 
-    embed.add_field(
-        name="📱 Member Status",
-        value=f"🟢 Online: **{online}**\n🟡 Idle: **{idle}**\n🔴 DND: **{dnd}**\n⚫ Offline: **{offline}**",
-        inline=True
-    )
+        embed.set_footer(text=f"Requested by {interaction.user.name} • Approximate counts (lean mode)")
+    else:
+        embed.add_field(
+            name="📊 Total Members",
+            value=f"**{counts['members']}**",
+            inline=False
+        )
 
-    embed.set_footer(text=f"Requested by {interaction.user.name}")
+        embed.add_field(
+            name="👤 Member Types",
+            value=f"Humans: **{counts['humans']}**\nBots: **{counts['bots']}**",
+            inline=True
+        )
+
+        embed.add_field(
+            name="📱 Member Status",
+            value=f"🟢 Online: **{counts['online']}**\n🟡 Idle: **{counts['idle']}**\n"
+                  f"🔴 DND: **{counts['dnd']}**\n⚫ Offline: **{counts['offline']}**",
+            inline=True
+        )
+
+        embed.set_footer(text=f"Requested by {interaction.user.name}")
 
     await interaction.followup.send(embed=embed)
 
 
 @bot.tree.command(name="botinfo", description="Display bot statistics and information")
+@timed_command
 async def slash_botinfo(interaction: discord.Interaction):
     if not await check_emergency_shutdown(interaction):
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.3)
 
     # Calculate uptime
     uptime = datetime.now() - bot_start_time
@@ -3137,6 +6425,7 @@ async def slash_botinfo(interaction: discord.Interaction):
 
 
 @bot.tree.command(name="removerole", description="Remove a role from a user")
+@timed_command
 @app_commands.describe(
     member="The member to remove role from",
     role="The role to remove"
@@ -3147,7 +6436,6 @@ async def slash_removerole(interaction: discord.Interaction, member: discord.Mem
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.5)
 
     if not interaction.guild.me.guild_permissions.manage_roles:
         await interaction.followup.send("❌ I don't have permission to manage roles!", ephemeral=True)
@@ -3184,6 +6472,7 @@ async def slash_removerole(interaction: discord.Interaction, member: discord.Mem
 
 
 @bot.tree.command(name="createrole", description="Create a new role with specified permissions")
+@timed_command
 @app_commands.describe(
     name="Name of the new role",
     color="Color in hex format (e.g., #FF5733) - optional",
@@ -3196,7 +6485,6 @@ async def slash_createrole(interaction: discord.Interaction, name: str, color: s
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.5)
 
     if not interaction.guild.me.guild_permissions.manage_roles:
         await interaction.followup.send("❌ I don't have permission to manage roles!", ephemeral=True)
@@ -3246,6 +6534,7 @@ async def slash_createrole(interaction: discord.Interaction, name: str, color: s
 
 
 @bot.tree.command(name="deleterole", description="Delete a role")
+@timed_command
 @app_commands.describe(role="The role to delete")
 @app_commands.checks.has_permissions(manage_roles=True)
 async def slash_deleterole(interaction: discord.Interaction, role: discord.Role):
@@ -3253,7 +6542,6 @@ async def slash_deleterole(interaction: discord.Interaction, role: discord.Role)
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.5)
 
     if not interaction.guild.me.guild_permissions.manage_roles:
         await interaction.followup.send("❌ I don't have permission to manage roles!", ephemeral=True)
@@ -3290,13 +6578,13 @@ async def slash_deleterole(interaction: discord.Interaction, role: discord.Role)
 
 
 @bot.tree.command(name="roleinfo", description="Display information about a role")
+@timed_command
 @app_commands.describe(role="The role to get information about")
 async def slash_roleinfo(interaction: discord.Interaction, role: discord.Role):
     if not await check_emergency_shutdown(interaction):
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.3)
 
     embed = discord.Embed(
         title=f"📋 Role Information",
@@ -3315,7 +6603,7 @@ async def slash_roleinfo(interaction: discord.Interaction, role: discord.Role):
     embed.add_field(name="Mentionable", value="✅ Yes" if role.mentionable else "❌ No", inline=True)
 
     # Member count
-    embed.add_field(name="Members", value=f"**{len(role.members)}**", inline=True)
+    embed.add_field(name="Members", value=format_role_count(role), inline=True)
 
     # Managed status
     embed.add_field(
@@ -3361,43 +6649,184 @@ async def slash_roleinfo(interaction: discord.Interaction, role: discord.Role):
 
 
 @bot.tree.command(name="rolemembers", description="List all members with a specific role")
+@timed_command
 @app_commands.describe(role="The role to list members for")
 async def slash_rolemembers(interaction: discord.Interaction, role: discord.Role):
     if not await check_emergency_shutdown(interaction):
         return
 
+    # Checked before deferring so the error can still be sent privately
+    if role_index.count(role) == 0:
+        who = "cached members" if role_index.is_partial(role.guild) else "members"
+        await interaction.response.send_message(f"❌ No {who} have the {role.mention} role!", ephemeral=True)
+        return
+
     await interaction.response.defer()
-    await asyncio.sleep(0.3)
 
-    members = role.members
+    # Only the first page of members is resolved; the buttons fetch the rest
+    view = RoleMembersView(interaction.user.id, role)
+    if view.page_count > 1:
+        view.message = await interaction.followup.send(embed=view.render(), view=view, wait=True)
+    else:
+        await interaction.followup.send(embed=view.render())
 
-    if not members:
-        await interaction.followup.send(f"❌ No members have the {role.mention} role!", ephemeral=True)
-        return
 
-    embed = discord.Embed(
-        title=f"👥 Members with {role.name}",
-        description=f"Total: **{len(members)}** member(s)",
-        color=role.color,
-        timestamp=datetime.now()
-    )
+# ============================================================================
+# PAGINATED VIEWS
+# ============================================================================
 
-    # Split members into chunks of 20 for readability
-    chunk_size = 20
-    member_chunks = [members[i:i + chunk_size] for i in range(0, len(members), chunk_size)]
+class PaginatorView(discord.ui.View):
+    """Base for button paginators: only the invoking user can press the buttons"""
 
-    # Display first chunk inline
-    first_chunk = member_chunks[0]
-    member_list = "\n".join([f"• {member.mention} ({member.name})" for member in first_chunk])
+    def __init__(self, author_id: int, timeout: float = 180):
+        super().__init__(timeout=timeout)
+        self.author_id = author_id
+        self.message = None
 
-    if len(member_chunks) > 1:
-        member_list += f"\n\n*...and {len(members) - len(first_chunk)} more member(s)*"
-        member_list += f"\n\n💡 **Tip:** Use `/role-count` for just the count"
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ These buttons aren't for you!", ephemeral=True)
+            return False
+        return True
 
-    embed.add_field(name="Members", value=member_list, inline=False)
-    embed.set_footer(text=f"Requested by {interaction.user.name}")
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message is not None:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+
+
+class HistoryPaginatorView(PaginatorView):
+    """
+    Previous/next buttons over a keyset-paginated moderation history
+
+    Only one page of rows is held at a time. Pages are fetched lazily with
+    fetch_page(before, limit) and rendered with render_page(rows, page_number).
+    The (created_at, id) cursor of each visited page is kept so "Previous" can
+    go back without re-reading earlier pages.
+    """
+
+    def __init__(self, author_id: int, id_column: str, fetch_page, render_page,
+                 page_size: int = 5, timeout: float = 180):
+        super().__init__(author_id, timeout=timeout)
+        self.id_column = id_column
+        self.fetch_page = fetch_page
+        self.render_page = render_page
+        self.page_size = page_size
+        self.cursors = [None]
+        self.page_index = 0
+        self.rows = []
+        self.has_more = False
+
+    async def load_page(self):
+        """Fetch the current page (plus one row to see if there is a next page)"""
+        rows = await self.fetch_page(self.cursors[self.page_index], self.page_size + 1)
+        self.has_more = len(rows) > self.page_size
+        self.rows = rows[:self.page_size]
+        self.previous_page.disabled = self.page_index == 0
+        self.next_page.disabled = not self.has_more
+
+    async def render(self) -> discord.Embed:
+        return await self.render_page(self.rows, self.page_index + 1)
+
+    @discord.ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page_index = max(0, self.page_index - 1)
+        await self.load_page()
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        last = self.rows[-1]
+        cursor = (last['created_at'], last[self.id_column])
+        del self.cursors[self.page_index + 1:]
+        self.cursors.append(cursor)
+        self.page_index += 1
+        await self.load_page()
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+
+class RoleMembersView(PaginatorView):
+    """
+    Previous/next buttons over a role's members, read from role_index
+
+    Only the members on the visible page are resolved to Member objects.
+    """
+
+    def __init__(self, author_id: int, role: discord.Role, page_size: int = 20, timeout: float = 180):
+        super().__init__(author_id, timeout=timeout)
+        self.role = role
+        self.page_size = page_size
+        self.page_index = 0
+        self.total = role_index.count(role)
+        self.partial = role_index.is_partial(role.guild)
+        self.page_count = max(1, -(-self.total // page_size))
+        self.update_buttons()
+
+    def update_buttons(self):
+        self.previous_page.disabled = self.page_index == 0
+        self.next_page.disabled = self.page_index >= self.page_count - 1
+
+    def render(self) -> discord.Embed:
+        guild = self.role.guild
+        lines = []
+        for member_id in role_index.page(self.role, self.page_index, self.page_size):
+            member = guild.get_member(member_id)
+            lines.append(f"• {member.mention} ({member.name})" if member else f"• <@{member_id}>")
+
+        total = f"**{self.total}** cached member(s)" if self.partial else f"**{self.total}** member(s)"
+        embed = discord.Embed(
+            title=f"👥 Members with {self.role.name}",
+            description=f"Total: {total}",
+            color=self.role.color,
+            timestamp=datetime.now()
+        )
+        embed.add_field(name="Members", value="\n".join(lines) or "No members", inline=False)
+        embed.set_footer(text=f"Page {self.page_index + 1}/{self.page_count}")
+        return embed
+
+    @discord.ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page_index = max(0, self.page_index - 1)
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page_index = min(self.page_count - 1, self.page_index + 1)
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+
+async def send_history_pages(interaction: discord.Interaction, view: HistoryPaginatorView, empty_message: str):
+    """Load the first page of a history view and send it as an ephemeral followup"""
+    await view.load_page()
+
+    if not view.rows:
+        await interaction.followup.send(empty_message, ephemeral=True)
+        return
+
+    embed = await view.render()
+    if view.has_more:
+        view.message = await interaction.followup.send(embed=embed, view=view, ephemeral=True, wait=True)
+    else:
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+
+async def resolve_moderator_name(row: Dict) -> str:
+    """Use the stored moderator name, falling back to fetching the user"""
+    mod_name = row.get('moderator_name')
+    if not mod_name:
+        try:
+            moderator = await bot.fetch_user(row['moderator_id'])
+            mod_name = moderator.name
+        except:
+            mod_name = f"Unknown (ID: {row['moderator_id']})"
+    return mod_name
 
-    await interaction.followup.send(embed=embed)
 
 
 #================================================ERROR HANDLING=========================================================================================================================
@@ -3416,6 +6845,7 @@ async def slash_rolemembers(interaction: discord.Interaction, role: discord.Role
 # ============================================================================
 
 @bot.tree.command(name="warn", description="Issue a warning to a user")
+@timed_command
 @app_commands.describe(
     member="The member to warn",
     reason="Reason for the warning"
@@ -3434,11 +6864,9 @@ async def slash_warn(interaction: discord.Interaction, member: discord.Member, r
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.5)
 
     # Add warning to database
-    warning_id = await asyncio.to_thread(
-        add_warning,
+    warning_id = await add_warning(
         interaction.guild.id,
         member.id,
         interaction.user.id,
@@ -3455,14 +6883,11 @@ async def slash_warn(interaction: discord.Interaction, member: discord.Member, r
         return
 
     # Get total warnings for this user
-    warnings = await asyncio.to_thread(
-        get_user_warnings,
+    warning_count = await count_user_warnings(
         interaction.guild.id,
         member.id
     )
 
-    warning_count = len(warnings)
-
     # Create embed
     embed = discord.Embed(
         title="⚠️ User Warned",
@@ -3497,10 +6922,11 @@ async def slash_warn(interaction: discord.Interaction, member: discord.Member, r
 
 
 @bot.tree.command(name="warnings", description="View all warnings for a user")
+@timed_command
 @app_commands.describe(member="The member to check warnings for")
 @app_commands.checks.has_permissions(moderate_members=True)
 async def slash_warnings(interaction: discord.Interaction, member: discord.Member):
-    """View all warnings for a specific user"""
+    """View all warnings for a specific user, five per page"""
     if not await check_emergency_shutdown(interaction):
         return
 
@@ -3512,58 +6938,44 @@ async def slash_warnings(interaction: discord.Interaction, member: discord.Membe
         return
 
     await interaction.response.defer(ephemeral=True)
-    await asyncio.sleep(0.3)
 
-    # Get warnings from database
-    warnings = await asyncio.to_thread(
-        get_user_warnings,
-        interaction.guild.id,
-        member.id
-    )
+    guild_id = interaction.guild.id
+    total = await count_user_warnings(guild_id, member.id)
 
-    if not warnings:
-        await interaction.followup.send(
-            f"✅ {member.mention} has no warnings on record.",
-            ephemeral=True
-        )
-        return
+    async def fetch_page(before, limit):
+        return await get_user_warnings_page(guild_id, member.id, before, limit)
 
-    # Create embed
-    embed = discord.Embed(
-        title=f"⚠️ Warnings for {member.name}",
-        description=f"Total: **{len(warnings)}** warning(s)",
-        color=discord.Color.orange(),
-        timestamp=datetime.now()
-    )
+    async def render_page(warnings, page_number):
+        embed = discord.Embed(
+            title=f"⚠️ Warnings for {member.name}",
+            description=f"Total: **{total}** warning(s)",
+            color=discord.Color.orange(),
+            timestamp=datetime.now()
+        )
 
-    embed.set_thumbnail(url=member.display_avatar.url)
+        embed.set_thumbnail(url=member.display_avatar.url)
 
-    # Show up to 5 most recent warnings
-    for i, warning in enumerate(warnings[:5], 1):
-        # Use stored moderator name, fallback to fetching if not available
-        mod_name = warning.get('moderator_name')
-        if not mod_name:
-            try:
-                moderator = await bot.fetch_user(warning['moderator_id'])
-                mod_name = moderator.name
-            except:
-                mod_name = f"Unknown (ID: {warning['moderator_id']})"
+        for warning in warnings:
+            mod_name = await resolve_moderator_name(warning)
+            timestamp = warning['created_at'].strftime("%Y-%m-%d %H:%M UTC")
 
-        timestamp = warning['created_at'].strftime("%Y-%m-%d %H:%M UTC")
+            embed.add_field(
+                name=f"Warning #{warning['warning_id']} - {timestamp}",
+                value=f"**Moderator:** {mod_name}\n**Reason:** {warning['reason']}",
+                inline=False
+            )
 
-        embed.add_field(
-            name=f"Warning #{warning['warning_id']} - {timestamp}",
-            value=f"**Moderator:** {mod_name}\n**Reason:** {warning['reason']}",
-            inline=False
-        )
+        if total > len(warnings):
+            embed.set_footer(text=f"Page {page_number} of {(total + 4) // 5}")
 
-    if len(warnings) > 5:
-        embed.set_footer(text=f"Showing 5 of {len(warnings)} warnings")
+        return embed
 
-    await interaction.followup.send(embed=embed, ephemeral=True)
+    view = HistoryPaginatorView(interaction.user.id, 'warning_id', fetch_page, render_page)
+    await send_history_pages(interaction, view, f"✅ {member.mention} has no warnings on record.")
 
 
 @bot.tree.command(name="clearwarnings", description="Clear all warnings for a user")
+@timed_command
 @app_commands.describe(member="The member to clear warnings for")
 @app_commands.checks.has_permissions(moderate_members=True)
 async def slash_clearwarnings(interaction: discord.Interaction, member: discord.Member):
@@ -3579,11 +6991,9 @@ async def slash_clearwarnings(interaction: discord.Interaction, member: discord.
         return
 
     await interaction.response.defer()
-    await asyncio.sleep(0.5)
 
     # Clear warnings
-    cleared_count = await asyncio.to_thread(
-        clear_user_warnings,
+    cleared_count = await clear_user_warnings(
         interaction.guild.id,
         member.id,
         member.name  # Add username
@@ -3610,6 +7020,7 @@ async def slash_clearwarnings(interaction: discord.Interaction, member: discord.
 
 
 @bot.tree.command(name="case", description="View details of a specific moderation case")
+@timed_command
 @app_commands.describe(case_id="The case ID number to look up")
 @app_commands.checks.has_permissions(moderate_members=True)
 async def slash_case(interaction: discord.Interaction, case_id: int):
@@ -3625,10 +7036,9 @@ async def slash_case(interaction: discord.Interaction, case_id: int):
         return
 
     await interaction.response.defer(ephemeral=True)
-    await asyncio.sleep(0.3)
 
     # Get the case from database
-    case = await asyncio.to_thread(get_mod_case, case_id, interaction.guild.id)
+    case = await get_mod_case(case_id, interaction.guild.id)
 
     if not case:
         await interaction.followup.send(
@@ -3685,13 +7095,14 @@ async def slash_case(interaction: discord.Interaction, case_id: int):
 
 
 @bot.tree.command(name="cases", description="View moderation cases for a user")
+@timed_command
 @app_commands.describe(
     member="The member to check cases for",
-    limit="Number of cases to show (default 5)"
+    limit="Number of cases to show per page (default 5)"
 )
 @app_commands.checks.has_permissions(moderate_members=True)
 async def slash_cases(interaction: discord.Interaction, member: discord.Member, limit: int = 5):
-    """View moderation cases for a specific user"""
+    """View moderation cases for a specific user, one page at a time"""
     if not await check_emergency_shutdown(interaction):
         return
 
@@ -3703,58 +7114,44 @@ async def slash_cases(interaction: discord.Interaction, member: discord.Member,
         return
 
     await interaction.response.defer(ephemeral=True)
-    await asyncio.sleep(0.3)
 
-    # Get cases from database
-    cases = await asyncio.to_thread(
-        get_user_mod_cases,
-        interaction.guild.id,
-        member.id,
-        min(limit, 10)  # Cap at 10
-    )
+    guild_id = interaction.guild.id
+    page_size = max(1, min(limit, 10))  # Cap at 10 per page
 
-    if not cases:
-        await interaction.followup.send(
-            f"✅ {member.mention} has no moderation cases on record.",
-            ephemeral=True
-        )
-        return
+    async def fetch_page(before, page_limit):
+        return await get_user_mod_cases_page(guild_id, member.id, before, page_limit)
 
-    # Create embed
-    embed = discord.Embed(
-        title=f"📋 Moderation Cases for {member.name}",
-        description=f"Showing up to {len(cases)} most recent case(s)",
-        color=discord.Color.blue(),
-        timestamp=datetime.now()
-    )
+    async def render_page(cases, page_number):
+        embed = discord.Embed(
+            title=f"📋 Moderation Cases for {member.name}",
+            description=f"Page {page_number} - showing {len(cases)} case(s), newest first",
+            color=discord.Color.blue(),
+            timestamp=datetime.now()
+        )
 
-    embed.set_thumbnail(url=member.display_avatar.url)
+        embed.set_thumbnail(url=member.display_avatar.url)
 
-    for case in cases:
-        # Use stored moderator name, fallback to fetching if not available
-        mod_name = case.get('moderator_name')
-        if not mod_name:
-            try:
-                moderator = await bot.fetch_user(case['moderator_id'])
-                mod_name = moderator.name
-            except:
-                mod_name = f"Unknown (ID: {case['moderator_id']})"
+        for case in cases:
+            mod_name = await resolve_moderator_name(case)
+            timestamp = case['created_at'].strftime("%Y-%m-%d %H:%M UTC")
+            reason = case.get('reason') or "No reason provided"
 
-        timestamp = case['created_at'].strftime("%Y-%m-%d %H:%M UTC")
-        reason = case.get('reason') or "No reason provided"
+            embed.add_field(
+                name=f"Case #{case['case_id']} - {case['action_type'].title()} - {timestamp}",
+                value=f"**Moderator:** {mod_name}\n**Reason:** {reason}",
+                inline=False
+            )
 
-        embed.add_field(
-            name=f"Case #{case['case_id']} - {case['action_type'].title()} - {timestamp}",
-            value=f"**Moderator:** {mod_name}\n**Reason:** {reason}",
-            inline=False
-        )
+        embed.set_footer(text=f"Use /case <id> to view full details of a specific case")
 
-    embed.set_footer(text=f"Use /case <id> to view full details of a specific case")
+        return embed
 
-    await interaction.followup.send(embed=embed, ephemeral=True)
+    view = HistoryPaginatorView(interaction.user.id, 'case_id', fetch_page, render_page, page_size=page_size)
+    await send_history_pages(interaction, view, f"✅ {member.mention} has no moderation cases on record.")
 
 
 @bot.tree.command(name="updatecase", description="Update the reason for a moderation case")
+@timed_command
 @app_commands.describe(
     case_id="The case ID to update",
     new_reason="The new reason for the case"
@@ -3773,11 +7170,9 @@ async def slash_updatecase(interaction: discord.Interaction, case_id: int, new_r
         return
 
     await interaction.response.defer(ephemeral=True)
-    await asyncio.sleep(0.5)
 
     # Update the case
-    success = await asyncio.to_thread(
-        update_mod_case_reason,
+    success = await update_mod_case_reason(
         case_id,
         interaction.guild.id,
         new_reason
@@ -3804,6 +7199,7 @@ async def slash_updatecase(interaction: discord.Interaction, case_id: int, new_r
 
 
 @bot.tree.command(name="modnote", description="Add a private moderation note to a user")
+@timed_command
 @app_commands.describe(
     member="The member to add a note for",
     note="The note text (visible only to moderators)"
@@ -3822,11 +7218,9 @@ async def slash_modnote(interaction: discord.Interaction, member: discord.Member
         return
 
     await interaction.response.defer(ephemeral=True)
-    await asyncio.sleep(0.5)
 
     # Add note to database
-    note_id = await asyncio.to_thread(
-        add_mod_note,
+    note_id = await add_mod_note(
         interaction.guild.id,
         member.id,
         interaction.user.id,
@@ -3859,10 +7253,11 @@ async def slash_modnote(interaction: discord.Interaction, member: discord.Member
 
 
 @bot.tree.command(name="modnotes", description="View all moderation notes for a user")
+@timed_command
 @app_commands.describe(member="The member to check notes for")
 @app_commands.checks.has_permissions(moderate_members=True)
 async def slash_modnotes(interaction: discord.Interaction, member: discord.Member):
-    """View all moderation notes for a specific user"""
+    """View all moderation notes for a specific user, five per page"""
     if not await check_emergency_shutdown(interaction):
         return
 
@@ -3874,57 +7269,38 @@ async def slash_modnotes(interaction: discord.Interaction, member: discord.Membe
         return
 
     await interaction.response.defer(ephemeral=True)
-    await asyncio.sleep(0.3)
-
-    # Get notes from database
-    notes = await asyncio.to_thread(
-        get_user_mod_notes,
-        interaction.guild.id,
-        member.id
-    )
 
-    if not notes:
-        await interaction.followup.send(
-            f"ℹ️ No moderation notes found for {member.mention}.",
-            ephemeral=True
-        )
-        return
+    guild_id = interaction.guild.id
 
-    # Create embed
-    embed = discord.Embed(
-        title=f"📝 Moderation Notes for {member.name}",
-        description=f"Total: **{len(notes)}** note(s)",
-        color=discord.Color.blue(),
-        timestamp=datetime.now()
-    )
+    async def fetch_page(before, limit):
+        return await get_user_mod_notes_page(guild_id, member.id, before, limit)
 
-    embed.set_thumbnail(url=member.display_avatar.url)
+    async def render_page(notes, page_number):
+        embed = discord.Embed(
+            title=f"📝 Moderation Notes for {member.name}",
+            description=f"Page {page_number} - showing {len(notes)} note(s), newest first",
+            color=discord.Color.blue(),
+            timestamp=datetime.now()
+        )
 
-    # Show up to 5 most recent notes
-    for note in notes[:5]:
-        # Use stored moderator name, fallback to fetching if not available
-        mod_name = note.get('moderator_name')
-        if not mod_name:
-            try:
-                moderator = await bot.fetch_user(note['moderator_id'])
-                mod_name = moderator.name
-            except:
-                mod_name = f"Unknown (ID: {note['moderator_id']})"
+        embed.set_thumbnail(url=member.display_avatar.url)
 
-        timestamp = note['created_at'].strftime("%Y-%m-%d %H:%M UTC")
+        for note in notes:
+            mod_name = await resolve_moderator_name(note)
+            timestamp = note['created_at'].strftime("%Y-%m-%d %H:%M UTC")
 
-        embed.add_field(
-            name=f"Note #{note['note_id']} - {timestamp}",
-            value=f"**By:** {mod_name}\n**Note:** {note['note_text']}",
-            inline=False
-        )
+            embed.add_field(
+                name=f"Note #{note['note_id']} - {timestamp}",
+                value=f"**By:** {mod_name}\n**Note:** {note['note_text']}",
+                inline=False
+            )
 
-    if len(notes) > 5:
-        embed.set_footer(text=f"Showing 5 of {len(notes)} notes | Only visible to moderators")
-    else:
         embed.set_footer(text="Only visible to moderators")
 
-    await interaction.followup.send(embed=embed, ephemeral=True)
+        return embed
+
+    view = HistoryPaginatorView(interaction.user.id, 'note_id', fetch_page, render_page)
+    await send_history_pages(interaction, view, f"ℹ️ No moderation notes found for {member.mention}.")
 # Error handling
 
 @bot.command(name='kick')
@@ -3940,7 +7316,6 @@ async def prefix_kick(ctx, member: discord.Member, *, reason=None):
     if member.top_role >= ctx.guild.me.top_role:
         await ctx.send("❌ I cannot kick this member (their role is equal or higher than mine)!")
         return
-    await asyncio.sleep(0.5)
     await member.kick(reason=reason)
     await ctx.send(f"✅ {member.mention} has been kicked. Reason: {reason or 'No reason provided'}")
 
@@ -3958,12 +7333,24 @@ async def prefix_ban(ctx, member: discord.Member, *, reason=None):
     if member.top_role >= ctx.guild.me.top_role:
         await ctx.send("❌ I cannot ban this member (their role is equal or higher than mine)!")
         return
-    await asyncio.sleep(0.5)
     await member.ban(reason=reason)
     await ctx.send(f"✅ {member.mention} has been banned. Reason: {reason or 'No reason provided'}")
 
 
+async def main():
+    """Run the bot; setup_hook starts the lifecycle and shutdown_lifecycle ends it"""
+    async with bot:
+        try:
+            await bot.start(TOKEN)
+        finally:
+            await shutdown_lifecycle()
+
+
 if __name__ == "__main__":
+    # `python Moderationbot.py migrate` applies schema migrations and exits
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        sys.exit(asyncio.run(run_migrations_cli()))
+
     print("=== BOT STARTING ===")
     print(f"TOKEN exists: {bool(TOKEN)}")
     print(f"PORT: {PORT}")
@@ -3976,8 +7363,11 @@ if __name__ == "__main__":
     else:
         print("Starting bot...")
         try:
-            bot.run(TOKEN, log_handler=None)
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            pass
         finally:
+            # Safety net if the loop died before shutdown_lifecycle() ran
             close_database()
 
     print("=== BOT EXITED ===")
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+Case logging latency benchmark
+
+Fires a burst of concurrent log_moderation_case() calls (the same path /kick,
+/ban and /mute use) and measures how much the event loop is stalled while
+they run. Two probes run alongside the burst:
+
+  * heartbeat probe - a task that wakes every HEARTBEAT_INTERVAL and records
+    how late it woke up (this is what delays gateway heartbeats)
+  * command probe - a trivial "command" task started every COMMAND_INTERVAL,
+    timed from creation to completion
+
+For comparison the same burst is replayed with a simulated blocking baseline
+that sleeps synchronously for the measured database round trip, which is how
+the old psycopg2 code behaved on the event loop.
+
+Usage (uses Supabase when SUPABASE_URL is set, otherwise the local SQLite
+backend; DATABASE_BACKEND picks one explicitly):
+    python benchmark_case_logging.py [burst_size]
+
+Benchmark rows are written under guild ID 0 and deleted afterwards.
+"""
+import asyncio
+import contextlib
+import io
+import statistics
+import sys
+import time
+
+import Moderationbot as bot_module
+
+BURST_SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+BENCH_GUILD_ID = 0
+HEARTBEAT_INTERVAL = 0.010
+COMMAND_INTERVAL = 0.020
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def heartbeat_probe(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append(time.perf_counter() - started - HEARTBEAT_INTERVAL)
+
+
+async def command_probe(stop: asyncio.Event, latencies: list):
+    async def fake_command(created):
+        await asyncio.sleep(0)
+        latencies.append(time.perf_counter() - created)
+
+    tasks = []
+    while not stop.is_set():
+        tasks.append(asyncio.create_task(fake_command(time.perf_counter())))
+        await asyncio.sleep(COMMAND_INTERVAL)
+    await asyncio.gather(*tasks)
+
+
+async def measure_round_trip() -> float:
+    samples = []
+    for _ in range(10):
+        started = time.perf_counter()
+        async with bot_module.db_connection('benchmark') as conn:
+            await conn.fetchval('SELECT 1')
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+async def run_burst(label: str, make_call):
+    stop = asyncio.Event()
+    lags, command_latencies, call_latencies = [], [], []
+
+    async def timed_call(i):
+        started = time.perf_counter()
+        await make_call(i)
+        call_latencies.append(time.perf_counter() - started)
+
+    probes = [
+        asyncio.create_task(heartbeat_probe(stop, lags)),
+        asyncio.create_task(command_probe(stop, command_latencies)),
+    ]
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(timed_call(i) for i in range(BURST_SIZE)))
+    wall_time = time.perf_counter() - started
+
+    await asyncio.sleep(0.05)
+    stop.set()
+    await asyncio.gather(*probes)
+
+    ms = 1000
+    print(f"\n--- {label} ---")
+    print(f"  Burst wall time:         {wall_time * ms:8.1f} ms")
+    print(f"  Case insert p50 / p95:   {percentile(call_latencies, 50) * ms:8.1f} / "
+          f"{percentile(call_latencies, 95) * ms:.1f} ms")
+    print(f"  Heartbeat lag p99 / max: {percentile(lags, 99) * ms:8.1f} / {max(lags, default=0) * ms:.1f} ms")
+    print(f"  Other command p95 / max: {percentile(command_latencies, 95) * ms:8.1f} / "
+          f"{max(command_latencies, default=0) * ms:.1f} ms")
+    return max(lags, default=0)
+
+
+async def main():
+    with contextlib.redirect_stdout(io.StringIO()):
+        ready = await bot_module.init_moderation_database()
+    if not ready:
+        print("❌ Could not connect to the database. Check SUPABASE_URL / DATABASE_BACKEND.")
+        return
+
+    try:
+        round_trip = await measure_round_trip()
+        print("=== CASE LOGGING BENCHMARK ===")
+        print(f"Backend: {bot_module.DATABASE_BACKEND}")
+        print(f"Burst size: {BURST_SIZE} concurrent bans")
+        print(f"Database round trip (median SELECT 1): {round_trip * 1000:.1f} ms")
+        print(f"In-flight limit: {bot_module.CASE_LOG_MAX_IN_FLIGHT}")
+
+        async def async_call(i):
+            await bot_module.log_moderation_case(
+                BENCH_GUILD_ID, 1000 + i, 1, "ban", "benchmark", f"bench-{i}", "benchmark"
+            )
+
+        async def blocking_call(i):
+            # Old behaviour: a synchronous round trip on the event loop
+            time.sleep(round_trip)
+
+        async_lag = await run_burst("async log_moderation_case", async_call)
+        blocking_lag = await run_burst("simulated blocking baseline", blocking_call)
+
+        print("\n==============================")
+        print(f"Worst heartbeat stall: {async_lag * 1000:.1f} ms async vs "
+              f"{blocking_lag * 1000:.1f} ms blocking")
+    finally:
+        async with bot_module.db_connection('benchmark') as conn:
+            await conn.execute('DELETE FROM moderation_cases WHERE guild_id = $1', BENCH_GUILD_ID)
+        await bot_module.shutdown_database()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+"""
+Member cache memory benchmark (normal mode vs LEAN_MODE)
+
+Builds a synthetic guild the way discord.py does after startup chunking, once
+with the normal client options (presences intent, every member cached) and
+once with the lean options (no presences, minimal member cache), using the
+bot's own build_client_options(). Memory retained by the guild's member and
+presence cache is measured with tracemalloc.
+
+The lean run is fed the same member list as the normal run even though
+Discord would not send it without chunking, so its numbers are an upper bound.
+
+Usage (no Discord connection or database needed):
+    python benchmark_member_cache.py [member_count ...]
+
+Defaults to 50,000 and 200,000 members.
+"""
+import gc
+import sys
+import time
+import tracemalloc
+
+import discord
+
+import Moderationbot as bot_module
+
+MEMBER_COUNTS = [int(arg) for arg in sys.argv[1:]] or [50_000, 200_000]
+STATUSES = ['online', 'idle', 'dnd', 'offline', 'offline', 'offline']
+BASE_ID = 100_000_000_000_000_000
+
+
+def guild_payload(member_count: int, with_presences: bool) -> dict:
+    """GUILD_CREATE-style payload with member_count members (and their presences)"""
+    members = [
+        {
+            'user': {'id': str(BASE_ID + i), 'username': f'member{i}', 'discriminator': '0',
+                     'avatar': None, 'global_name': None, 'bot': i % 50 == 0},
+            'roles': [],
+            'joined_at': '2024-01-01T00:00:00+00:00',
+            'deaf': False,
+            'mute': False,
+            'flags': 0,
+        }
+        for i in range(member_count)
+    ]
+    presences = [
+        {'user': {'id': str(BASE_ID + i)}, 'status': STATUSES[i % len(STATUSES)],
+         'activities': [], 'client_status': {}}
+        for i in range(member_count)
+    ] if with_presences else []
+
+    return {
+        'id': '1',
+        'name': 'benchmark',
+        'owner_id': '1',
+        'member_count': member_count,
+        'roles': [{'id': '1', 'name': '@everyone', 'permissions': '0', 'position': 0, 'color': 0,
+                   'hoist': False, 'managed': False, 'mentionable': False}],
+        'channels': [],
+        'emojis': [],
+        'stickers': [],
+        'features': [],
+        'members': members,
+        'presences': presences,
+    }
+
+
+def measure(member_count: int, lean_mode: bool) -> dict:
+    options = bot_module.build_client_options(lean_mode)
+    client = discord.Client(**options)
+    payload = guild_payload(member_count, with_presences=options['intents'].presences)
+
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    guild = discord.Guild(data=payload, state=client._connection)
+    build_time = time.perf_counter() - started
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        'cached_members': len(guild.members),
+        'retained_mb': retained / 1024 / 1024,
+        'peak_mb': peak / 1024 / 1024,
+        'build_s': build_time,
+    }
+    del guild, payload
+    gc.collect()
+    return result
+
+
+def main():
+    print("=== MEMBER CACHE MEMORY BENCHMARK ===")
+    for member_count in MEMBER_COUNTS:
+        normal = measure(member_count, lean_mode=False)
+        lean = measure(member_count, lean_mode=True)
+
+        print(f"\n--- {member_count:,} members ---")
+        for label, result in (("normal", normal), ("lean", lean)):
+            print(f"  {label:<7} cached members: {result['cached_members']:>8,}   "
+                  f"retained: {result['retained_mb']:8.1f} MB   peak: {result['peak_mb']:8.1f} MB   "
+                  f"build: {result['build_s']:.2f} s")
+        saved = normal['retained_mb'] - lean['retained_mb']
+        print(f"  Lean mode saves {saved:.1f} MB for this guild")
+
+
+if __name__ == "__main__":
+    main()